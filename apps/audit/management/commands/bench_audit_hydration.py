@@ -0,0 +1,75 @@
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Model
+
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la hidratación de modelos (Model.from_db, lo que hace un queryset por fila) con el "
+        "parche de Model.__init__ del middleware de auditoría anterior frente al contexto actual"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Instancias por queryset sintético")
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=100,
+            help="Requests atendidos por el proceso (el parche anterior apilaba un wrapper por request)",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Repeticiones (se informa la mejor)")
+
+    def handle(self, *args, **options):
+        field_names = [field.attname for field in Product._meta.concrete_fields]
+        now = datetime.now(timezone.utc)
+        sample = {
+            "id": uuid.uuid4(), "company_id": uuid.uuid4(), "sku": "SKU-0001", "name": "Producto",
+            "description": "", "category_id": uuid.uuid4(), "cost_price": Decimal("10.00"),
+            "sale_price": Decimal("15.00"), "image": "", "is_active": True, "sharded_stock": False,
+            "is_deleted": False, "deleted_at": None, "created_at": now, "updated_at": now,
+        }
+        row = tuple(sample.get(name) for name in field_names)
+
+        current = self.measure(field_names, row, options)
+        legacy = self.measure(field_names, row, options, patches=options["requests"])
+
+        self.stdout.write(f"contextvars: {options['rows']} filas en {current * 1000:.1f} ms")
+        self.stdout.write(
+            f"parche de __init__ ({options['requests']} requests): {options['rows']} filas en {legacy * 1000:.1f} ms"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Hidratación {legacy / current:.1f}x más rápida"))
+
+    def measure(self, field_names, row, options, patches=0):
+        """Mejor tiempo de hidratar rows instancias, con patches wrappers de __init__ apilados"""
+        original = Model.__init__
+        try:
+            for _ in range(patches):
+                self.patch(object())
+
+            best = None
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                for _ in range(options["rows"]):
+                    Product.from_db("default", field_names, row)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            return best
+        finally:
+            Model.__init__ = original
+
+    @staticmethod
+    def patch(request):
+        """Reproducción del parche que el middleware anterior aplicaba en cada request"""
+        old_init = Model.__init__
+
+        def new_init(self, *args, **kwargs):
+            old_init(self, *args, **kwargs)
+            self._audit_request = request
+
+        Model.__init__ = new_init
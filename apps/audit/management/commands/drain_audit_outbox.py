@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.audit import writer
+
+
+class Command(BaseCommand):
+    help = (
+        "Inserta en la auditoría los lotes pendientes del outbox (modo AUDIT_ASYNC). El worker "
+        "los drena al recibir el aviso de cada transacción; este comando recupera los lotes "
+        "cuyo aviso se perdió. Pensado para ejecutarse periódicamente o al iniciar los workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Base de datos a drenar")
+
+    def handle(self, *args, **options):
+        written = writer.drain(options["database"])
+        self.stdout.write(self.style.SUCCESS(f"Outbox de auditoría: {written} eventos insertados"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from apps.audit import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantiene las particiones mensuales de auditoría: crea los meses que faltan (y reparte "
+        "las filas de la partición por defecto), desacopla los meses fuera de la retención y "
+        "los archiva en JSONL comprimido. Pensado para ejecutarse a diario o semanalmente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, help="Meses a crear por adelantado (por defecto AUDIT_PARTITIONS_AHEAD)")
+        parser.add_argument(
+            "--retention", type=int, help="Meses a conservar en la tabla, 0 para todos (por defecto AUDIT_RETENTION_MONTHS)"
+        )
+        parser.add_argument("--archive-dir", help="Carpeta de los archivos (por defecto AUDIT_ARCHIVE_DIR)")
+        parser.add_argument(
+            "--no-archive", action="store_true", help="Solo desacoplar; las tablas quedan para archivarlas después"
+        )
+
+    def handle(self, *args, **options):
+        created = partitions.ensure(ahead=options["ahead"])
+        for name in created:
+            self.stdout.write(f"Creada {name}")
+
+        detached = partitions.retain(months=options["retention"])
+        for name in detached:
+            self.stdout.write(f"Desacoplada {name}")
+
+        archived = [] if options["no_archive"] else partitions.archive(options["archive_dir"])
+        for name, rows, path in archived:
+            self.stdout.write(f"Archivada {name}: {rows} filas en {path}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Particiones de auditoría: {len(created)} creadas, {len(detached)} desacopladas, {len(archived)} archivadas"
+        ))
@@ -1,31 +1,43 @@
-from threading import local
-from django.utils.deprecation import MiddlewareMixin
+from collections import namedtuple
+from contextvars import ContextVar
 
-_thread_locals = local()
+# Datos del request en curso para los registros de auditoría
+AuditContext = namedtuple('AuditContext', ['user', 'ip_address', 'user_agent', 'url', 'method'])
+
+_audit_context = ContextVar('audit_context', default=None)
+
+def get_current_context():
+    """Contexto de auditoría del request en curso (None fuera de un request)"""
+    return _audit_context.get()
 
 def get_current_user():
-    """Obtener usuario actual del thread local"""
-    return getattr(_thread_locals, 'user', None)
+    """Obtener usuario autenticado del request en curso"""
+    context = _audit_context.get()
+    if context is None or not getattr(context.user, 'is_authenticated', False):
+        return None
+    return context.user
 
-class AuditMiddleware(MiddlewareMixin):
-    """Middleware para agregar usuario y request a los modelos"""
+class AuditMiddleware:
+    """
+    Middleware que deja el usuario y los datos del request en un ContextVar para las
+    señales de auditoría. El contexto vale solo durante el request (también en vistas
+    async) y se restablece al terminar; los modelos no se modifican.
+    """
     
-    def process_request(self, request):
-        _thread_locals.user = getattr(request, 'user', None)
-        
-        # Agregar usuario a todos los modelos que se guarden en este request
-        def patch_model(instance):
-            instance._audit_request = request
-            return instance
-        
-        from django.db.models import Model
-        old_init = Model.__init__
-        
-        def new_init(self, *args, **kwargs):
-            old_init(self, *args, **kwargs)
-            self._audit_request = request
-        
-        Model.__init__ = new_init
+    def __init__(self, get_response):
+        self.get_response = get_response
     
-    def process_response(self, request, response):
-        return response
\ No newline at end of file
+    def __call__(self, request):
+        from .models import AuditLog
+        
+        token = _audit_context.set(AuditContext(
+            user=getattr(request, 'user', None),
+            ip_address=AuditLog.get_client_ip(request),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            url=request.build_absolute_uri()[:500],
+            method=request.method,
+        ))
+        try:
+            return self.get_response(request)
+        finally:
+            _audit_context.reset(token)
@@ -0,0 +1,72 @@
+from django.db import migrations
+
+
+# La tabla pasa a estar particionada por rango de created_at (una partición por mes, ver
+# apps.audit.partitions). PostgreSQL exige que la clave primaria incluya la columna de
+# partición, así que en la base es (id, created_at); para Django id sigue siendo la
+# clave. Las filas existentes quedan en la partición por defecto y el comando
+# manage_audit_partitions las reparte en meses.
+
+def _constraints(model, schema_editor):
+    """Claves foráneas e índices del modelo, con los nombres que genera Django"""
+    statements = [
+        schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s')
+        for field in model._meta.local_fields
+        if field.remote_field and field.db_constraint
+    ]
+    return statements + schema_editor._model_indexes_sql(model)
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    table = AuditLog._meta.db_table
+    qn = schema_editor.quote_name
+    created_at = qn(AuditLog._meta.get_field('created_at').column)
+    pk = qn(AuditLog._meta.pk.column)
+
+    schema_editor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(table + "_old")}')
+    schema_editor.execute(f'ALTER TABLE {qn(table + "_old")} RENAME CONSTRAINT {qn(table + "_pkey")} TO {qn(table + "_old_pkey")}')
+    schema_editor.execute(
+        f'CREATE TABLE {qn(table)} (LIKE {qn(table + "_old")} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE ({created_at})'
+    )
+    schema_editor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(table)} DEFAULT')
+    schema_editor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(table + "_old")}')
+    schema_editor.execute(f'DROP TABLE {qn(table + "_old")}')
+
+    # Índices después de copiar las filas: se construyen una vez por partición
+    schema_editor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + "_pkey")} PRIMARY KEY ({pk}, {created_at})')
+    for statement in _constraints(AuditLog, schema_editor):
+        schema_editor.execute(statement)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    table = AuditLog._meta.db_table
+    qn = schema_editor.quote_name
+    pk = qn(AuditLog._meta.pk.column)
+
+    # Las particiones desacopladas (retención) ya son tablas sueltas y no se tocan
+    schema_editor.execute(f'CREATE TABLE {qn(table + "_plain")} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    schema_editor.execute(f'INSERT INTO {qn(table + "_plain")} SELECT * FROM {qn(table)}')
+    schema_editor.execute(f'DROP TABLE {qn(table)} CASCADE')
+    schema_editor.execute(f'ALTER TABLE {qn(table + "_plain")} RENAME TO {qn(table)}')
+
+    schema_editor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + "_pkey")} PRIMARY KEY ({pk})')
+    for statement in _constraints(AuditLog, schema_editor):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_audit_event_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
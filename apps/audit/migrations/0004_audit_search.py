@@ -0,0 +1,73 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:33
+
+import apps.audit.models
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Modelos auditados: la compañía sale del objeto; el resto de los registros toma la del usuario
+AUDITED_MODELS = [('products', 'category'), ('products', 'product'), ('warehouses', 'warehouse'), ('suppliers', 'supplier')]
+
+def backfill_company(apps, schema_editor):
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    qn = schema_editor.quote_name
+    audit = qn(AuditLog._meta.db_table)
+
+    for app_label, model_name in AUDITED_MODELS:
+        content_type = ContentType.objects.filter(app_label=app_label, model=model_name).first()
+        if content_type is None:
+            continue
+        table = qn(apps.get_model(app_label, model_name)._meta.db_table)
+        schema_editor.execute(
+            f"UPDATE {audit} SET company_id = t.company_id FROM {table} t "
+            f"WHERE {audit}.content_type_id = %s AND {audit}.object_id = t.id::text",
+            [content_type.pk]
+        )
+    schema_editor.execute(
+        f"UPDATE {audit} SET company_id = u.company_id FROM {qn(User._meta.db_table)} u "
+        f"WHERE {audit}.company_id IS NULL AND {audit}.user_id = u.id"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0003_partition_auditlog'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('products', '0002_product_sharded_stock'),
+        ('suppliers', '0001_initial'),
+        ('users', '0001_initial'),
+        ('warehouses', '0002_warehouse_sharded_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='company',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_logs', to='users.company'),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='search',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('object_repr', 'username', config='simple'), '||', apps.audit.models.ChangedFieldsVector('changes'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.RunPython(backfill_company, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['company', 'created_at', 'id'], name='audit_company_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['company', 'content_type', 'created_at', 'id'], name='audit_company_model_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search'], name='audit_search_idx'),
+        ),
+    ]
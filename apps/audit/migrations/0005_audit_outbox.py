@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0004_audit_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditOutbox',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('payload', models.TextField()),
+                ('events', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Lote de Auditoría Pendiente',
+                'verbose_name_plural': 'Lotes de Auditoría Pendientes',
+            },
+        ),
+    ]
@@ -2,11 +2,22 @@ from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorCombinable, SearchVectorField
+from django.utils import timezone
 import json
 import uuid
 
 User = get_user_model()
 
+
+class ChangedFieldsVector(SearchVectorCombinable, models.Func):
+    """tsvector con los nombres de los campos de un JSON de cambios ({campo: {'old', 'new'}})"""
+    function = 'jsonb_to_tsvector'
+    template = "%(function)s('simple'::regconfig, %(expressions)s, '[\"key\"]'::jsonb)"
+    output_field = SearchVectorField()
+
+
 class AuditLog(models.Model):
     """Registro de auditoría para todas las operaciones"""
     
@@ -24,6 +35,13 @@ class AuditLog(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
+    # Compañía del objeto (o del usuario) para filtrar la auditoría por compañía
+    # (sin índice propio: los índices compuestos empiezan por compañía)
+    company = models.ForeignKey(
+        'users.Company', on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_logs',
+        db_index=False
+    )
+    
     # Usuario
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='audit_logs')
     username = models.CharField(max_length=150, blank=True)
@@ -50,7 +68,15 @@ class AuditLog(models.Model):
     url = models.CharField(max_length=500, blank=True)
     method = models.CharField(max_length=10, blank=True)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Momento del evento (no del INSERT, que puede llegar después en un lote)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    
+    # Texto buscable: objeto, usuario y nombres de los campos modificados (calculado por la base)
+    search = models.GeneratedField(
+        expression=SearchVector('object_repr', 'username', config='simple') + ChangedFieldsVector('changes'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     
     class Meta:
         verbose_name = 'Registro de Auditoría'
@@ -61,6 +87,10 @@ class AuditLog(models.Model):
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['action']),
             models.Index(fields=['created_at']),
+            # Listado por compañía (y por modelo) en orden de paginación (created_at, id)
+            models.Index(fields=['company', 'created_at', 'id'], name='audit_company_created_idx'),
+            models.Index(fields=['company', 'content_type', 'created_at', 'id'], name='audit_company_model_idx'),
+            GinIndex(fields=['search'], name='audit_search_idx'),
         ]
     
     def __str__(self):
@@ -68,18 +98,24 @@ class AuditLog(models.Model):
     
     @classmethod
     def log_action(cls, user, action, instance, request=None, changes=None, old_values=None, new_values=None):
-        """Registrar una acción en la auditoría"""
-        from django.contrib.contenttypes.models import ContentType
+        """
+        Registrar una acción en la auditoría.
+        Sin request se usan los datos del request en curso (ver AuditMiddleware).
+        El registro se inserta por lotes dentro de la transacción en curso (ver writer).
+        """
+        from .middleware import get_current_context
+        from . import writer
         
-        content_type = ContentType.objects.get_for_model(instance)
+        company_id = getattr(instance, 'company_id', None) or getattr(user, 'company_id', None)
         
         audit = cls(
+            company_id=company_id,
             user=user,
-            username=user.username if user else 'Sistema',
+            username=(user.username if user else 'Sistema')[:150],
             action=action,
-            content_type=content_type,
+            content_type_id=writer.content_type_id(type(instance)),
             object_id=str(instance.pk),
-            object_repr=str(instance),
+            object_repr=str(instance)[:255],
             changes=changes or {},
             old_values=old_values or {},
             new_values=new_values or {},
@@ -88,10 +124,17 @@ class AuditLog(models.Model):
         if request:
             audit.ip_address = cls.get_client_ip(request)
             audit.user_agent = request.META.get('HTTP_USER_AGENT', '')
-            audit.url = request.build_absolute_uri()
-            audit.method = request.method
+            audit.url = request.build_absolute_uri()[:500]
+            audit.method = request.method[:10]
+        else:
+            context = get_current_context()
+            if context is not None:
+                audit.ip_address = context.ip_address
+                audit.user_agent = context.user_agent
+                audit.url = context.url
+                audit.method = context.method
         
-        audit.save()
+        writer.log(audit)
         return audit
     
     @staticmethod
@@ -102,4 +145,20 @@ class AuditLog(models.Model):
             ip = x_forwarded_for.split(',')[0]
         else:
             ip = request.META.get('REMOTE_ADDR')
-        return ip
\ No newline at end of file
+        return ip
+
+
+class AuditOutbox(models.Model):
+    """Lote de auditoría confirmado pendiente de insertar por el worker (modo AUDIT_ASYNC, ver writer)"""
+    
+    id = models.BigAutoField(primary_key=True)
+    payload = models.TextField()
+    events = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Lote de Auditoría Pendiente'
+        verbose_name_plural = 'Lotes de Auditoría Pendientes'
+    
+    def __str__(self):
+        return f"{self.created_at} - {self.events} eventos"
@@ -0,0 +1,207 @@
+"""
+Particiones mensuales de AuditLog.
+
+La tabla está particionada por rango de created_at (migración 0003): una partición por
+mes (UTC), audit_auditlog_pAAAAMM, más una partición por defecto que recibe lo que no cae
+en ningún mes creado. Cada partición tiene sus propios índices, así que los inserts y el
+vacuum trabajan sobre el mes en curso y no sobre todo el historial.
+
+    ensure()   crea los meses que faltan hasta AUDIT_PARTITIONS_AHEAD meses adelante y
+               saca de la partición por defecto las filas de esos meses
+    retain()   desacopla los meses más viejos que AUDIT_RETENTION_MONTHS; quedan como
+               tablas sueltas, fuera de las consultas de auditoría
+    archive()  vuelca cada tabla desacoplada a AUDIT_ARCHIVE_DIR/<tabla>.jsonl.gz y la
+               elimina (un DROP TABLE en vez de un DELETE de millones de filas)
+
+Las tres son idempotentes: si el comando se interrumpe, la próxima ejecución sigue
+donde quedó (una tabla desacoplada sin archivar se archiva en la siguiente).
+"""
+
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import AuditLog
+import gzip
+import json
+import os
+import re
+
+TABLE = AuditLog._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+# Valores por defecto si settings no los define
+PARTITIONS_AHEAD = 3
+RETENTION_MONTHS = 12
+
+# Filas por lectura del cursor al archivar
+ARCHIVE_CHUNK_SIZE = 5000
+
+_partition_name = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def month_of(value):
+    """Primer día del mes (UTC) de una fecha o datetime"""
+    if isinstance(value, datetime):
+        value = value.astimezone(dt_timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _parse(name):
+    match = _partition_name.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def attached():
+    """Meses con partición en la tabla: {mes: nombre}"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return {month: name for month, name in ((_parse(name), name) for name in names) if month}
+
+
+def detached():
+    """Particiones desacopladas pendientes de archivar: {mes: nombre}"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' AND NOT relispartition "
+            "AND pg_table_is_visible(oid) AND relname LIKE %s",
+            [f'{TABLE}_p%']
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return {month: name for month, name in ((_parse(name), name) for name in names) if month}
+
+
+def _columns():
+    """Columnas de la tabla sin las generadas (la base las calcula)"""
+    return ', '.join(_qn(field.column) for field in AuditLog._meta.concrete_fields if not field.generated)
+
+
+def _oldest_default():
+    """Mes de la fila más vieja en la partición por defecto (None si está vacía)"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN({_qn('created_at')}) FROM {_qn(DEFAULT_PARTITION)}")
+        oldest = cursor.fetchone()[0]
+    return month_of(oldest) if oldest else None
+
+
+def _create(month):
+    """
+    Crear la partición del mes con las filas que esperaban en la partición por defecto.
+    La partición se arma como tabla suelta y se acopla al final: ATTACH no bloquea los
+    inserts en la tabla padre, solo en la partición por defecto mientras la revisa.
+    """
+    name = _qn(partition_name(month))
+    start, end = _bound(month), _bound(add_months(month, 1))
+    created_at = _qn('created_at')
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {_qn(DEFAULT_PARTITION)} IN EXCLUSIVE MODE")
+        cursor.execute(
+            f"CREATE TABLE {name} (LIKE {_qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {_qn(DEFAULT_PARTITION)} "
+            f"WHERE {created_at} >= %s AND {created_at} < %s RETURNING {_columns()}) "
+            f"INSERT INTO {name} ({_columns()}) SELECT * FROM moved",
+            [start, end]
+        )
+        cursor.execute(
+            f"ALTER TABLE {_qn(TABLE)} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+
+
+def ensure(ahead=None, now=None):
+    """Crear las particiones que faltan, desde la fila más vieja sin mes hasta ahead meses adelante. Retorna los nombres creados."""
+    ahead = _setting('AUDIT_PARTITIONS_AHEAD', PARTITIONS_AHEAD) if ahead is None else ahead
+    current = month_of(now or timezone.now())
+    existing = attached()
+
+    month = min(filter(None, [_oldest_default(), current]))
+    created = []
+    while month <= add_months(current, ahead):
+        if month not in existing:
+            _create(month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def retain(months=None, now=None):
+    """Desacoplar las particiones de meses anteriores a la retención (0: conservar todo). Retorna los nombres."""
+    months = _setting('AUDIT_RETENTION_MONTHS', RETENTION_MONTHS) if months is None else months
+    if not months:
+        return []
+    cutoff = add_months(month_of(now or timezone.now()), -months)
+
+    expired = [name for month, name in sorted(attached().items()) if month < cutoff]
+    with connection.cursor() as cursor:
+        for name in expired:
+            cursor.execute(f"ALTER TABLE {_qn(TABLE)} DETACH PARTITION {_qn(name)}")
+    return expired
+
+
+def _dump(name, path):
+    """Escribir las filas de la tabla en path (JSONL con gzip) leyendo con un cursor de servidor. Retorna las filas."""
+    partial = path.with_name(path.name + '.partial')
+    rows = 0
+    with transaction.atomic(), connection.chunked_cursor() as cursor, gzip.open(partial, 'wt', encoding='utf-8') as output:
+        cursor.execute(f"SELECT {_columns()} FROM {_qn(name)} ORDER BY {_qn('created_at')}")
+        columns = None
+        while True:
+            chunk = cursor.fetchmany(ARCHIVE_CHUNK_SIZE)
+            if not chunk:
+                break
+            columns = columns or [column[0] for column in cursor.description]
+            for row in chunk:
+                output.write(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False))
+                output.write('\n')
+            rows += len(chunk)
+
+    # El archivo queda completo en disco antes de eliminar la tabla
+    with open(partial, 'rb') as written:
+        os.fsync(written.fileno())
+    os.replace(partial, path)
+    return rows
+
+
+def archive(directory=None):
+    """Archivar y eliminar las particiones desacopladas. Retorna [(nombre, filas, ruta)]."""
+    directory = Path(directory or _setting('AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive' / 'audit'))
+    directory.mkdir(parents=True, exist_ok=True)
+
+    archived = []
+    for _, name in sorted(detached().items()):
+        path = directory / f'{name}.jsonl.gz'
+        rows = _dump(name, path)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {_qn(name)}")
+        archived.append((name, rows, path))
+    return archived
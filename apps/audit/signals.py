@@ -4,60 +4,42 @@ from django.contrib.auth import get_user_model
 from django.contrib.admin.models import LogEntry
 from django.contrib.contenttypes.models import ContentType
 from .models import AuditLog
+from .middleware import get_current_user
+from . import tracking
 import json
 
 User = get_user_model()
 
 @receiver(pre_save)
 def audit_pre_save(sender, instance, **kwargs):
-    """Guardar valores anteriores antes de actualizar"""
+    """Calcular los campos modificados antes de actualizar (en memoria, ver tracking)"""
     if not sender._meta.abstract and hasattr(instance, '_audit_enabled'):
-        if instance.pk:
-            try:
-                old_instance = sender.objects.get(pk=instance.pk)
-                instance._old_values = {}
-                
-                for field in instance._meta.fields:
-                    field_name = field.name
-                    old_value = getattr(old_instance, field_name)
-                    new_value = getattr(instance, field_name)
-                    
-                    if old_value != new_value:
-                        instance._old_values[field_name] = {
-                            'old': str(old_value) if old_value else None,
-                            'new': str(new_value) if new_value else None
-                        }
-            except sender.DoesNotExist:
-                instance._old_values = {}
-        else:
+        if instance._state.adding:
             instance._old_values = {}
+            return
+        
+        old_values = tracking.changes(instance)
+        if old_values is None:
+            # Instancia que no vino de la base de datos: leer solo los campos auditados
+            original = sender._base_manager.filter(pk=instance.pk).values(
+                *[field.attname for field in tracking.audited_fields(sender)]
+            ).first()
+            old_values = tracking.changes(instance, original) if original else {}
+        instance._old_values = old_values
 
 @receiver(post_save)
 def audit_post_save(sender, instance, created, **kwargs):
     """Registrar creación o actualización en auditoría"""
     if not sender._meta.abstract and hasattr(instance, '_audit_enabled'):
-        from django.contrib.auth.models import AnonymousUser
-        
-        # Obtener usuario del request (si existe)
-        user = None
-        request = getattr(instance, '_audit_request', None)
-        
-        if request:
-            user = request.user if not isinstance(request.user, AnonymousUser) else None
-        
-        if not user:
-            # Intentar obtener usuario del hilo
-            from .middleware import get_current_user
-            user = get_current_user()
+        # Usuario y datos del request en curso (AuditMiddleware)
+        user = get_current_user()
         
         if created:
             AuditLog.log_action(
                 user=user,
                 action='CREATE',
                 instance=instance,
-                request=request,
-                new_values={field.name: str(getattr(instance, field.name)) 
-                           for field in instance._meta.fields}
+                new_values=tracking.current_values(instance)
             )
         else:
             old_values = getattr(instance, '_old_values', {})
@@ -66,23 +48,23 @@ def audit_post_save(sender, instance, created, **kwargs):
                     user=user,
                     action='UPDATE',
                     instance=instance,
-                    request=request,
                     changes=old_values,
                     old_values={k: v['old'] for k, v in old_values.items()},
                     new_values={k: v['new'] for k, v in old_values.items()}
                 )
+        
+        # Los próximos guardados comparan contra lo recién guardado
+        tracking.snapshot(instance)
 
 @receiver(post_delete)
 def audit_post_delete(sender, instance, **kwargs):
     """Registrar eliminación en auditoría"""
     if not sender._meta.abstract and hasattr(instance, '_audit_enabled'):
-        from .middleware import get_current_user
         user = get_current_user()
         
         AuditLog.log_action(
             user=user,
             action='DELETE',
             instance=instance,
-            new_values={field.name: str(getattr(instance, field.name)) 
-                       for field in instance._meta.fields}
+            new_values=tracking.current_values(instance)
         )
\ No newline at end of file
@@ -0,0 +1,11 @@
+from celery import shared_task
+from django.db import OperationalError
+from . import writer
+
+
+# Cada lote se inserta y se borra del outbox en la misma transacción: si el worker muere
+# a mitad de camino el lote sigue en el outbox y el próximo drenado lo toma
+@shared_task(ignore_result=True, autoretry_for=(OperationalError,), retry_backoff=True, max_retries=None)
+def drain_outbox(using='default'):
+    """Insertar los lotes de auditoría confirmados en el outbox"""
+    writer.drain(using)
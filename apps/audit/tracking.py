@@ -0,0 +1,92 @@
+"""
+Seguimiento de cambios por campo para los modelos auditados.
+
+Al cargar una instancia desde la base de datos (Model.from_db) se guarda una copia de
+los valores de sus campos auditados; al guardar, la diferencia se calcula en memoria
+contra esa copia en vez de volver a leer la fila. Después de cada guardado la copia
+se actualiza, así que guardados sucesivos solo registran lo que cambió entre ellos.
+
+Los valores se leen por attname (category_id y no category), de modo que comparar o
+registrar una clave foránea nunca consulta el objeto relacionado.
+"""
+
+_fields_cache = {}
+
+
+class AuditedModelMixin:
+    """
+    Mezcla para modelos auditados (va antes de models.Model en las bases).
+    audit_fields limita los campos auditados; por defecto son todos los campos
+    concretos menos audit_exclude.
+    """
+
+    _audit_enabled = True
+
+    audit_fields = None
+    audit_exclude = ('created_at', 'updated_at')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        snapshot(instance)
+        return instance
+
+
+def audited_fields(model):
+    """Campos concretos auditados del modelo"""
+    fields = _fields_cache.get(model)
+    if fields is None:
+        names = getattr(model, 'audit_fields', None)
+        exclude = getattr(model, 'audit_exclude', ())
+        fields = [
+            field for field in model._meta.concrete_fields
+            if (names is None or field.name in names) and field.name not in exclude
+        ]
+        _fields_cache[model] = fields
+    return fields
+
+
+def _format(value):
+    return None if value is None else str(value)
+
+
+def snapshot(instance):
+    """Guardar los valores actuales de los campos auditados (los diferidos se omiten)"""
+    values = instance.__dict__
+    instance._audit_original = {
+        field.attname: values[field.attname]
+        for field in audited_fields(type(instance))
+        if field.attname in values
+    }
+
+
+def current_values(instance):
+    """Valores de los campos auditados cargados, formateados para el registro: {nombre: valor}"""
+    values = instance.__dict__
+    return {
+        field.name: _format(values[field.attname])
+        for field in audited_fields(type(instance))
+        if field.attname in values
+    }
+
+
+def changes(instance, original=None):
+    """
+    Campos auditados que cambiaron desde la copia (o desde original, {attname: valor}):
+    {nombre: {'old': ..., 'new': ...}}. None si la instancia no tiene copia.
+    """
+    if original is None:
+        original = getattr(instance, '_audit_original', None)
+        if original is None:
+            return None
+
+    values = instance.__dict__
+    result = {}
+    for field in audited_fields(type(instance)):
+        if field.attname not in original or field.attname not in values:
+            continue
+        old_value = original[field.attname]
+        new_value = values[field.attname]
+        if old_value != new_value:
+            result[field.name] = {'old': _format(old_value), 'new': _format(new_value)}
+    return result
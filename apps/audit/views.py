@@ -1,41 +1,90 @@
+from datetime import datetime, time, timedelta
+from django.apps import apps
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchQuery
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from inventory.pagination import paginate
 from .models import AuditLog
+from .tracking import AuditedModelMixin
+import re
+
+
+def _day_start(value):
+    """Inicio del día (zona horaria actual) de una fecha AAAA-MM-DD; None si no es válida"""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min)) if day else None
+
+
+def _search_query(text):
+    """Búsqueda por prefijo de cada palabra: 'prod cost' encuentra 'Producto' con cambios en cost_price"""
+    terms = re.findall(r'\w+', text.lower())
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config='simple')
+
 
 @login_required
 @permission_required('audit.view_auditlog', raise_exception=True)
 def audit_list(request):
+    """
+    Auditoría de la compañía, de la más reciente a la más antigua.
+    La búsqueda usa el índice de texto (objeto, usuario y campos modificados), los filtros
+    de compañía, modelo y fechas siguen los índices compuestos y el rango de fechas
+    descarta las particiones mensuales que no aplican.
+    """
     query = request.GET.get('q', '')
     action = request.GET.get('action', '')
+    model = request.GET.get('model', '')
+    date_from = request.GET.get('date_from', '')
+    date_to = request.GET.get('date_to', '')
     
-    audit_list = AuditLog.objects.select_related('user').order_by('-created_at')
+    audit_list = AuditLog.objects.filter(
+        company=request.user.company
+    ).select_related('user').defer('search', 'changes', 'old_values', 'new_values')
     
-    if query:
-        audit_list = audit_list.filter(
-            Q(object_repr__icontains=query) |
-            Q(username__icontains=query)
-        )
+    search = _search_query(query)
+    if search is not None:
+        audit_list = audit_list.filter(search=search)
     
     if action:
         audit_list = audit_list.filter(action=action)
     
-    paginator = Paginator(audit_list, 20)
-    page = request.GET.get('page')
-    audits = paginator.get_page(page)
+    if model.isdigit():
+        audit_list = audit_list.filter(content_type_id=model)
+    
+    start = _day_start(date_from)
+    if start:
+        audit_list = audit_list.filter(created_at__gte=start)
+    
+    end = _day_start(date_to)
+    if end:
+        audit_list = audit_list.filter(created_at__lt=end + timedelta(days=1))
+    
+    audits = paginate(request, audit_list, 20, ('-created_at', '-id'))
     
     actions = AuditLog.ACTION_CHOICES
+    audited = [model_class for model_class in apps.get_models() if issubclass(model_class, AuditedModelMixin)]
+    models = sorted(ContentType.objects.get_for_models(*audited).items(), key=lambda item: item[0]._meta.verbose_name)
     
     return render(request, 'audit/audit_list.html', {
         'audits': audits,
         'actions': actions,
+        'models': [(content_type.pk, model_class._meta.verbose_name_plural) for model_class, content_type in models],
         'selected_action': action,
+        'selected_model': model,
+        'date_from': date_from,
+        'date_to': date_to,
         'query': query
     })
 
 @login_required
 @permission_required('audit.view_auditlog', raise_exception=True)
 def audit_detail(request, pk):
-    audit = get_object_or_404(AuditLog.objects.select_related('user'), pk=pk)
+    audit = get_object_or_404(AuditLog.objects.filter(company=request.user.company).select_related('user'), pk=pk)
     return render(request, 'audit/audit_detail.html', {'audit': audit})
\ No newline at end of file
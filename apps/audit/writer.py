@@ -0,0 +1,212 @@
+"""
+Escritura de registros de auditoría por lotes.
+
+Los eventos registrados dentro de un bloque writer.atomic() se acumulan en memoria y se
+insertan con un solo bulk_create justo antes de que salga el bloque más externo, todavía
+dentro de la transacción: el registro confirma o se revierte junto con los datos, y si
+el INSERT falla la transacción se revierte con el error. Los eventos de un
+writer.atomic anidado que sale con una excepción se descartan con su savepoint.
+
+Fuera de un writer.atomic los eventos se insertan en el acto, dentro de la transacción
+en curso si la hay (un atomic anidado común que se revierte se lleva su INSERT). Los
+bloques que puedan revertirse dentro de un writer.atomic deben abrirse también con
+writer.atomic para que sus eventos se descarten con ellos. Las vistas que guardan modelos
+auditados (productos, categorías, proveedores, bodegas) abren sus transacciones con
+writer.atomic.
+
+Si el lote llega a AUDIT_BUFFER_SIZE eventos del bloque interior se inserta ahí mismo,
+así la memoria por transacción queda acotada.
+
+Con AUDIT_ASYNC el lote no se inserta en AuditLog sino como una fila de AuditOutbox en
+la misma transacción (un INSERT en vez de uno por evento y sin mantener los índices de
+búsqueda); al confirmar se avisa al worker (tasks.drain_outbox), que inserta los eventos
+y borra la fila en una misma transacción. Un lote confirmado está siempre en la base: si
+el aviso se pierde lo toma el próximo drenado o el comando drain_audit_outbox. Si el
+outbox acumula AUDIT_ASYNC_MAX_PENDING lotes sin drenar, los lotes se insertan en el
+proceso: la cola frena al que escribe, nunca descarta eventos.
+"""
+
+from contextlib import ContextDecorator
+from weakref import WeakKeyDictionary
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
+from django.db import connections, router, transaction
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Valores por defecto si settings no los define
+BUFFER_SIZE = 1000
+MAX_PENDING = 1000
+
+# Segundos entre mediciones de los lotes pendientes en el outbox
+BACKLOG_CHECK_INTERVAL = 5
+
+# Lotes del outbox por transacción al drenar
+DRAIN_CHUNK = 50
+
+_content_types = {}
+
+# Por conexión: lote del writer.atomic más externo abierto
+_scopes = WeakKeyDictionary()
+
+# Lotes pendientes en el outbox, según la última medición más los agregados desde entonces
+_backlog = {'checked_at': None, 'pending': 0}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def content_type_id(model):
+    """Id del ContentType del modelo, consultado una vez por proceso"""
+    pk = _content_types.get(model)
+    if pk is None:
+        pk = ContentType.objects.get_for_model(model).pk
+        _content_types[model] = pk
+    return pk
+
+
+class _Scope:
+    """Eventos pendientes de un writer.atomic y el inicio de cada bloque anidado en la lista"""
+
+    def __init__(self, using):
+        self.using = using
+        self.events = []
+        self.blocks = []
+
+
+class atomic(ContextDecorator):
+    """
+    transaction.atomic que acumula los eventos de auditoría del bloque y los inserta
+    en un solo bulk_create antes de salir del bloque más externo.
+    """
+
+    def __init__(self, using=None, savepoint=True, durable=False):
+        self.using = using
+        self.savepoint = savepoint
+        self.durable = durable
+
+    def __enter__(self):
+        connection = transaction.get_connection(self.using)
+        block = transaction.atomic(self.using, self.savepoint, self.durable)
+        block.__enter__()
+        scope = _scopes.get(connection)
+        if scope is None:
+            scope = _scopes[connection] = _Scope(connection.alias)
+        scope.blocks.append((block, len(scope.events)))
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        connection = transaction.get_connection(self.using)
+        scope = _scopes[connection]
+        block, start = scope.blocks.pop()
+        if not scope.blocks:
+            del _scopes[connection]
+
+        if exc_type is not None or transaction.get_rollback(self.using):
+            # Los eventos del bloque se van con su savepoint (o con la transacción)
+            del scope.events[start:]
+        elif not scope.blocks and scope.events:
+            try:
+                flush(scope.events, scope.using)
+            except Exception as error:
+                # El lote no se pudo insertar: la transacción se revierte con el error
+                block.__exit__(type(error), error, error.__traceback__)
+                raise
+        return block.__exit__(exc_type, exc_value, traceback)
+
+
+def log(event):
+    """Registrar un AuditLog sin guardar: se inserta al salir del writer.atomic en curso, o en el acto"""
+    using = router.db_for_write(type(event))
+    scope = _scopes.get(connections[using])
+    if scope is None:
+        flush([event], using)
+        return
+
+    scope.events.append(event)
+    _, start = scope.blocks[-1]
+    if len(scope.events) - start >= _setting('AUDIT_BUFFER_SIZE', BUFFER_SIZE):
+        # Contrapresión: insertar los eventos del bloque interior (los de bloques externos
+        # no pueden insertarse dentro de un savepoint que quizás se revierta)
+        flush(scope.events[start:], scope.using)
+        del scope.events[start:]
+
+
+def write(events, using):
+    """Insertar eventos en AuditLog con un bulk_create"""
+    model = type(events[0])
+    model._default_manager.using(using).bulk_create(
+        events,
+        batch_size=_setting('AUDIT_BUFFER_SIZE', BUFFER_SIZE)
+    )
+
+
+def flush(events, using):
+    """Insertar un lote, o dejarlo en el outbox para el worker si hay modo async y el outbox no está lleno"""
+    if not _setting('AUDIT_ASYNC', False) or _backlog_full(using):
+        write(events, using)
+        return
+
+    from .models import AuditOutbox
+
+    AuditOutbox.objects.using(using).create(payload=serialize(events), events=len(events))
+    _backlog['pending'] += 1
+    transaction.on_commit(lambda: _notify(using), using=using)
+
+
+def _notify(using):
+    from .tasks import drain_outbox
+    try:
+        drain_outbox.delay(using)
+    except Exception:
+        # El lote ya está confirmado en el outbox; lo toma el próximo drenado
+        logger.exception('No se pudo avisar al worker de auditoría')
+
+
+def drain(using='default'):
+    """Insertar en AuditLog los lotes del outbox; cada lote se inserta y se borra en la misma transacción. Retorna los eventos insertados."""
+    from .models import AuditOutbox
+
+    written = 0
+    while True:
+        with transaction.atomic(using=using):
+            pending = list(
+                AuditOutbox.objects.using(using).select_for_update(skip_locked=True).order_by('id')[:DRAIN_CHUNK]
+            )
+            if not pending:
+                return written
+            events = [event for batch in pending for event in deserialize(batch.payload)]
+            if events:
+                write(events, using)
+            AuditOutbox.objects.using(using).filter(pk__in=[batch.pk for batch in pending]).delete()
+        written += len(events)
+
+
+def serialize(events):
+    # Sin las columnas generadas: las calcula la base y leerlas consultaría la fila
+    fields = [field.name for field in type(events[0])._meta.concrete_fields if not field.generated and not field.primary_key]
+    return serializers.serialize('json', events, fields=fields)
+
+
+def deserialize(payload):
+    return [item.object for item in serializers.deserialize('json', payload)]
+
+
+def _backlog_full(using):
+    now = time.monotonic()
+    checked_at = _backlog['checked_at']
+    if checked_at is None or now - checked_at >= BACKLOG_CHECK_INTERVAL:
+        _backlog['checked_at'] = now
+        _backlog['pending'] = pending_batches(using)
+    return _backlog['pending'] >= _setting('AUDIT_ASYNC_MAX_PENDING', MAX_PENDING)
+
+
+def pending_batches(using='default'):
+    """Lotes en el outbox sin drenar (contados hasta el tope)"""
+    from .models import AuditOutbox
+
+    limit = _setting('AUDIT_ASYNC_MAX_PENDING', MAX_PENDING)
+    return AuditOutbox.objects.using(using).order_by()[:limit].count()
@@ -0,0 +1,100 @@
+"""
+Alertas de stock mínimo.
+
+Cada operación de inventario ya anota en su lista de cambios (summary.Change) cuántas
+filas entraron o salieron de la condición de stock bajo. emit() recorre solo esos
+cambios: una fila que cruzó hacia abajo registra un evento LOW abierto y una que
+volvió a superar el mínimo resuelve su LOW y registra un evento NORMAL, en la misma
+transacción que el movimiento. Consultar las alertas cuesta lo que haya de alertas,
+no lo que haya de inventario.
+
+Los cambios de stock mínimo fuera de los movimientos (admin, carga inicial) no pasan
+por aquí; sync() reconcilia las alertas abiertas con el inventario.
+"""
+
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+from django.utils import timezone
+from .models import Inventory, StockAlert
+from . import summary
+
+
+def _crossings(changes):
+    """Cruce neto por fila: {(company_id, product_id, warehouse_id): (sentido, cantidad, mínimo)}"""
+    crossings = {}
+    for change in changes:
+        key = (change.company_id, change.product_id, change.warehouse_id)
+        direction, quantity, min_stock = crossings.get(key, (0, None, None))
+        if change.quantity is not None:
+            quantity, min_stock = change.quantity, change.min_stock
+        crossings[key] = (direction + change.low_stock, quantity, min_stock)
+    return {key: crossing for key, crossing in crossings.items() if crossing[0]}
+
+
+def _resolve(keys, when):
+    """Cerrar las alertas abiertas de las filas indicadas"""
+    if not keys:
+        return 0
+    condition = reduce(or_, (Q(product_id=product_id, warehouse_id=warehouse_id) for _, product_id, warehouse_id in keys))
+    return StockAlert.objects.filter(condition, is_open=True).update(is_open=False, resolved_at=when)
+
+
+def emit(changes, when=None):
+    """Registrar los cruces de stock mínimo de una lista de cambios. Retorna las alertas creadas."""
+    crossings = _crossings(changes or [])
+    if not crossings:
+        return []
+    when = when or timezone.now()
+
+    recovered = [key for key, (direction, _, _) in crossings.items() if direction < 0]
+    _resolve(recovered, when)
+
+    # ignore_conflicts: si la fila ya tenía una alerta abierta (mínimo editado fuera de
+    # un movimiento) se conserva la existente en vez de fallar el movimiento
+    return StockAlert.objects.bulk_create([
+        StockAlert(
+            company_id=company_id,
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            alert_type='LOW' if direction > 0 else 'NORMAL',
+            quantity=quantity,
+            min_stock=min_stock,
+            is_open=direction > 0,
+            resolved_at=None if direction > 0 else when,
+            created_at=when,
+        )
+        for (company_id, product_id, warehouse_id), (direction, quantity, min_stock) in sorted(
+            crossings.items(), key=lambda item: (str(item[0][1]), str(item[0][2]))
+        )
+    ], ignore_conflicts=True)
+
+
+def sync(company_id=None):
+    """
+    Alinear las alertas abiertas con el inventario: abrir las filas bajo el mínimo sin
+    alerta y cerrar las alertas de filas que ya no lo están.
+    Retorna (abiertas, cerradas).
+    """
+    inventories = Inventory.objects.all()
+    alerts = StockAlert.objects.filter(is_open=True)
+    if company_id:
+        inventories = inventories.filter(company_id=company_id)
+        alerts = alerts.filter(company_id=company_id)
+
+    low = {
+        (row[0], row[1], row[2]): row[3:]
+        for row in inventories.low_stock().values_list(
+            'company_id', 'product_id', 'warehouse_id', 'quantity', 'min_stock'
+        ).iterator(chunk_size=2000)
+    }
+    open_keys = set(alerts.values_list('company_id', 'product_id', 'warehouse_id'))
+
+    now = timezone.now()
+    closed = _resolve([key for key in open_keys if key not in low], now)
+    opened = emit([
+        summary.Change(company_id, product_id, warehouse_id, 0, 0, 0, 1, quantity, min_stock)
+        for (company_id, product_id, warehouse_id), (quantity, min_stock) in low.items()
+        if (company_id, product_id, warehouse_id) not in open_keys
+    ], when=now)
+    return len(opened), closed
@@ -0,0 +1,470 @@
+"""
+Primitivas de libro de inventario.
+
+Cada operación actualiza el saldo con una sola sentencia UPDATE/INSERT ... RETURNING:
+la fila queda bloqueada hasta el fin de la transacción sin SELECT ... FOR UPDATE previo,
+sin escribir la fila completa y sin volver a leerla para conocer el nuevo saldo.
+
+La misma sentencia mantiene el costo promedio ponderado de la fila: las entradas suman
+su valor y recalculan el promedio, las salidas descuentan al costo promedio vigente.
+
+Para productos o bodegas con stock fragmentado las entradas suman en uno de
+SHARD_COUNT fragmentos (InventoryShard) elegido al azar, sin reescribir la fila de
+inventario. El saldo que registra el kardex exige ver las entradas anteriores, así que
+las entradas de una misma fila se serializan con un bloqueo consultivo. Los fragmentos se incorporan a Inventory al
+compactar, antes de cada salida (que así se valoriza al costo promedio de base más
+fragmentos) o cuando una reserva no alcanza con la cantidad base.
+
+Las primitivas que reciben changes anotan ahí la diferencia producida en la fila
+(summary.Change), para que el servicio actualice los resúmenes de stock al final.
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+from django.db import connection
+from django.utils import timezone
+from .models import Inventory, InventoryShard
+from . import summary
+import hashlib
+import random
+import uuid
+
+Balance = namedtuple('Balance', ['quantity', 'total_value', 'average_cost'])
+
+VALUE_PRECISION = Decimal('0.01')
+COST_PRECISION = Decimal('0.0001')
+
+# Fragmentos por fila de inventario en modo de stock fragmentado
+SHARD_COUNT = 16
+
+
+def to_decimal(value):
+    """Normalizar costos recibidos como float/str/int a Decimal"""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value or 0))
+
+
+def apply_entry(balance, quantity, unit_cost):
+    """Saldo resultante de una entrada valorizada a unit_cost"""
+    new_quantity = balance.quantity + quantity
+    total_value = (balance.total_value + quantity * unit_cost).quantize(VALUE_PRECISION)
+    if new_quantity <= 0:
+        return Balance(new_quantity, total_value, unit_cost)
+    return Balance(new_quantity, total_value, (total_value / new_quantity).quantize(COST_PRECISION))
+
+
+def apply_output(balance, quantity):
+    """Saldo resultante de una salida valorizada al costo promedio vigente"""
+    new_quantity = balance.quantity - quantity
+    if new_quantity == 0:
+        total_value = Decimal('0.00')
+    else:
+        total_value = (balance.total_value - quantity * balance.average_cost).quantize(VALUE_PRECISION)
+    return Balance(new_quantity, total_value, balance.average_cost)
+
+
+def _column(field_name):
+    return connection.ops.quote_name(Inventory._meta.get_field(field_name).column)
+
+
+def _prep(field_name, value):
+    return Inventory._meta.get_field(field_name).get_db_prep_value(value, connection)
+
+
+def _shard_column(field_name):
+    return connection.ops.quote_name(InventoryShard._meta.get_field(field_name).column)
+
+
+def _key_params(product, warehouse):
+    return [
+        _prep('company', product.company_id),
+        _prep('product', product.id),
+        _prep('warehouse', warehouse.id),
+    ]
+
+
+def _balance(row):
+    return Balance(row[0], to_decimal(row[1]), to_decimal(row[2]))
+
+
+def is_sharded(product, warehouse):
+    """Las entradas del producto o de la bodega se registran en fragmentos"""
+    return product.sharded_stock or warehouse.sharded_stock
+
+
+def add_stock(product, warehouse, quantity, unit_cost, when=None, changes=None):
+    """
+    Sumar stock valorizado a unit_cost, creando la fila de inventario si no existe.
+    Retorna el Balance resultante.
+    """
+    when = when or timezone.now()
+    unit_cost = to_decimal(unit_cost)
+    table = connection.ops.quote_name(Inventory._meta.db_table)
+    quantity_column = _column('quantity')
+    value_column = _column('total_value')
+
+    sql = f"""
+        INSERT INTO {table} (
+            {_column('id')}, {_column('company')}, {_column('product')}, {_column('warehouse')},
+            {quantity_column}, {value_column}, {_column('average_cost')},
+            {_column('reserved_quantity')}, {_column('min_stock')}, {_column('location')},
+            {_column('last_movement')}, {_column('created_at')}, {_column('updated_at')}
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 0, 0, '', %s, %s, %s)
+        ON CONFLICT ({_column('company')}, {_column('product')}, {_column('warehouse')})
+        DO UPDATE SET
+            {quantity_column} = {table}.{quantity_column} + EXCLUDED.{quantity_column},
+            {value_column} = {table}.{value_column} + EXCLUDED.{value_column},
+            {_column('average_cost')} = ROUND(
+                ({table}.{value_column} + EXCLUDED.{value_column})
+                / ({table}.{quantity_column} + EXCLUDED.{quantity_column}), 4
+            ),
+            {_column('last_movement')} = EXCLUDED.{_column('last_movement')},
+            {_column('updated_at')} = EXCLUDED.{_column('updated_at')}
+        RETURNING {quantity_column}, {value_column}, {_column('average_cost')}, {_column('min_stock')}
+    """
+    value = (quantity * unit_cost).quantize(VALUE_PRECISION)
+    timestamp = _prep('last_movement', when)
+    params = [_prep('id', uuid.uuid4())] + _key_params(product, warehouse) + [
+        quantity,
+        value,
+        unit_cost,
+        timestamp,
+        timestamp,
+        timestamp,
+    ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    balance = _balance(row)
+    if changes is not None:
+        changes.append(summary.diff(
+            product.company_id, product.id, warehouse.id,
+            (balance.quantity - quantity, balance.total_value - value),
+            (balance.quantity, balance.total_value),
+            row[3]
+        ))
+    return balance
+
+
+def remove_stock(product, warehouse, quantity, when=None, error_label='Stock insuficiente', from_reserved=False,
+                 changes=None):
+    """
+    Restar stock solo si hay saldo suficiente, valorizado al costo promedio vigente.
+    Sin from_reserved la salida solo puede consumir stock no reservado
+    (UPDATE ... WHERE quantity - reserved_quantity >= n); con from_reserved consume
+    una reserva previa y descuenta también reserved_quantity.
+    Retorna el Balance resultante o lanza ValueError si ninguna fila fue actualizada.
+    """
+    when = when or timezone.now()
+    table = connection.ops.quote_name(Inventory._meta.db_table)
+    id_column = _column('id')
+    quantity_column = _column('quantity')
+    reserved_column = _column('reserved_quantity')
+    value_column = _column('total_value')
+
+    if from_reserved:
+        reserved_set = f"{reserved_column} = {table}.{reserved_column} - %s,"
+        guard = f"{table}.{quantity_column} >= %s AND {table}.{reserved_column} >= %s"
+        guard_params = [quantity, quantity]
+        reserved_params = [quantity]
+    else:
+        reserved_set = ""
+        guard = f"{table}.{quantity_column} - {table}.{reserved_column} >= %s"
+        guard_params = [quantity]
+        reserved_params = []
+
+    # El valor anterior se lee de la misma fila bloqueada (old) para conocer la diferencia
+    sql = f"""
+        UPDATE {table} SET
+            {quantity_column} = {table}.{quantity_column} - %s,
+            {reserved_set}
+            {value_column} = CASE
+                WHEN {table}.{quantity_column} = %s THEN 0
+                ELSE ROUND({table}.{value_column} - %s * {table}.{_column('average_cost')}, 2)
+            END,
+            {_column('last_movement')} = %s,
+            {_column('updated_at')} = %s
+        FROM (
+            SELECT {id_column}, {value_column}
+            FROM {table}
+            WHERE {_column('company')} = %s
+              AND {_column('product')} = %s
+              AND {_column('warehouse')} = %s
+            FOR UPDATE
+        ) old
+        WHERE {table}.{id_column} = old.{id_column}
+          AND {guard}
+        RETURNING {table}.{quantity_column}, {table}.{value_column}, {table}.{_column('average_cost')},
+                  {table}.{id_column}, old.{value_column}, {table}.{_column('min_stock')}
+    """
+    timestamp = _prep('last_movement', when)
+    params = (
+        [quantity] + reserved_params + [quantity, quantity, timestamp, timestamp]
+        + _key_params(product, warehouse) + guard_params
+    )
+    if is_sharded(product, warehouse):
+        # Incorporar antes los fragmentos: la salida se descuenta al costo promedio de base
+        # más fragmentos, el mismo que registra el kardex
+        _fold_key(product, warehouse, changes)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    if row is not None:
+        balance = _balance(row)
+        if changes is not None:
+            changes.append(summary.diff(
+                product.company_id, product.id, warehouse.id,
+                (balance.quantity + quantity, to_decimal(row[4])),
+                (balance.quantity, balance.total_value),
+                row[5]
+            ))
+        return balance
+
+    _raise_unavailable(product, warehouse, quantity, error_label, from_reserved)
+
+
+def reserve_stock(product, warehouse, quantity, error_label='Stock disponible insuficiente', changes=None):
+    """
+    Reservar stock disponible sin bloquear la fila más allá de la propia sentencia
+    (UPDATE ... WHERE quantity - reserved_quantity >= n).
+    Retorna el id del inventario reservado o lanza ValueError.
+    """
+    table = connection.ops.quote_name(Inventory._meta.db_table)
+    quantity_column = _column('quantity')
+    reserved_column = _column('reserved_quantity')
+
+    sql = f"""
+        UPDATE {table} SET
+            {reserved_column} = {reserved_column} + %s
+        WHERE {_column('company')} = %s
+          AND {_column('product')} = %s
+          AND {_column('warehouse')} = %s
+          AND {quantity_column} - {reserved_column} >= %s
+        RETURNING {_column('id')}
+    """
+    params = [quantity] + _key_params(product, warehouse) + [quantity]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        if row is None and is_sharded(product, warehouse) and _fold_key(product, warehouse, changes):
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+
+    if row is not None:
+        return Inventory._meta.get_field('id').to_python(row[0])
+
+    _raise_unavailable(product, warehouse, quantity, error_label)
+
+
+def add_stock_sharded(product, warehouse, quantity, unit_cost, when=None, changes=None):
+    """
+    Sumar stock valorizado a unit_cost en un fragmento elegido al azar, sin escribir
+    la fila de inventario. Retorna el Balance resultante (base más fragmentos).
+    """
+    when = when or timezone.now()
+    unit_cost = to_decimal(unit_cost)
+    inventory_id = _inventory_id(product, warehouse)
+    _lock_balance(inventory_id)
+    table = connection.ops.quote_name(InventoryShard._meta.db_table)
+    quantity_column = _shard_column('quantity')
+    value_column = _shard_column('total_value')
+
+    sql = f"""
+        INSERT INTO {table} (
+            {_shard_column('id')}, {_shard_column('inventory')}, {_shard_column('shard')},
+            {quantity_column}, {value_column}, {_shard_column('updated_at')}
+        )
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT ({_shard_column('inventory')}, {_shard_column('shard')})
+        DO UPDATE SET
+            {quantity_column} = {table}.{quantity_column} + EXCLUDED.{quantity_column},
+            {value_column} = {table}.{value_column} + EXCLUDED.{value_column},
+            {_shard_column('updated_at')} = EXCLUDED.{_shard_column('updated_at')}
+    """
+    value = (quantity * unit_cost).quantize(VALUE_PRECISION)
+    params = [
+        _prep('id', uuid.uuid4()),
+        _prep('id', inventory_id),
+        random.randrange(SHARD_COUNT),
+        quantity,
+        value,
+        _prep('updated_at', when),
+    ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+    if changes is not None:
+        # Solo cambia el total: la cantidad base (con stock, bajo stock) sigue igual
+        changes.append(summary.Change(product.company_id, product.id, warehouse.id, quantity, value, 0, 0))
+
+    return live_balance(inventory_id)
+
+
+def _lock_balance(inventory_id):
+    """
+    Serializar el saldo de una fila fragmentada hasta el fin de la transacción.
+    El bloqueo consultivo ordena las entradas a fragmentos entre sí; FOR SHARE de la
+    fila espera a las salidas y compactaciones en curso, que la bloquean FOR UPDATE
+    antes de tocar los fragmentos (el mismo orden: fila y luego fragmentos).
+    """
+    key = int(hashlib.sha256(f'inventory:{inventory_id}'.encode()).hexdigest()[:15], 16)
+    table = connection.ops.quote_name(Inventory._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+        cursor.execute(
+            f"SELECT 1 FROM {table} WHERE {_column('id')} = %s FOR SHARE",
+            [_prep('id', inventory_id)]
+        )
+
+
+def live_balance(inventory_id):
+    """
+    Saldo de una fila de inventario incluyendo sus fragmentos, sin bloquear.
+    Solo es exacto con la fila serializada (_lock_balance o FOR UPDATE).
+    """
+    inventory = connection.ops.quote_name(Inventory._meta.db_table)
+    shards = connection.ops.quote_name(InventoryShard._meta.db_table)
+
+    sql = f"""
+        SELECT
+            i.{_column('quantity')} + COALESCE(SUM(s.{_shard_column('quantity')}), 0),
+            i.{_column('total_value')} + COALESCE(SUM(s.{_shard_column('total_value')}), 0)
+        FROM {inventory} i
+        LEFT JOIN {shards} s ON s.{_shard_column('inventory')} = i.{_column('id')}
+        WHERE i.{_column('id')} = %s
+        GROUP BY i.{_column('id')}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_prep('id', inventory_id)])
+        quantity, total_value = cursor.fetchone()
+
+    total_value = to_decimal(total_value)
+    average_cost = (total_value / quantity).quantize(COST_PRECISION) if quantity > 0 else to_decimal(0)
+    return Balance(quantity, total_value, average_cost)
+
+
+def _inventory_id(product, warehouse):
+    """Id de la fila de inventario, creándola con cantidad 0 si no existe"""
+    lookup = Inventory.objects.filter(
+        company_id=product.company_id,
+        product=product,
+        warehouse=warehouse
+    ).values_list('id', flat=True)
+
+    inventory_id = lookup.first()
+    if inventory_id is None:
+        Inventory.objects.bulk_create(
+            [Inventory(company_id=product.company_id, product=product, warehouse=warehouse)],
+            ignore_conflicts=True
+        )
+        inventory_id = lookup.first()
+    return inventory_id
+
+
+def _fold_key(product, warehouse, changes=None):
+    """
+    Bloquear la fila de inventario e incorporar sus fragmentos.
+    Retorna True si la fila tenía fragmentos.
+    """
+    inventory_id = Inventory.objects.select_for_update().filter(
+        company_id=product.company_id,
+        product=product,
+        warehouse=warehouse
+    ).values_list('id', flat=True).first()
+    return inventory_id is not None and bool(fold_shards([inventory_id], changes=changes))
+
+
+def fold_shards(inventory_ids, when=None, changes=None):
+    """
+    Incorporar los fragmentos de las filas indicadas a Inventory en una sola sentencia
+    (DELETE ... RETURNING + UPDATE ... FROM), recalculando el costo promedio.
+    Las filas que deben bloquearse juntas se bloquean antes en el orden global.
+    Retorna {inventory_id: Balance} de las filas que tenían fragmentos.
+    """
+    if not inventory_ids:
+        return {}
+
+    when = when or timezone.now()
+    inventory = connection.ops.quote_name(Inventory._meta.db_table)
+    shards = connection.ops.quote_name(InventoryShard._meta.db_table)
+    quantity_column = _column('quantity')
+    value_column = _column('total_value')
+
+    sql = f"""
+        WITH folded AS (
+            DELETE FROM {shards}
+            WHERE {_shard_column('inventory')} = ANY(%s)
+            RETURNING {_shard_column('inventory')} AS inventory_id,
+                      {_shard_column('quantity')} AS quantity,
+                      {_shard_column('total_value')} AS total_value,
+                      {_shard_column('updated_at')} AS updated_at
+        ), totals AS (
+            SELECT inventory_id, SUM(quantity) AS quantity, SUM(total_value) AS total_value,
+                   MAX(updated_at) AS updated_at
+            FROM folded
+            GROUP BY inventory_id
+        )
+        UPDATE {inventory} SET
+            {quantity_column} = {inventory}.{quantity_column} + totals.quantity,
+            {value_column} = {inventory}.{value_column} + totals.total_value,
+            {_column('average_cost')} = CASE
+                WHEN {inventory}.{quantity_column} + totals.quantity > 0 THEN ROUND(
+                    ({inventory}.{value_column} + totals.total_value)
+                    / ({inventory}.{quantity_column} + totals.quantity), 4
+                )
+                ELSE {inventory}.{_column('average_cost')}
+            END,
+            {_column('last_movement')} = GREATEST({inventory}.{_column('last_movement')}, totals.updated_at),
+            {_column('updated_at')} = %s
+        FROM totals
+        WHERE {inventory}.{_column('id')} = totals.inventory_id
+        RETURNING {inventory}.{_column('id')}, {inventory}.{quantity_column},
+                  {inventory}.{value_column}, {inventory}.{_column('average_cost')},
+                  {inventory}.{_column('company')}, {inventory}.{_column('product')},
+                  {inventory}.{_column('warehouse')}, {inventory}.{_column('min_stock')},
+                  totals.quantity, totals.total_value
+    """
+    params = [[_prep('id', inventory_id) for inventory_id in inventory_ids], _prep('updated_at', when)]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    if changes is not None:
+        # Los fragmentos pasan a la cantidad base: el total no cambia
+        for row in rows:
+            balance = _balance(row[1:4])
+            changes.append(summary.diff(
+                row[4], row[5], row[6],
+                (balance.quantity - row[8], balance.total_value - to_decimal(row[9])),
+                (balance.quantity, balance.total_value),
+                row[7],
+                live_units=0,
+                live_value=to_decimal(0)
+            ))
+
+    return {row[0]: _balance(row[1:4]) for row in rows}
+
+
+def _raise_unavailable(product, warehouse, quantity, error_label, from_reserved=False):
+    """Solo en el camino de error: distinguir inventario inexistente de stock insuficiente"""
+    current = Inventory.objects.filter(
+        company_id=product.company_id,
+        product=product,
+        warehouse=warehouse
+    ).values_list('quantity', 'reserved_quantity').first()
+
+    if current is None:
+        raise ValueError(f"No hay inventario del producto {product.sku} en {warehouse.name}")
+
+    quantity_on_hand, reserved = current
+    available = reserved if from_reserved else quantity_on_hand - reserved
+    raise ValueError(f"{error_label}. Disponible: {available}, Solicitado: {quantity}")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import ShardService
+
+
+class Command(BaseCommand):
+    help = "Incorpora los fragmentos de stock a Inventory (programar periódicamente o usar --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=ShardService.COMPACT_BATCH_SIZE, help="Filas por lote")
+        parser.add_argument("--loop", action="store_true", help="Ejecutar continuamente")
+        parser.add_argument("--interval", type=float, default=10, help="Segundos entre compactaciones con --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            # Cada lote es su propia transacción corta
+            while True:
+                compacted = ShardService.compact(batch_size=options["batch_size"])
+                total += compacted
+                if compacted < options["batch_size"]:
+                    break
+
+            self.stdout.write(f"Filas de inventario compactadas: {total}")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS("Compactación de fragmentos completada"))
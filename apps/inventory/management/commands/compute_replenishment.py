@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from time import perf_counter
+
+from apps.inventory import replenishment
+from apps.movements.services import bump_data_version
+from apps.users.models import Company
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula demanda diaria, stock de seguridad, punto de reorden y cantidad sugerida por "
+        "producto y bodega desde el kardex, y guarda las sugerencias de reposición."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="ID de la compañía (por defecto todas)")
+        parser.add_argument(
+            "--window", type=int, default=replenishment.WINDOW_DAYS, help="Días de historia analizados"
+        )
+        parser.add_argument(
+            "--lead-time", type=int, default=replenishment.LEAD_TIME_DAYS, help="Días de reposición del proveedor"
+        )
+        parser.add_argument(
+            "--review", type=int, default=replenishment.REVIEW_DAYS, help="Días entre revisiones de compra"
+        )
+        parser.add_argument(
+            "--service-level",
+            type=float,
+            default=replenishment.SERVICE_LEVEL,
+            help="Probabilidad de no quebrar stock durante la reposición (0-1)",
+        )
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Actualizar min_stock y max_stock del inventario con el punto de reorden y el nivel objetivo",
+        )
+
+    def handle(self, *args, **options):
+        companies = Company.objects.values_list("id", flat=True)
+        if options["company"]:
+            companies = companies.filter(pk=options["company"])
+
+        for company_id in companies:
+            started = perf_counter()
+            frame = replenishment.run(
+                company_id,
+                window_days=options["window"],
+                lead_time_days=options["lead_time"],
+                review_days=options["review"],
+                service_level=options["service_level"],
+            )
+            to_order = int((frame["suggested_quantity"] > 0).sum()) if len(frame) else 0
+            self.stdout.write(
+                f"{company_id}: {len(frame)} filas, {to_order} por reponer ({perf_counter() - started:.1f}s)"
+            )
+
+            if options["apply"]:
+                with transaction.atomic():
+                    updated = replenishment.apply(company_id)
+                    if updated:
+                        bump_data_version(company_id)
+                self.stdout.write(f"{company_id}: límites actualizados en {updated} filas")
+
+        self.stdout.write(self.style.SUCCESS("Sugerencias de reposición calculadas"))
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.inventory import summary
+from apps.inventory.models import Inventory, ProductStockSummary, WarehouseStockSummary
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica o reconstruye los resúmenes de stock por bodega y por producto a partir de "
+        "Inventory y sus fragmentos. La reconstrucción debe ejecutarse sin movimientos concurrentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="ID de la compañía (por defecto todas)")
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Solo comparar y reportar diferencias (termina con error si las hay)",
+        )
+
+    def handle(self, *args, **options):
+        inventories = Inventory.objects.all()
+        if options["company"]:
+            inventories = inventories.filter(company_id=options["company"])
+
+        by_warehouse, by_product = summary.compute(inventories)
+        targets = [
+            (WarehouseStockSummary, "warehouse", by_warehouse),
+            (ProductStockSummary, "product", by_product),
+        ]
+
+        if options["verify"]:
+            differences = 0
+            for model, key_field, expected in targets:
+                differences += self.compare(model, key_field, expected, options["company"])
+            if differences:
+                raise CommandError(f"Resúmenes de stock con diferencias: {differences}")
+            self.stdout.write(self.style.SUCCESS("Resúmenes de stock correctos"))
+            return
+
+        with transaction.atomic():
+            for model, key_field, expected in targets:
+                self.rebuild(model, key_field, expected, options["company"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Resúmenes reconstruidos: {len(by_warehouse)} bodegas, {len(by_product)} productos"
+            )
+        )
+
+    def compare(self, model, key_field, expected, company_id):
+        """Reportar las claves cuyo total guardado no coincide con el real"""
+        current = summary.stored(model, key_field, company_id)
+        differences = 0
+        for key in sorted(set(expected) | set(current), key=str):
+            stored_total = tuple(current.get(key, (0, 0, 0, 0)))
+            expected_total = tuple(expected.get(key, (0, 0, 0, 0)))
+            if stored_total != expected_total:
+                differences += 1
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{model._meta.verbose_name} {key[1]}: guardado {stored_total}, real {expected_total}"
+                    )
+                )
+        return differences
+
+    def rebuild(self, model, key_field, expected, company_id):
+        """Reemplazar las filas del resumen por una sola fila con el total real"""
+        queryset = model.objects.all()
+        if company_id:
+            queryset = queryset.filter(company_id=company_id)
+        queryset.delete()
+
+        model.objects.bulk_create(
+            [
+                model(
+                    company_id=company,
+                    slot=0,
+                    total_units=units,
+                    total_value=value,
+                    stocked_count=stocked,
+                    low_stock_count=low_stock,
+                    **{f"{key_field}_id": key},
+                )
+                for (company, key), (units, value, stocked, low_stock) in expected.items()
+            ],
+            batch_size=500,
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import ReservationService
+
+
+class Command(BaseCommand):
+    help = "Libera en lote las reservas de stock vencidas (programar periódicamente o usar --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=ReservationService.SWEEP_BATCH_SIZE, help="Reservas por lote")
+        parser.add_argument("--loop", action="store_true", help="Ejecutar continuamente")
+        parser.add_argument("--interval", type=float, default=30, help="Segundos entre barridos con --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            # Cada lote es su propia transacción corta
+            while True:
+                released = ReservationService.release_expired(batch_size=options["batch_size"])
+                total += released
+                if released < options["batch_size"]:
+                    break
+
+            self.stdout.write(f"Reservas expiradas liberadas: {total}")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS("Barrido de reservas completado"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.inventory import alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Alinea las alertas de stock abiertas con el inventario: abre alertas para las filas bajo "
+        "el stock mínimo que no la tienen y cierra las de filas que ya lo superan (por ejemplo "
+        "después de editar mínimos fuera de un movimiento)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="ID de la compañía (por defecto todas)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            opened, closed = alerts.sync(options["company"])
+
+        self.stdout.write(self.style.SUCCESS(f"Alertas de stock: {opened} abiertas, {closed} cerradas"))
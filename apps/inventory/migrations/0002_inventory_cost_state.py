@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:57
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery
+
+
+def seed_cost_state(apps, schema_editor):
+    # Punto de partida con el precio costo; rebuild_cost_state recalcula desde el historial
+    Inventory = apps.get_model('inventory', 'Inventory')
+    Product = apps.get_model('products', 'Product')
+    cost_price = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('cost_price')[:1])
+    Inventory.objects.update(average_cost=cost_price)
+    Inventory.objects.update(
+        total_value=ExpressionWrapper(F('quantity') * F('average_cost'), output_field=models.DecimalField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='average_cost',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12, verbose_name='Costo promedio'),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='total_value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Valor total'),
+        ),
+        migrations.RunPython(seed_cost_state, migrations.RunPython.noop),
+    ]
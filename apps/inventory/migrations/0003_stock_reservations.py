@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:00
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_inventory_cost_state'),
+        ('movements', '0004_movement_idempotency_key'),
+        ('products', '0001_initial'),
+        ('users', '0001_initial'),
+        ('warehouses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='reserved_quantity',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Cantidad reservada'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Cantidad')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Activa'), ('COMMITTED', 'Confirmada'), ('RELEASED', 'Liberada'), ('EXPIRED', 'Expirada')], default='ACTIVE', max_length=10, verbose_name='Estado')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Referencia')),
+                ('expires_at', models.DateTimeField(verbose_name='Expira')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='users.company')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_reservations', to=settings.AUTH_USER_MODEL)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='inventory.inventory')),
+                ('movement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='movements.movement', verbose_name='Movimiento de salida')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='warehouses.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Reserva de stock',
+                'verbose_name_plural': 'Reservas de stock',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['inventory', 'status'], name='inventory_s_invento_83b2c3_idx'), models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['expires_at'], name='reservation_active_expiry')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:05
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryShard',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('shard', models.SmallIntegerField(verbose_name='Fragmento')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Cantidad')),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Valor total')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='inventory.inventory')),
+            ],
+            options={
+                'verbose_name': 'Fragmento de inventario',
+                'verbose_name_plural': 'Fragmentos de inventario',
+                'unique_together': {('inventory', 'shard')},
+            },
+        ),
+    ]
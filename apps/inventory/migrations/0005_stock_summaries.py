@@ -0,0 +1,79 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:11
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+# Totales iniciales desde el inventario existente (una fila por resumen)
+SEED_SQL = """
+    INSERT INTO inventory_{key}stocksummary (
+        id, company_id, {key}_id, slot, total_units, total_value, stocked_count, low_stock_count, updated_at
+    )
+    SELECT gen_random_uuid(), i.company_id, i.{key}_id, 0,
+           SUM(i.quantity + COALESCE(s.quantity, 0)),
+           SUM(i.total_value + COALESCE(s.total_value, 0)),
+           COUNT(*) FILTER (WHERE i.quantity > 0),
+           COUNT(*) FILTER (WHERE i.min_stock > 0 AND i.quantity <= i.min_stock),
+           NOW()
+    FROM inventory_inventory i
+    LEFT JOIN (
+        SELECT inventory_id, SUM(quantity) AS quantity, SUM(total_value) AS total_value
+        FROM inventory_inventoryshard
+        GROUP BY inventory_id
+    ) s ON s.inventory_id = i.id
+    GROUP BY i.company_id, i.{key}_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_inventory_shards'),
+        ('products', '0002_product_sharded_stock'),
+        ('users', '0001_initial'),
+        ('warehouses', '0002_warehouse_sharded_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStockSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('slot', models.SmallIntegerField(verbose_name='Fila')),
+                ('total_units', models.BigIntegerField(default=0, verbose_name='Unidades')),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor total')),
+                ('stocked_count', models.IntegerField(default=0, verbose_name='Con stock')),
+                ('low_stock_count', models.IntegerField(default=0, verbose_name='Bajo stock')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.company')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_summary', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Resumen de stock por producto',
+                'verbose_name_plural': 'Resúmenes de stock por producto',
+                'unique_together': {('product', 'slot')},
+            },
+        ),
+        migrations.CreateModel(
+            name='WarehouseStockSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('slot', models.SmallIntegerField(verbose_name='Fila')),
+                ('total_units', models.BigIntegerField(default=0, verbose_name='Unidades')),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valor total')),
+                ('stocked_count', models.IntegerField(default=0, verbose_name='Con stock')),
+                ('low_stock_count', models.IntegerField(default=0, verbose_name='Bajo stock')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.company')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_summary', to='warehouses.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Resumen de stock por bodega',
+                'verbose_name_plural': 'Resúmenes de stock por bodega',
+                'unique_together': {('warehouse', 'slot')},
+            },
+        ),
+        migrations.RunSQL(SEED_SQL.format(key='warehouse'), migrations.RunSQL.noop),
+        migrations.RunSQL(SEED_SQL.format(key='product'), migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:17
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+# Una alerta abierta por cada fila que ya está bajo el stock mínimo
+SEED_SQL = """
+    INSERT INTO inventory_stockalert (
+        id, company_id, product_id, warehouse_id, alert_type, quantity, min_stock, is_open, created_at
+    )
+    SELECT gen_random_uuid(), company_id, product_id, warehouse_id, 'LOW', quantity, min_stock, TRUE, NOW()
+    FROM inventory_inventory
+    WHERE min_stock > 0 AND quantity <= min_stock
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stock_summaries'),
+        ('products', '0002_product_sharded_stock'),
+        ('users', '0001_initial'),
+        ('warehouses', '0002_warehouse_sharded_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('alert_type', models.CharField(choices=[('LOW', 'Stock bajo'), ('NORMAL', 'Stock normalizado')], max_length=10, verbose_name='Tipo')),
+                ('quantity', models.IntegerField(verbose_name='Cantidad')),
+                ('min_stock', models.IntegerField(verbose_name='Stock mínimo')),
+                ('is_open', models.BooleanField(default=False, verbose_name='Abierta')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='Resuelta')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Creado')),
+            ],
+            options={
+                'verbose_name': 'Alerta de stock',
+                'verbose_name_plural': 'Alertas de stock',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('min_stock__gt', 0), ('quantity__lte', models.F('min_stock'))), fields=['company', 'quantity'], name='inventory_low_stock'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='company',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='users.company'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='products.product'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='warehouses.warehouse'),
+        ),
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(fields=['company', '-created_at'], name='inventory_s_company_83096b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(condition=models.Q(('is_open', True)), fields=['company', '-created_at'], name='stock_alert_open'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_open', True)), fields=('product', 'warehouse'), name='stock_alert_one_open'),
+        ),
+        migrations.RunSQL(SEED_SQL, migrations.RunSQL.noop),
+    ]
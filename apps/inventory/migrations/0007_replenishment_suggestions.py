@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:19
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stock_alerts'),
+        ('products', '0002_product_sharded_stock'),
+        ('users', '0001_initial'),
+        ('warehouses', '0002_warehouse_sharded_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplenishmentSuggestion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('avg_daily_demand', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Demanda diaria promedio')),
+                ('demand_std', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Desviación de la demanda')),
+                ('safety_stock', models.IntegerField(verbose_name='Stock de seguridad')),
+                ('reorder_point', models.IntegerField(verbose_name='Punto de reorden')),
+                ('order_up_to', models.IntegerField(verbose_name='Nivel objetivo')),
+                ('suggested_quantity', models.IntegerField(verbose_name='Cantidad sugerida')),
+                ('window_days', models.IntegerField(verbose_name='Días analizados')),
+                ('lead_time_days', models.IntegerField(verbose_name='Tiempo de reposición')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculado')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replenishment_suggestions', to='users.company')),
+                ('inventory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='replenishment', to='inventory.inventory')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replenishment_suggestions', to='products.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replenishment_suggestions', to='warehouses.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Sugerencia de reposición',
+                'verbose_name_plural': 'Sugerencias de reposición',
+                'indexes': [models.Index(condition=models.Q(('suggested_quantity__gt', 0)), fields=['company', '-suggested_quantity'], name='replenishment_to_order')],
+            },
+        ),
+    ]
@@ -1,11 +1,34 @@
 from django.db import models
+from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from apps.users.models import Company
 from apps.products.models import Product
 from apps.warehouses.models import Warehouse
 import uuid
 
+
+# Fila bajo stock mínimo: solo si tiene un mínimo configurado (ver summary.is_low)
+LOW_STOCK = models.Q(min_stock__gt=0, quantity__lte=models.F('min_stock'))
+
+
+class InventoryQuerySet(models.QuerySet):
+    
+    def low_stock(self):
+        """Filas bajo stock mínimo (cubiertas por el índice parcial inventory_low_stock)"""
+        return self.filter(LOW_STOCK)
+    
+    def with_live_stock(self):
+        """Anotar live_quantity: cantidad base más los fragmentos aún no compactados"""
+        shards = InventoryShard.objects.filter(
+            inventory=models.OuterRef('pk')
+        ).values('inventory').annotate(total=models.Sum('quantity')).values('total')
+        return self.annotate(
+            live_quantity=models.F('quantity') + Coalesce(models.Subquery(shards), 0)
+        )
+
+
 class Inventory(models.Model):
     """Modelo de inventario (stock por producto y bodega)"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -19,6 +42,11 @@ class Inventory(models.Model):
         validators=[MinValueValidator(0)],
         verbose_name='Cantidad'
     )
+    reserved_quantity = models.IntegerField(
+        default=0,
+        validators=[MinValueValidator(0)],
+        verbose_name='Cantidad reservada'
+    )
     min_stock = models.IntegerField(
         default=0,
         validators=[MinValueValidator(0)],
@@ -31,6 +59,20 @@ class Inventory(models.Model):
         verbose_name='Stock máximo'
     )
     
+    # Estado de costo promedio ponderado
+    total_value = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name='Valor total'
+    )
+    average_cost = models.DecimalField(
+        max_digits=12,
+        decimal_places=4,
+        default=0,
+        verbose_name='Costo promedio'
+    )
+    
     location = models.CharField(max_length=100, blank=True, verbose_name='Ubicación en bodega')
     
     last_movement = models.DateTimeField(null=True, blank=True, verbose_name='Último movimiento')
@@ -38,6 +80,8 @@ class Inventory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
     
+    objects = InventoryQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Inventario'
         verbose_name_plural = 'Inventarios'
@@ -45,17 +89,255 @@ class Inventory(models.Model):
         indexes = [
             models.Index(fields=['product', 'warehouse']),
             models.Index(fields=['quantity']),
+            # Solo las filas bajo stock mínimo, ordenadas por cantidad dentro de la compañía
+            models.Index(fields=['company', 'quantity'], condition=LOW_STOCK, name='inventory_low_stock'),
         ]
     
     def __str__(self):
         return f"{self.product.name} - {self.warehouse.name}: {self.quantity}"
     
+    @property
+    def shard_quantity(self):
+        """Cantidad pendiente en fragmentos (modo de stock fragmentado)"""
+        if hasattr(self, 'live_quantity'):
+            return self.live_quantity - self.quantity
+        return self.shards.aggregate(total=models.Sum('quantity'))['total'] or 0
+    
+    @property
+    def available_quantity(self):
+        """Cantidad disponible para prometer (no reservada)"""
+        return self.quantity - self.reserved_quantity
+    
     @property
     def is_low_stock(self):
         """Verificar si está bajo stock mínimo"""
-        return self.quantity <= self.min_stock
+        return self.min_stock > 0 and self.quantity <= self.min_stock
     
     @property
     def is_over_stock(self):
         """Verificar si excede stock máximo"""
-        return self.max_stock and self.quantity >= self.max_stock
\ No newline at end of file
+        return self.max_stock and self.quantity >= self.max_stock
+
+
+class InventoryShard(models.Model):
+    """
+    Fragmento de stock de una fila de inventario muy concurrida.
+    Las entradas de productos o bodegas con stock fragmentado suman aquí, en un
+    fragmento elegido al azar, en vez de bloquear la fila de inventario; la
+    compactación periódica los incorpora a Inventory.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='shards')
+    shard = models.SmallIntegerField(verbose_name='Fragmento')
+    
+    quantity = models.IntegerField(default=0, verbose_name='Cantidad')
+    total_value = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Valor total')
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
+    
+    class Meta:
+        verbose_name = 'Fragmento de inventario'
+        verbose_name_plural = 'Fragmentos de inventario'
+        unique_together = ['inventory', 'shard']
+    
+    def __str__(self):
+        return f"{self.inventory_id} #{self.shard}: {self.quantity}"
+
+
+class StockReservation(models.Model):
+    """Reserva de stock para pedidos en preparación"""
+    
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Activa'),
+        ('COMMITTED', 'Confirmada'),
+        ('RELEASED', 'Liberada'),
+        ('EXPIRED', 'Expirada'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='stock_reservations')
+    
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='reservations')
+    
+    quantity = models.IntegerField(validators=[MinValueValidator(1)], verbose_name='Cantidad')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ACTIVE', verbose_name='Estado')
+    reference = models.CharField(max_length=100, blank=True, verbose_name='Referencia')
+    
+    expires_at = models.DateTimeField(verbose_name='Expira')
+    movement = models.ForeignKey(
+        'movements.Movement',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reservations',
+        verbose_name='Movimiento de salida'
+    )
+    
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='stock_reservations')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
+    
+    class Meta:
+        verbose_name = 'Reserva de stock'
+        verbose_name_plural = 'Reservas de stock'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['inventory', 'status']),
+            # Solo las reservas activas interesan al barrido de expiradas
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(status='ACTIVE'),
+                name='reservation_active_expiry'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} - {self.warehouse_id}: {self.quantity} ({self.get_status_display()})"
+
+
+class StockSummary(models.Model):
+    """
+    Totales de inventario precalculados, mantenidos por diferencias en la misma
+    transacción que modifica el inventario (ver apps.inventory.summary).
+    Cada total se reparte en SLOTS filas elegidas al azar para que movimientos
+    concurrentes no esperen la misma fila; el total es la suma de sus filas.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    slot = models.SmallIntegerField(verbose_name='Fila')
+    
+    # Cantidad y valor incluyen los fragmentos sin compactar
+    total_units = models.BigIntegerField(default=0, verbose_name='Unidades')
+    total_value = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='Valor total')
+    # Filas de inventario con cantidad positiva (productos de la bodega, bodegas del producto)
+    stocked_count = models.IntegerField(default=0, verbose_name='Con stock')
+    # Filas con stock mínimo configurado y cantidad en o bajo el mínimo
+    low_stock_count = models.IntegerField(default=0, verbose_name='Bajo stock')
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
+    
+    class Meta:
+        abstract = True
+
+
+class WarehouseStockSummary(StockSummary):
+    """Totales de inventario por bodega"""
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='stock_summary')
+    
+    class Meta:
+        verbose_name = 'Resumen de stock por bodega'
+        verbose_name_plural = 'Resúmenes de stock por bodega'
+        unique_together = ['warehouse', 'slot']
+    
+    def __str__(self):
+        return f"{self.warehouse_id} #{self.slot}: {self.total_units}"
+
+
+class ProductStockSummary(StockSummary):
+    """Totales de inventario por producto"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_summary')
+    
+    class Meta:
+        verbose_name = 'Resumen de stock por producto'
+        verbose_name_plural = 'Resúmenes de stock por producto'
+        unique_together = ['product', 'slot']
+    
+    def __str__(self):
+        return f"{self.product_id} #{self.slot}: {self.total_units}"
+
+
+class StockAlert(models.Model):
+    """
+    Cruce del stock mínimo de una fila de inventario.
+    Cada movimiento registra un evento LOW cuando la fila queda en o bajo el mínimo y uno
+    NORMAL cuando vuelve a superarlo (ver apps.inventory.alerts). El evento LOW queda
+    abierto hasta el NORMAL que lo resuelve.
+    """
+    
+    TYPE_CHOICES = [
+        ('LOW', 'Stock bajo'),
+        ('NORMAL', 'Stock normalizado'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='stock_alerts')
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_alerts')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='stock_alerts')
+    
+    alert_type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name='Tipo')
+    quantity = models.IntegerField(verbose_name='Cantidad')
+    min_stock = models.IntegerField(verbose_name='Stock mínimo')
+    
+    is_open = models.BooleanField(default=False, verbose_name='Abierta')
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name='Resuelta')
+    
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Creado')
+    
+    class Meta:
+        verbose_name = 'Alerta de stock'
+        verbose_name_plural = 'Alertas de stock'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', '-created_at']),
+            # Alertas abiertas: una por fila de inventario bajo el mínimo
+            models.Index(
+                fields=['company', '-created_at'],
+                condition=models.Q(is_open=True),
+                name='stock_alert_open'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'warehouse'],
+                condition=models.Q(is_open=True),
+                name='stock_alert_one_open'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} - {self.warehouse_id}: {self.get_alert_type_display()} ({self.quantity})"
+
+
+class ReplenishmentSuggestion(models.Model):
+    """
+    Punto de reorden y cantidad sugerida de una fila de inventario, calculados desde la
+    demanda histórica del kardex (ver apps.inventory.replenishment).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='replenishment_suggestions')
+    
+    inventory = models.OneToOneField(Inventory, on_delete=models.CASCADE, related_name='replenishment')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='replenishment_suggestions')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='replenishment_suggestions')
+    
+    # Demanda diaria en la ventana analizada
+    avg_daily_demand = models.DecimalField(max_digits=12, decimal_places=4, verbose_name='Demanda diaria promedio')
+    demand_std = models.DecimalField(max_digits=12, decimal_places=4, verbose_name='Desviación de la demanda')
+    
+    safety_stock = models.IntegerField(verbose_name='Stock de seguridad')
+    reorder_point = models.IntegerField(verbose_name='Punto de reorden')
+    order_up_to = models.IntegerField(verbose_name='Nivel objetivo')
+    suggested_quantity = models.IntegerField(verbose_name='Cantidad sugerida')
+    
+    window_days = models.IntegerField(verbose_name='Días analizados')
+    lead_time_days = models.IntegerField(verbose_name='Tiempo de reposición')
+    
+    computed_at = models.DateTimeField(verbose_name='Calculado')
+    
+    class Meta:
+        verbose_name = 'Sugerencia de reposición'
+        verbose_name_plural = 'Sugerencias de reposición'
+        indexes = [
+            # Solo las filas que hay que reponer, de mayor a menor cantidad
+            models.Index(
+                fields=['company', '-suggested_quantity'],
+                condition=models.Q(suggested_quantity__gt=0),
+                name='replenishment_to_order'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} - {self.warehouse_id}: {self.suggested_quantity}"
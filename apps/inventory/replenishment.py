@@ -0,0 +1,233 @@
+"""
+Cálculo de reposición por producto y bodega.
+
+La demanda de cada fila es la salida diaria registrada en el kardex (salidas y
+transferencias de salida; los ajustes no cuentan como demanda). La base de datos la
+agrega por día y el resto se calcula con pandas/NumPy sobre columnas completas, sin
+recorrer las filas en Python:
+
+    demanda promedio     d = unidades / días de la ventana
+    desviación           s (días sin salidas cuentan como demanda 0)
+    stock de seguridad   z * s * raíz(tiempo de reposición)
+    punto de reorden     d * tiempo de reposición + stock de seguridad
+    nivel objetivo       punto de reorden + d * días de revisión
+    cantidad sugerida    nivel objetivo - (stock actual - reservado), si es positiva
+
+z corresponde al nivel de servicio (probabilidad de no quebrar stock durante la reposición).
+Los resultados se guardan en ReplenishmentSuggestion con una sentencia por lote, y
+apply() puede llevarlos a min_stock / max_stock del inventario.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from statistics import NormalDist
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from apps.movements.models import Kardex
+from .models import Inventory, ReplenishmentSuggestion
+from . import alerts, summary
+import numpy as np
+import pandas as pd
+
+KEYS = ['product_id', 'warehouse_id']
+
+# Parámetros por defecto
+WINDOW_DAYS = 90
+LEAD_TIME_DAYS = 7
+REVIEW_DAYS = 14
+SERVICE_LEVEL = 0.95
+
+# Filas por sentencia al guardar sugerencias
+WRITE_BATCH_SIZE = 10000
+
+
+def load_demand(company_id, since):
+    """Salidas diarias por fila desde since: DataFrame (product_id, warehouse_id, quantity)"""
+    rows = Kardex.objects.filter(
+        company_id=company_id,
+        created_at__gte=since,
+        movement_type__in=['OUT', 'TRANSFER'],
+        output_quantity__gt=0
+    ).annotate(day=TruncDate('created_at')).order_by().values(*KEYS, 'day').annotate(
+        quantity=Sum('output_quantity')
+    ).values_list(*KEYS, 'quantity')
+    return pd.DataFrame.from_records(rows.iterator(chunk_size=5000), columns=KEYS + ['quantity'])
+
+
+def load_inventory(company_id):
+    """Filas de inventario activas: DataFrame (inventory_id, product_id, warehouse_id, position)"""
+    rows = Inventory.objects.filter(
+        company_id=company_id,
+        product__is_deleted=False,
+        warehouse__is_deleted=False
+    ).with_live_stock().values_list('id', *KEYS, 'live_quantity', 'reserved_quantity')
+    frame = pd.DataFrame.from_records(
+        rows.iterator(chunk_size=5000), columns=['inventory_id'] + KEYS + ['on_hand', 'reserved']
+    )
+    frame['position'] = frame['on_hand'] - frame['reserved']
+    return frame.drop(columns=['on_hand', 'reserved'])
+
+
+def calculate(inventory, demand, window_days=WINDOW_DAYS, lead_time_days=LEAD_TIME_DAYS,
+              review_days=REVIEW_DAYS, service_level=SERVICE_LEVEL):
+    """
+    Calcular la reposición de todas las filas de inventory en una pasada vectorizada.
+    demand tiene una fila por (producto, bodega, día con salidas).
+    Retorna inventory con las columnas de ReplenishmentSuggestion agregadas.
+    """
+    if demand.empty:
+        totals = pd.DataFrame(columns=['units', 'squares'], index=pd.MultiIndex.from_tuples([], names=KEYS))
+    else:
+        totals = demand.assign(
+            units=demand['quantity'].astype('float64'),
+            squares=demand['quantity'].astype('float64') ** 2
+        ).groupby(KEYS, sort=False)[['units', 'squares']].sum()
+
+    frame = inventory.join(totals, on=KEYS)
+    units = frame['units'].fillna(0).to_numpy(dtype='float64')
+    squares = frame['squares'].fillna(0).to_numpy(dtype='float64')
+
+    days = max(window_days, 2)
+    mean = units / days
+    variance = np.clip((squares - days * mean ** 2) / (days - 1), 0, None)
+    std = np.sqrt(variance)
+
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = np.ceil(z * std * np.sqrt(lead_time_days))
+    reorder_point = np.ceil(mean * lead_time_days + safety_stock)
+    order_up_to = np.ceil(reorder_point + mean * review_days)
+    position = frame['position'].to_numpy(dtype='float64')
+    suggested = np.where(position <= reorder_point, np.clip(order_up_to - position, 0, None), 0)
+
+    return frame.drop(columns=['units', 'squares']).assign(
+        avg_daily_demand=mean.round(4),
+        demand_std=std.round(4),
+        safety_stock=safety_stock.astype('int64'),
+        reorder_point=reorder_point.astype('int64'),
+        order_up_to=order_up_to.astype('int64'),
+        suggested_quantity=suggested.astype('int64'),
+    )
+
+
+def _column(field_name):
+    return connection.ops.quote_name(ReplenishmentSuggestion._meta.get_field(field_name).column)
+
+
+def save(company_id, frame, window_days, lead_time_days, when=None):
+    """
+    Guardar las sugerencias calculadas (INSERT ... SELECT FROM unnest(columnas) ON CONFLICT,
+    una sentencia por lote) y eliminar las de filas que ya no se calcularon.
+    Retorna la cantidad guardada.
+    """
+    when = when or timezone.now()
+    table = connection.ops.quote_name(ReplenishmentSuggestion._meta.db_table)
+    keys = ['inventory', 'product', 'warehouse']
+    values = ['avg_daily_demand', 'demand_std', 'safety_stock', 'reorder_point', 'order_up_to', 'suggested_quantity']
+    updates = ', '.join(
+        f"{_column(name)} = EXCLUDED.{_column(name)}"
+        for name in values + ['window_days', 'lead_time_days', 'computed_at']
+    )
+    sql = f"""
+        INSERT INTO {table} (
+            {_column('id')}, {_column('company')}, {', '.join(_column(name) for name in keys + values)},
+            {_column('window_days')}, {_column('lead_time_days')}, {_column('computed_at')}
+        )
+        SELECT gen_random_uuid(), %s, data.*, %s, %s, %s
+        FROM unnest(
+            %s::uuid[], %s::uuid[], %s::uuid[],
+            %s::numeric[], %s::numeric[], %s::integer[], %s::integer[], %s::integer[], %s::integer[]
+        ) AS data
+        ON CONFLICT ({_column('inventory')}) DO UPDATE SET {updates}
+    """
+
+    company = ReplenishmentSuggestion._meta.get_field('company').get_db_prep_value(company_id, connection)
+    with connection.cursor() as cursor:
+        for start in range(0, len(frame), WRITE_BATCH_SIZE):
+            batch = frame.iloc[start:start + WRITE_BATCH_SIZE]
+            cursor.execute(sql, [company, window_days, lead_time_days, when] + [
+                [str(value) for value in batch[f'{name}_id']] for name in keys
+            ] + [
+                batch[name].tolist() for name in values
+            ])
+
+    ReplenishmentSuggestion.objects.filter(company_id=company_id, computed_at__lt=when).delete()
+    return len(frame)
+
+
+def apply(company_id, when=None):
+    """
+    Llevar las sugerencias a min_stock (punto de reorden) y max_stock (nivel objetivo)
+    de las filas con demanda, en una sola sentencia. Las filas sin demanda en la ventana
+    conservan sus límites manuales. Solo se bloquean las filas que cambian, en el orden
+    global (product_id, warehouse_id), y el cambio de mínimo se anota en los resúmenes
+    y alertas.
+    Retorna la cantidad de filas actualizadas.
+    """
+    when = when or timezone.now()
+    inventory = connection.ops.quote_name(Inventory._meta.db_table)
+    suggestions = connection.ops.quote_name(ReplenishmentSuggestion._meta.db_table)
+    column = lambda name: connection.ops.quote_name(Inventory._meta.get_field(name).column)
+    min_column = column('min_stock')
+    max_column = column('max_stock')
+
+    sql = f"""
+        UPDATE {inventory} SET
+            {min_column} = old.reorder_point,
+            {max_column} = old.order_up_to,
+            {column('updated_at')} = %s
+        FROM (
+            SELECT i.{column('id')}, i.{min_column},
+                   s.{_column('reorder_point')} AS reorder_point, s.{_column('order_up_to')} AS order_up_to
+            FROM {inventory} i
+            JOIN {suggestions} s ON s.{_column('inventory')} = i.{column('id')}
+            WHERE i.{column('company')} = %s
+              AND s.{_column('avg_daily_demand')} > 0
+              AND (i.{min_column} <> s.{_column('reorder_point')}
+                   OR i.{max_column} IS DISTINCT FROM s.{_column('order_up_to')})
+            ORDER BY i.{column('product')}, i.{column('warehouse')}
+            FOR UPDATE OF i
+        ) old
+        WHERE {inventory}.{column('id')} = old.{column('id')}
+        RETURNING {inventory}.{column('company')}, {inventory}.{column('product')},
+                  {inventory}.{column('warehouse')}, {inventory}.{column('quantity')},
+                  old.{min_column}, {inventory}.{min_column}
+    """
+    params = [
+        Inventory._meta.get_field('updated_at').get_db_prep_value(when, connection),
+        Inventory._meta.get_field('company').get_db_prep_value(company_id, connection),
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    # Solo cambia el mínimo: puede entrar o salir de stock bajo sin mover unidades
+    changes = [
+        summary.Change(
+            company, product_id, warehouse_id, 0, Decimal('0.00'), 0,
+            int(summary.is_low(quantity, new_min)) - int(summary.is_low(quantity, old_min)),
+            quantity, new_min
+        )
+        for company, product_id, warehouse_id, quantity, old_min, new_min in rows
+    ]
+    summary.apply(changes, when)
+    alerts.emit(changes, when)
+
+    return len(rows)
+
+
+def run(company_id, window_days=WINDOW_DAYS, lead_time_days=LEAD_TIME_DAYS, review_days=REVIEW_DAYS,
+        service_level=SERVICE_LEVEL):
+    """Calcular y guardar las sugerencias de la compañía. Retorna el DataFrame calculado."""
+    now = timezone.now()
+    frame = calculate(
+        load_inventory(company_id),
+        load_demand(company_id, now - timedelta(days=window_days)),
+        window_days=window_days,
+        lead_time_days=lead_time_days,
+        review_days=review_days,
+        service_level=service_level,
+    )
+    save(company_id, frame, window_days, lead_time_days, when=now)
+    return frame
@@ -0,0 +1,240 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from .models import Inventory, InventoryShard, StockReservation
+from . import alerts, ledger, summary
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationService:
+    """
+    Reservas de stock para pedidos en preparación.
+    Reservar solo incrementa reserved_quantity con un UPDATE guardado; la salida real
+    ocurre al confirmar, de modo que ningún bloqueo de fila dura lo que dura el picking.
+    """
+
+    # Vigencia por defecto de una reserva
+    DEFAULT_TTL = timedelta(minutes=30)
+
+    # Reservas expiradas liberadas por lote en el barrido
+    SWEEP_BATCH_SIZE = 500
+
+    @staticmethod
+    def available_to_promise(product, warehouse=None):
+        """
+        Stock disponible (quantity - reserved_quantity) sin bloquear filas.
+        Sin bodega retorna el total de la empresa.
+        """
+        queryset = Inventory.objects.filter(company_id=product.company_id, product=product)
+        if warehouse is not None:
+            queryset = queryset.filter(warehouse=warehouse)
+
+        available = 0
+        for quantity, reserved in queryset.with_live_stock().values_list('live_quantity', 'reserved_quantity'):
+            available += quantity - reserved
+        return available
+
+    @staticmethod
+    @transaction.atomic
+    def reserve(product, warehouse, quantity, created_by, reference='', ttl=None):
+        """
+        Reservar stock disponible por un tiempo limitado
+        """
+        if quantity <= 0:
+            raise ValueError("La cantidad a reservar debe ser mayor a cero")
+
+        # Si la reserva obliga a compactar fragmentos, la fila cambia de cantidad base
+        changes = []
+        inventory_id = ledger.reserve_stock(product, warehouse, quantity, changes=changes)
+        summary.apply(changes)
+        alerts.emit(changes)
+
+        reservation = StockReservation.objects.create(
+            company_id=product.company_id,
+            inventory_id=inventory_id,
+            product=product,
+            warehouse=warehouse,
+            quantity=quantity,
+            reference=reference,
+            expires_at=timezone.now() + (ttl or ReservationService.DEFAULT_TTL),
+            created_by=created_by
+        )
+
+        logger.info(f'Reserva creada: {reservation.id} - {product.sku} x{quantity} en {warehouse.code}')
+
+        return reservation
+
+    @staticmethod
+    def _close(reservation, status, require_unexpired=False):
+        """
+        Pasar una reserva activa a otro estado con un UPDATE guardado.
+        Si otra operación (confirmación, liberación o barrido) la cerró antes, lanza ValueError.
+        """
+        now = timezone.now()
+        queryset = StockReservation.objects.filter(pk=reservation.pk, status='ACTIVE')
+        if require_unexpired:
+            queryset = queryset.filter(expires_at__gt=now)
+        updated = queryset.update(status=status, updated_at=now)
+
+        if not updated:
+            current = StockReservation.objects.filter(pk=reservation.pk).values_list('status', flat=True).first()
+            if current == 'ACTIVE':
+                raise ValueError("La reserva está vencida")
+            raise ValueError(f"La reserva no está activa (estado: {current})")
+
+        reservation.status = status
+
+    @staticmethod
+    @transaction.atomic
+    def commit(reservation, created_by, unit_cost=None, reference='', notes='', idempotency_key=None):
+        """
+        Confirmar una reserva: registra la salida consumiendo el stock reservado
+        """
+        # Importación diferida: movements depende de inventory
+        from apps.movements.models import Movement
+        from apps.movements.services import MovementService
+
+        # La clave se resuelve antes de cerrar la reserva: un reintento de esta misma
+        # confirmación devuelve su movimiento; una clave de otro movimiento es un error
+        if idempotency_key:
+            movement = Movement.objects.filter(
+                company_id=reservation.company_id,
+                idempotency_key=idempotency_key
+            ).first()
+            if movement is not None:
+                if StockReservation.objects.filter(pk=reservation.pk, movement=movement).exists():
+                    return movement
+                raise ValueError("La clave de idempotencia ya corresponde a otro movimiento")
+
+        ReservationService._close(reservation, 'COMMITTED', require_unexpired=True)
+
+        product = reservation.product
+        movement = MovementService.create_output(
+            product,
+            reservation.warehouse,
+            reservation.quantity,
+            product.cost_price if unit_cost is None else unit_cost,
+            created_by,
+            reference=reference or reservation.reference,
+            notes=notes,
+            idempotency_key=idempotency_key,
+            from_reserved=True
+        )
+        if getattr(movement, 'replayed', False):
+            # Otra solicitud con la misma clave confirmó primero: la salida no consumió
+            # esta reserva, el error revierte su cierre
+            raise ValueError("La clave de idempotencia ya corresponde a otro movimiento")
+
+        StockReservation.objects.filter(pk=reservation.pk).update(movement=movement)
+        reservation.movement = movement
+
+        logger.info(f'Reserva confirmada: {reservation.id} - movimiento {movement.id}')
+
+        return movement
+
+    @staticmethod
+    @transaction.atomic
+    def release(reservation):
+        """
+        Liberar una reserva activa devolviendo su cantidad al stock disponible
+        """
+        ReservationService._close(reservation, 'RELEASED')
+
+        Inventory.objects.filter(pk=reservation.inventory_id).update(
+            reserved_quantity=F('reserved_quantity') - reservation.quantity,
+            updated_at=timezone.now()
+        )
+
+        logger.info(f'Reserva liberada: {reservation.id}')
+
+    @staticmethod
+    @transaction.atomic
+    def release_expired(now=None, batch_size=None):
+        """
+        Liberar un lote de reservas vencidas.
+        Las reservas se toman con SKIP LOCKED para que varios barridos no se esperen entre
+        sí, y el stock se devuelve con un único UPDATE por lote en el orden global
+        (product_id, warehouse_id). Retorna la cantidad de reservas liberadas.
+        """
+        now = now or timezone.now()
+        batch_size = batch_size or ReservationService.SWEEP_BATCH_SIZE
+
+        expired = list(
+            StockReservation.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='ACTIVE', expires_at__lte=now)
+            .order_by('expires_at')
+            .values_list('id', 'inventory_id', 'quantity')[:batch_size]
+        )
+        if not expired:
+            return 0
+
+        released = {}
+        for _, inventory_id, quantity in expired:
+            released[inventory_id] = released.get(inventory_id, 0) + quantity
+
+        StockReservation.objects.filter(pk__in=[row[0] for row in expired]).update(
+            status='EXPIRED',
+            updated_at=now
+        )
+
+        # Bloquear en el orden global antes del UPDATE para no cruzarse con las salidas
+        list(
+            Inventory.objects.select_for_update()
+            .filter(pk__in=released)
+            .order_by('product_id', 'warehouse_id')
+            .values_list('id', flat=True)
+        )
+        Inventory.objects.filter(pk__in=released).update(
+            reserved_quantity=F('reserved_quantity') - Case(
+                *[When(pk=inventory_id, then=Value(quantity)) for inventory_id, quantity in released.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+            updated_at=now
+        )
+
+        logger.info(f'Reservas expiradas liberadas: {len(expired)}')
+
+        return len(expired)
+
+
+class ShardService:
+    """Compactación de fragmentos de stock (productos o bodegas con stock fragmentado)"""
+
+    # Filas de inventario compactadas por transacción
+    COMPACT_BATCH_SIZE = 200
+
+    @staticmethod
+    @transaction.atomic
+    def compact(batch_size=None):
+        """
+        Incorporar a Inventory los fragmentos de un lote de filas.
+        Las filas se bloquean en el orden global (product_id, warehouse_id) y se
+        compactan con una sola sentencia. Retorna la cantidad de filas compactadas.
+        """
+        batch_size = batch_size or ShardService.COMPACT_BATCH_SIZE
+
+        inventory_ids = list(
+            InventoryShard.objects.order_by().values_list('inventory_id', flat=True).distinct()[:batch_size]
+        )
+        if not inventory_ids:
+            return 0
+
+        locked = list(
+            Inventory.objects.select_for_update()
+            .filter(pk__in=inventory_ids)
+            .order_by('product_id', 'warehouse_id')
+            .values_list('id', flat=True)
+        )
+        changes = []
+        folded = ledger.fold_shards(locked, changes=changes)
+        summary.apply(changes)
+        alerts.emit(changes)
+
+        logger.info(f'Fragmentos de inventario compactados: {len(folded)} filas')
+
+        return len(folded)
@@ -0,0 +1,170 @@
+"""
+Resúmenes de stock por bodega y por producto.
+
+Las primitivas de ledger anotan en una lista de cambios la diferencia que produjo cada
+sentencia en su fila de inventario (unidades, valor, filas con stock y filas bajo
+stock mínimo). Al final de cada operación el servicio llama a apply() con esa lista,
+que suma las diferencias en WarehouseStockSummary y ProductStockSummary dentro de la
+misma transacción.
+
+Cada resumen se reparte en SLOTS filas y cada operación suma en una elegida al azar.
+Las filas se escriben después de bloquear el inventario y en un orden global, así que
+dos operaciones no pueden bloquearse mutuamente.
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from .models import InventoryShard, WarehouseStockSummary, ProductStockSummary
+import random
+import uuid
+
+# quantity y min_stock: estado final de la fila (None si la sentencia no cambió la cantidad base)
+Change = namedtuple(
+    'Change',
+    ['company_id', 'product_id', 'warehouse_id', 'units', 'value', 'stocked', 'low_stock', 'quantity', 'min_stock'],
+    defaults=(None, None)
+)
+
+# Filas por resumen
+SLOTS = 8
+
+TOTAL_FIELDS = ['total_units', 'total_value', 'stocked_count', 'low_stock_count']
+
+
+def is_low(quantity, min_stock):
+    """Fila bajo stock mínimo (solo si tiene un mínimo configurado)"""
+    return min_stock > 0 and quantity <= min_stock
+
+
+def diff(company_id, product_id, warehouse_id, before, after, min_stock, live_units=None, live_value=None):
+    """
+    Cambio de una fila de inventario que pasó de before a after (cantidad, valor).
+    Por defecto las unidades y el valor cambian lo mismo que la cantidad base;
+    live_units y live_value los reemplazan cuando la sentencia movió stock entre la
+    fila y sus fragmentos sin cambiar el total.
+    """
+    before_quantity, before_value = before
+    after_quantity, after_value = after
+    return Change(
+        company_id,
+        product_id,
+        warehouse_id,
+        after_quantity - before_quantity if live_units is None else live_units,
+        Decimal(after_value) - Decimal(before_value) if live_value is None else live_value,
+        int(after_quantity > 0) - int(before_quantity > 0),
+        int(is_low(after_quantity, min_stock)) - int(is_low(before_quantity, min_stock)),
+        after_quantity,
+        min_stock,
+    )
+
+
+def _accumulate(totals, key, change):
+    units, value, stocked, low_stock = totals.get(key, (0, Decimal('0.00'), 0, 0))
+    totals[key] = (
+        units + change.units,
+        value + change.value,
+        stocked + change.stocked,
+        low_stock + change.low_stock,
+    )
+
+
+def _totals(changes):
+    """Agrupar cambios por bodega y por producto: ({(company_id, warehouse_id): total}, {...})"""
+    by_warehouse = {}
+    by_product = {}
+    for change in changes:
+        _accumulate(by_warehouse, (change.company_id, change.warehouse_id), change)
+        _accumulate(by_product, (change.company_id, change.product_id), change)
+    return (
+        {key: total for key, total in by_warehouse.items() if any(total)},
+        {key: total for key, total in by_product.items() if any(total)},
+    )
+
+
+def _upsert(model, key_field, totals, when):
+    """Sumar totales en una fila al azar de cada resumen, en orden de clave"""
+    if not totals:
+        return
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = lambda name: connection.ops.quote_name(model._meta.get_field(name).column)
+    prep = lambda name, value: model._meta.get_field(name).get_db_prep_value(value, connection)
+
+    rows = []
+    params = []
+    for (company_id, key), (units, value, stocked, low_stock) in sorted(totals.items(), key=lambda item: str(item[0][1])):
+        rows.append('(%s, %s, %s, %s, %s, %s, %s, %s, %s)')
+        params += [
+            prep('id', uuid.uuid4()), prep('company', company_id), prep(key_field, key),
+            random.randrange(SLOTS), units, value, stocked, low_stock, prep('updated_at', when),
+        ]
+
+    updates = ', '.join(
+        f"{column(name)} = {table}.{column(name)} + EXCLUDED.{column(name)}" for name in TOTAL_FIELDS
+    )
+    sql = f"""
+        INSERT INTO {table} (
+            {column('id')}, {column('company')}, {column(key_field)}, {column('slot')},
+            {', '.join(column(name) for name in TOTAL_FIELDS)}, {column('updated_at')}
+        )
+        VALUES {', '.join(rows)}
+        ON CONFLICT ({column(key_field)}, {column('slot')})
+        DO UPDATE SET {updates}, {column('updated_at')} = EXCLUDED.{column('updated_at')}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def apply(changes, when=None):
+    """Sumar una lista de cambios a los resúmenes (siempre bodegas antes que productos)"""
+    if not changes:
+        return
+    when = when or timezone.now()
+    by_warehouse, by_product = _totals(changes)
+    _upsert(WarehouseStockSummary, 'warehouse', by_warehouse, when)
+    _upsert(ProductStockSummary, 'product', by_product, when)
+
+
+def compute(inventories):
+    """
+    Totales reales calculados desde un queryset de Inventory y sus fragmentos.
+    Retorna (por_bodega, por_producto) en el mismo formato que stored().
+    """
+    shards = {
+        inventory_id: (quantity, value)
+        for inventory_id, quantity, value in InventoryShard.objects.filter(
+            inventory__in=inventories
+        ).order_by().values('inventory_id').annotate(
+            quantity=Sum('quantity'), value=Sum('total_value')
+        ).values_list('inventory_id', 'quantity', 'value').iterator(chunk_size=2000)
+    }
+
+    def changes():
+        for inventory_id, company_id, product_id, warehouse_id, quantity, value, min_stock in inventories.values_list(
+            'id', 'company_id', 'product_id', 'warehouse_id', 'quantity', 'total_value', 'min_stock'
+        ).iterator(chunk_size=2000):
+            shard_quantity, shard_value = shards.get(inventory_id, (0, 0))
+            yield diff(
+                company_id, product_id, warehouse_id, (0, 0), (quantity, value), min_stock,
+                live_units=quantity + shard_quantity,
+                live_value=Decimal(value) + Decimal(shard_value),
+            )
+
+    return _totals(changes())
+
+
+def stored(model, key_field, company_id=None):
+    """Totales guardados (suma de las filas de cada resumen): {(company_id, id): total}"""
+    queryset = model.objects.all()
+    if company_id:
+        queryset = queryset.filter(company_id=company_id)
+    rows = queryset.order_by().values('company_id', key_field).annotate(
+        units=Sum('total_units'),
+        value=Sum('total_value'),
+        stocked=Sum('stocked_count'),
+        low_stock=Sum('low_stock_count'),
+    ).values_list('company_id', key_field, 'units', 'value', 'stocked', 'low_stock')
+    return {(row[0], row[1]): row[2:] for row in rows if any(row[2:])}
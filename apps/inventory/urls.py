@@ -6,4 +6,6 @@ app_name = "inventory"
 
 urlpatterns = [
     path("", views.inventory_list, name="inventory_list"),
+    path("alerts/", views.alert_list, name="alert_list"),
+    path("replenishment/", views.replenishment_list, name="replenishment_list"),
 ]
@@ -1,9 +1,9 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
-from django.db.models import Q, F
-from django.core.paginator import Paginator
+from django.db.models import Q
 from django.db import transaction
-from .models import Inventory
+from inventory.pagination import paginate
+from .models import Inventory, ReplenishmentSuggestion, StockAlert
 from apps.products.models import Product
 from apps.warehouses.models import Warehouse
 
@@ -17,7 +17,7 @@ def inventory_list(request):
     
     inventory_list = Inventory.objects.filter(
         company=request.user.company
-    ).select_related('product', 'warehouse').order_by('product__name', 'warehouse__name')
+    ).with_live_stock().select_related('product', 'warehouse')
     
     if product_id:
         inventory_list = inventory_list.filter(product_id=product_id)
@@ -26,11 +26,9 @@ def inventory_list(request):
         inventory_list = inventory_list.filter(warehouse_id=warehouse_id)
     
     if show_low_stock:
-        inventory_list = inventory_list.filter(quantity__lte=F('min_stock'))
+        inventory_list = inventory_list.low_stock()
     
-    paginator = Paginator(inventory_list, 20)
-    page = request.GET.get('page')
-    inventory = paginator.get_page(page)
+    inventory = paginate(request, inventory_list, 20, ('product__name', 'warehouse__name', 'id'))
     
     products = Product.objects.filter(
         company=request.user.company,
@@ -53,3 +51,40 @@ def inventory_list(request):
         'show_low_stock': show_low_stock,
     }
     return render(request, 'inventory/inventory_list.html', context)
+
+@login_required
+@permission_required('inventory.view_inventory', raise_exception=True)
+def alert_list(request):
+    """Alertas de stock mínimo (abiertas por defecto, o el historial de eventos)"""
+    show_all = request.GET.get('all', False)
+    
+    alert_list = StockAlert.objects.filter(
+        company=request.user.company
+    ).select_related('product', 'warehouse')
+    
+    if not show_all:
+        alert_list = alert_list.filter(is_open=True)
+    
+    alerts = paginate(request, alert_list, 20, ('-created_at', '-id'))
+    
+    context = {
+        'alerts': alerts,
+        'show_all': show_all,
+    }
+    return render(request, 'inventory/alert_list.html', context)
+
+@login_required
+@permission_required('inventory.view_inventory', raise_exception=True)
+def replenishment_list(request):
+    """Sugerencias de reposición: filas a reponer, de mayor a menor cantidad sugerida"""
+    suggestion_list = ReplenishmentSuggestion.objects.filter(
+        company=request.user.company,
+        suggested_quantity__gt=0
+    ).select_related('product', 'warehouse', 'inventory')
+    
+    suggestions = paginate(request, suggestion_list, 20, ('-suggested_quantity', 'id'))
+    
+    context = {
+        'suggestions': suggestions,
+    }
+    return render(request, 'inventory/replenishment_list.html', context)
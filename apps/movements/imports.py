@@ -0,0 +1,340 @@
+import csv
+import itertools
+import os
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from openpyxl import load_workbook
+from .models import ImportJob
+from .services import MovementService
+from apps.products.models import Product
+from apps.warehouses.models import Warehouse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ImportService:
+    """
+    Importación masiva de movimientos (entradas y salidas) desde CSV o XLSX.
+    El archivo se lee fila a fila y se aplica en lotes con MovementService.apply_batch,
+    de modo que la memoria usada no depende del tamaño del archivo.
+    """
+
+    # Líneas por lote aplicado
+    CHUNK_SIZE = 1000
+
+    # Segundos sin avances tras los que un job en proceso se retoma (IMPORT_JOB_TIMEOUT)
+    JOB_TIMEOUT = 600
+
+    # Encabezados aceptados (en minúsculas) y el campo que representan
+    HEADERS = {
+        'movement_type': 'movement_type', 'tipo': 'movement_type',
+        'sku': 'sku',
+        'warehouse': 'warehouse', 'bodega': 'warehouse',
+        'quantity': 'quantity', 'cantidad': 'quantity',
+        'unit_cost': 'unit_cost', 'costo_unitario': 'unit_cost', 'costo': 'unit_cost',
+        'reference': 'reference', 'referencia': 'reference',
+        'notes': 'notes', 'notas': 'notes',
+    }
+    REQUIRED = ['movement_type', 'sku', 'warehouse', 'quantity']
+
+    MOVEMENT_TYPES = {
+        'IN': 'IN', 'ENTRADA': 'IN',
+        'OUT': 'OUT', 'SALIDA': 'OUT',
+    }
+
+    # Topes de las columnas: IntegerField y DecimalField(max_digits=12, decimal_places=2)
+    MAX_QUANTITY = 2 ** 31 - 1
+    MAX_AMOUNT = Decimal('9999999999.99')
+    CENT = Decimal('0.01')
+
+    @staticmethod
+    def read_rows(path):
+        """
+        Recorrer el archivo fila a fila.
+        Retorna (encabezados, generador de (número de fila, valores)).
+        """
+        if path.lower().endswith('.xlsx'):
+            return ImportService._read_xlsx(path)
+        return ImportService._read_csv(path)
+
+    @staticmethod
+    def _read_csv(path):
+        handle = open(path, newline='', encoding='utf-8-sig')
+        reader = csv.reader(handle)
+        header = next(reader, [])
+
+        def rows():
+            try:
+                for number, values in enumerate(reader, start=2):
+                    if any(values):
+                        yield number, values
+            finally:
+                handle.close()
+
+        return header, rows()
+
+    @staticmethod
+    def _read_xlsx(path):
+        # Modo solo lectura: las filas se leen del XML sin cargar la hoja completa
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [value or '' for value in next(rows, ())]
+
+        def values():
+            try:
+                for number, row in enumerate(rows, start=2):
+                    if any(value not in (None, '') for value in row):
+                        yield number, ['' if value is None else value for value in row]
+            finally:
+                workbook.close()
+
+        return header, values()
+
+    @staticmethod
+    def _columns(header):
+        """Posición de cada campo según los encabezados del archivo"""
+        columns = {}
+        for position, name in enumerate(header):
+            field = ImportService.HEADERS.get(str(name).strip().lower())
+            if field and field not in columns:
+                columns[field] = position
+
+        missing = [field for field in ImportService.REQUIRED if field not in columns]
+        if missing:
+            raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+        return columns
+
+    @staticmethod
+    def _parse(values, columns, products, warehouses):
+        """Convertir una fila en una línea de MovementService.apply_batch"""
+        def get(field):
+            position = columns.get(field)
+            if position is None or position >= len(values):
+                return ''
+            value = values[position]
+            return value.strip() if isinstance(value, str) else value
+
+        movement_type = ImportService.MOVEMENT_TYPES.get(str(get('movement_type')).upper())
+        if movement_type is None:
+            raise ValueError(f"Tipo de movimiento inválido: {get('movement_type')}")
+
+        product = products.get(str(get('sku')).upper())
+        if product is None:
+            raise ValueError(f"SKU no encontrado: {get('sku')}")
+
+        warehouse = warehouses.get(str(get('warehouse')).upper())
+        if warehouse is None:
+            raise ValueError(f"Bodega no encontrada: {get('warehouse')}")
+
+        try:
+            quantity = Decimal(str(get('quantity')))
+        except InvalidOperation:
+            raise ValueError(f"Cantidad inválida: {get('quantity')}")
+        if not quantity.is_finite() or quantity != quantity.to_integral_value() or quantity <= 0:
+            raise ValueError(f"Cantidad inválida: {get('quantity')}")
+        if quantity > ImportService.MAX_QUANTITY:
+            raise ValueError(f"Cantidad fuera de rango: {get('quantity')}")
+
+        unit_cost = get('unit_cost')
+        if unit_cost in ('', None):
+            unit_cost = product.cost_price
+        else:
+            try:
+                unit_cost = Decimal(str(unit_cost))
+            except InvalidOperation:
+                raise ValueError(f"Costo unitario inválido: {unit_cost}")
+            if not unit_cost.is_finite() or unit_cost < 0:
+                raise ValueError(f"Costo unitario inválido: {unit_cost}")
+            if unit_cost.quantize(ImportService.CENT) > ImportService.MAX_AMOUNT:
+                raise ValueError(f"Costo unitario fuera de rango: {unit_cost}")
+
+        # El costo total (movimiento y kardex) tiene el mismo tope que el unitario
+        if (unit_cost * quantity).quantize(ImportService.CENT) > ImportService.MAX_AMOUNT:
+            raise ValueError(f"Costo total fuera de rango: {quantity} x {unit_cost}")
+
+        return {
+            'movement_type': movement_type,
+            'product': product,
+            'warehouse': warehouse,
+            'quantity': int(quantity),
+            'unit_cost': unit_cost,
+            'reference': str(get('reference'))[:100],
+            'notes': str(get('notes')),
+        }
+
+    @staticmethod
+    def _apply(rows, created_by, errors):
+        """
+        Aplicar un lote en una transacción. Si falla (validación o error de la base), se
+        divide en mitades (conservando el orden) hasta aislar las filas con error, sin
+        descartar el resto del lote.
+        Retorna la cantidad de filas aplicadas.
+        """
+        try:
+            # Savepoint propio: un error de la base (desborde, restricción) revierte solo este lote
+            with transaction.atomic():
+                MovementService.apply_batch([line for _, _, line in rows], created_by)
+            return len(rows)
+        except OperationalError:
+            # Conexión perdida o bloqueo: no es un error de las filas, la importación falla
+            raise
+        except (ValueError, DatabaseError) as e:
+            if len(rows) == 1:
+                number, values, _ = rows[0]
+                errors(number, values, str(e))
+                return 0
+
+        middle = len(rows) // 2
+        return (
+            ImportService._apply(rows[:middle], created_by, errors)
+            + ImportService._apply(rows[middle:], created_by, errors)
+        )
+
+    @staticmethod
+    def job_timeout():
+        """Segundos sin avances tras los que un job en proceso se retoma"""
+        return getattr(settings, 'IMPORT_JOB_TIMEOUT', ImportService.JOB_TIMEOUT)
+
+    @staticmethod
+    def claimable(now=None):
+        """Jobs que un proceso puede tomar: pendientes, o en proceso sin avances por IMPORT_JOB_TIMEOUT"""
+        stale = (now or timezone.now()) - timedelta(seconds=ImportService.job_timeout())
+        return (
+            Q(status='PENDING')
+            | Q(status='PROCESSING', heartbeat_at__lt=stale)
+            | Q(status='PROCESSING', heartbeat_at__isnull=True, started_at__lt=stale)
+        )
+
+    @staticmethod
+    def _truncate_report(path, rows):
+        """Dejar en el reporte de errores solo el encabezado y las filas ya confirmadas"""
+        partial = f'{path}.tmp'
+        with open(path, newline='', encoding='utf-8') as source, \
+                open(partial, 'w', newline='', encoding='utf-8') as target:
+            writer = csv.writer(target)
+            for row in itertools.islice(csv.reader(source), rows + 1):
+                writer.writerow(row)
+        os.replace(partial, path)
+
+    @staticmethod
+    def run(job):
+        """
+        Procesar un ImportJob pendiente, registrando el progreso en el propio job.
+        Las filas con error se escriben en un reporte CSV descargable.
+        Un job en proceso sin avances por IMPORT_JOB_TIMEOUT (el proceso murió) se
+        retoma desde la última fila confirmada.
+        Retorna el job actualizado o None si otro proceso ya lo tomó.
+        """
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(ImportService.claimable(now), pk=job.pk).update(
+            status='PROCESSING',
+            started_at=Coalesce('started_at', Value(now)),
+            heartbeat_at=now
+        )
+        if not claimed:
+            return None
+
+        # heartbeat_at hace de testigo: si otro proceso retoma el job, este deja de escribir
+        lease = {'heartbeat_at': now}
+        job.refresh_from_db()
+        resumed = job.processed_rows
+
+        report_name = f'imports/errors/{job.id}.csv'
+        report_path = os.path.join(settings.MEDIA_ROOT, report_name)
+        report = {'handle': None, 'writer': None}
+        counters = {'processed': job.processed_rows, 'applied': job.applied_rows, 'errors': job.error_rows}
+
+        if resumed and os.path.exists(report_path):
+            # Las filas escritas después del último avance confirmado se vuelven a procesar
+            ImportService._truncate_report(report_path, job.error_rows)
+            report['handle'] = open(report_path, 'a', newline='', encoding='utf-8')
+            report['writer'] = csv.writer(report['handle'])
+        if resumed:
+            logger.info(f'Importación {job.id} retomada desde la fila {resumed + 1}')
+
+        def errors(number, values, message):
+            if report['handle'] is None:
+                os.makedirs(os.path.dirname(report_path), exist_ok=True)
+                report['handle'] = open(report_path, 'w', newline='', encoding='utf-8')
+                report['writer'] = csv.writer(report['handle'])
+                report['writer'].writerow(['fila', 'error'] + [str(name) for name in header])
+            report['writer'].writerow([number, message] + list(values))
+            counters['errors'] += 1
+
+        def flush(chunk):
+            # Las filas aplicadas y el avance se confirman juntos: al retomar se salta
+            # exactamente lo confirmado
+            with transaction.atomic():
+                if chunk:
+                    counters['applied'] += ImportService._apply(chunk, job.created_by, errors)
+                if report['handle'] is not None:
+                    report['handle'].flush()
+                heartbeat_at = timezone.now()
+                updated = ImportJob.objects.filter(pk=job.pk, heartbeat_at=lease['heartbeat_at']).update(
+                    processed_rows=counters['processed'],
+                    applied_rows=counters['applied'],
+                    error_rows=counters['errors'],
+                    heartbeat_at=heartbeat_at
+                )
+                if not updated:
+                    raise RuntimeError('La importación fue retomada por otro proceso')
+            lease['heartbeat_at'] = heartbeat_at
+
+        header = []
+        try:
+            header, rows = ImportService.read_rows(job.file.path)
+            columns = ImportService._columns(header)
+
+            # Búsquedas en memoria construidas una sola vez por importación
+            products = {
+                product.sku.upper(): product
+                for product in Product.objects.filter(company_id=job.company_id, is_deleted=False).iterator()
+            }
+            warehouses = {
+                warehouse.code.upper(): warehouse
+                for warehouse in Warehouse.objects.filter(company_id=job.company_id, is_deleted=False).iterator()
+            }
+
+            chunk = []
+            for number, values in itertools.islice(rows, resumed, None):
+                counters['processed'] += 1
+                try:
+                    chunk.append((number, values, ImportService._parse(values, columns, products, warehouses)))
+                except ValueError as e:
+                    errors(number, values, str(e))
+
+                if len(chunk) >= ImportService.CHUNK_SIZE:
+                    flush(chunk)
+                    chunk = []
+            flush(chunk)
+
+            status, error_message = 'COMPLETED', ''
+        except Exception as e:
+            logger.exception(f'Error en importación {job.id}')
+            status, error_message = 'FAILED', str(e)
+        finally:
+            if report['handle'] is not None:
+                report['handle'].close()
+
+        ImportJob.objects.filter(pk=job.pk, heartbeat_at=lease['heartbeat_at']).update(
+            status=status,
+            error_message=error_message,
+            processed_rows=counters['processed'],
+            applied_rows=counters['applied'],
+            error_rows=counters['errors'],
+            error_report=report_name if counters['errors'] else None,
+            finished_at=timezone.now()
+        )
+
+        logger.info(
+            f"Importación {job.id}: {counters['applied']} aplicadas, {counters['errors']} con error"
+        )
+
+        job.refresh_from_db()
+        return job
@@ -0,0 +1,120 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections, transaction
+
+from apps.inventory.services import ShardService
+from apps.movements.services import MovementService
+from apps.products.models import Category, Product
+from apps.users.models import Company, User
+from apps.warehouses.models import Warehouse
+
+
+class Command(BaseCommand):
+    help = "Mide el throughput de entradas concurrentes sobre una sola fila de inventario, con y sin stock fragmentado"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movements", type=int, default=2000, help="Entradas por modo")
+        parser.add_argument("--workers", type=int, default=8, help="Hilos concurrentes")
+        parser.add_argument(
+            "--mode",
+            choices=["both", "plain", "sharded"],
+            default="both",
+            help="Modo a medir (por defecto ambos)",
+        )
+        parser.add_argument(
+            "--hold",
+            type=float,
+            default=0.002,
+            help="Segundos que cada entrada mantiene abierta su transacción (simula trabajo del request)",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Este benchmark requiere PostgreSQL")
+
+        product, warehouse, user = self.create_fixture()
+        modes = ["plain", "sharded"] if options["mode"] == "both" else [options["mode"]]
+
+        results = {}
+        for mode in modes:
+            Product.objects.filter(pk=product.pk).update(sharded_stock=(mode == "sharded"))
+            product.refresh_from_db()
+            results[mode] = self.run(product, warehouse, user, options)
+            self.stdout.write(f"{mode}: {options['movements']} entradas en {results[mode]:.2f}s  "
+                              f"{options['movements'] / results[mode]:.1f} entradas/s")
+
+        # Dejar la fila compactada para la siguiente corrida
+        while ShardService.compact():
+            pass
+        Product.objects.filter(pk=product.pk).update(sharded_stock=False)
+
+        if len(results) == 2:
+            self.stdout.write(self.style.SUCCESS(f"Mejora: {results['plain'] / results['sharded']:.2f}x"))
+
+    def run(self, product, warehouse, user, options):
+        total = options["movements"]
+        workers = options["workers"]
+        hold = options["hold"]
+        per_worker = [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+        errors = []
+
+        def entry():
+            movement = MovementService.create_entry(product, warehouse, 1, Decimal("1.00"), user, "BENCH")
+            if hold:
+                time.sleep(hold)
+            return movement
+
+        def worker(count):
+            try:
+                for _ in range(count):
+                    # La pausa dentro de la transacción representa el resto del request
+                    with transaction.atomic():
+                        entry()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        close_old_connections()
+        threads = [threading.Thread(target=worker, args=(count,)) for count in per_worker]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise CommandError(f"{len(errors)} hilos fallaron: {errors[0]}")
+        return elapsed
+
+    def create_fixture(self):
+        company, _ = Company.objects.get_or_create(
+            rut="BENCH-0",
+            defaults={
+                "name": "Bench Company",
+                "address": "-",
+                "phone": "+000000000",
+                "email": "bench@example.com",
+            },
+        )
+        user, _ = User.objects.get_or_create(username="bench", defaults={"company": company})
+        category, _ = Category.objects.get_or_create(company=company, name="Bench")
+        product, _ = Product.objects.get_or_create(
+            company=company,
+            sku="BENCH-HOT",
+            defaults={
+                "name": "Hot SKU",
+                "category": category,
+                "cost_price": Decimal("1.00"),
+                "sale_price": Decimal("1.00"),
+            },
+        )
+        warehouse, _ = Warehouse.objects.get_or_create(
+            code="BENCH-W",
+            defaults={"company": company, "name": "BENCH-W", "location": "-"},
+        )
+        return product, warehouse, user
@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.movements.services import KardexService
+from apps.users.models import Company
+
+
+class Command(BaseCommand):
+    help = "Genera los cierres diarios de Kardex pendientes (programar una vez al día)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, help="Regenerar solo este día (AAAA-MM-DD)")
+        parser.add_argument("--company", help="ID de la compañía (por defecto todas)")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.filter(is_deleted=False)
+        if options["company"]:
+            companies = companies.filter(pk=options["company"])
+
+        # Solo días completos: hasta ayer en hora local
+        yesterday = timezone.localdate() - timedelta(days=1)
+
+        for company in companies:
+            if options["date"]:
+                days = [options["date"]]
+            else:
+                days = KardexService.pending_checkpoint_days(company, yesterday)
+
+            total = 0
+            for day in days:
+                total += KardexService.create_checkpoints(company, day)
+
+            self.stdout.write(f"  {company.name}: {len(days)} días, {total} cierres")
+
+        self.stdout.write(self.style.SUCCESS("Cierres de Kardex generados"))
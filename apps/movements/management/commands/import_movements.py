@@ -0,0 +1,69 @@
+import os
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.movements.imports import ImportService
+from apps.movements.models import ImportJob
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa movimientos desde un archivo CSV/XLSX o procesa las importaciones pendientes "
+        "y las abandonadas por un proceso detenido"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="Archivo CSV o XLSX a importar")
+        parser.add_argument("--user", help="Usuario que registra los movimientos (requerido con un archivo)")
+        parser.add_argument("--pending", action="store_true", help="Procesar las importaciones pendientes")
+        parser.add_argument("--loop", action="store_true", help="Con --pending, ejecutar continuamente")
+        parser.add_argument("--interval", type=float, default=5, help="Segundos entre revisiones con --loop")
+
+    def handle(self, *args, **options):
+        if options["path"]:
+            self.import_file(options["path"], options["user"])
+        elif options["pending"]:
+            while True:
+                self.process_pending()
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        else:
+            raise CommandError("Indique un archivo o --pending")
+
+    def import_file(self, path, username):
+        if not username:
+            raise CommandError("--user es requerido al importar un archivo")
+        if not os.path.exists(path):
+            raise CommandError(f"No existe el archivo {path}")
+
+        user = User.objects.filter(username=username).first()
+        if user is None or user.company_id is None:
+            raise CommandError(f"Usuario {username} no encontrado o sin compañía")
+
+        with open(path, "rb") as handle:
+            job = ImportJob(company_id=user.company_id, created_by=user)
+            job.file.save(os.path.basename(path), File(handle), save=True)
+
+        self.report(ImportService.run(job))
+
+    def process_pending(self):
+        # También retoma los jobs abandonados por un proceso que murió
+        for job in ImportJob.objects.filter(ImportService.claimable()).order_by("created_at").select_related("created_by"):
+            job = ImportService.run(job)
+            if job is not None:
+                self.report(job)
+
+    def report(self, job):
+        self.stdout.write(
+            f"{job.file.name}: {job.processed_rows} filas, {job.applied_rows} aplicadas, {job.error_rows} con error"
+        )
+        if job.status == "FAILED":
+            self.stdout.write(self.style.ERROR(f"Importación fallida: {job.error_message}"))
+        elif job.error_report:
+            self.stdout.write(self.style.WARNING(f"Reporte de errores: {job.error_report.path}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Importación completada"))
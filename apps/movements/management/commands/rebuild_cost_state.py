@@ -0,0 +1,187 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.inventory import ledger
+from apps.inventory.models import Inventory, InventoryShard
+from apps.movements.models import Kardex, KardexCheckpoint, Movement
+from apps.movements.services import KardexService, bump_data_version
+from apps.reports import analytics
+from apps.users.models import Company
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el costo promedio ponderado de inventario y Kardex reproduciendo el "
+        "historial de movimientos en orden, y luego regenera los cierres de Kardex y los "
+        "resúmenes de stock. Ejecutar sin movimientos concurrentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="ID de la compañía a reconstruir (por defecto todas)")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Movimientos por bloque")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        movements = Movement.objects.filter(status="COMPLETED")
+        inventories = Inventory.objects.all()
+        if options["company"]:
+            movements = movements.filter(company_id=options["company"])
+            inventories = inventories.filter(company_id=options["company"])
+
+        folded = self.fold_shards(inventories)
+
+        # Estado corriente por (product_id, warehouse_id)
+        states = {}
+        rows = movements.order_by("created_at", "id").values_list(
+            "id",
+            "movement_type",
+            "product_id",
+            "warehouse_from_id",
+            "warehouse_to_id",
+            "quantity",
+            "unit_cost",
+            "product__cost_price",
+        )
+
+        processed = 0
+        chunk = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                processed += self.replay_chunk(chunk, states)
+                chunk = []
+        if chunk:
+            processed += self.replay_chunk(chunk, states)
+
+        updated = self.update_inventories(inventories, states, chunk_size)
+
+        # Los datos derivados guardan los valores anteriores: cierres de Kardex, resúmenes
+        # de stock, extracción de la analítica y reportes en caché (versión de datos)
+        companies = Company.objects.all()
+        if options["company"]:
+            companies = companies.filter(pk=options["company"])
+        checkpoints = 0
+        for company in companies:
+            checkpoints += self.rebuild_checkpoints(company)
+            analytics.invalidate(company.id)
+            bump_data_version(company.id)
+        call_command("rebuild_stock_summaries", company=options["company"], stdout=self.stdout)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Costo promedio reconstruido: {processed} movimientos, {updated} inventarios, "
+                f"{folded} inventarios fragmentados compactados, {checkpoints} cierres de Kardex"
+            )
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def fold_shards(inventories):
+        """
+        Incorporar a Inventory los fragmentos pendientes antes del replay, así el valor
+        reconstruido corresponde a la cantidad completa de la fila
+        """
+        locked = list(
+            inventories.filter(Exists(InventoryShard.objects.filter(inventory=OuterRef("pk"))))
+            .select_for_update()
+            .order_by("product_id", "warehouse_id")
+            .values_list("id", flat=True)
+        )
+        return len(ledger.fold_shards(locked))
+
+    @staticmethod
+    def rebuild_checkpoints(company):
+        """Regenerar los cierres de Kardex existentes con los saldos valorizados nuevos"""
+        days = sorted(
+            {
+                timezone.localtime(as_of).date()
+                for as_of in KardexCheckpoint.objects.filter(company=company)
+                .values_list("as_of", flat=True)
+                .distinct()
+            }
+        )
+        return sum(KardexService.create_checkpoints(company, day) for day in days)
+
+    def replay_chunk(self, chunk, states):
+        """Reproducir un bloque de movimientos y actualizar sus filas Kardex"""
+        legs = {}
+        empty = ledger.Balance(0, ledger.to_decimal(0), ledger.to_decimal(0))
+
+        for movement_id, movement_type, product_id, from_id, to_id, quantity, unit_cost, cost_price in chunk:
+            unit_cost = ledger.to_decimal(unit_cost)
+
+            if from_id:
+                key = (product_id, from_id)
+                state = states.get(key, empty)
+                if movement_type == "ADJUST" and not state.average_cost:
+                    state = state._replace(average_cost=ledger.to_decimal(cost_price))
+                # Las salidas se valorizan al costo promedio vigente
+                leg_cost = state.average_cost
+                state = ledger.apply_output(state, quantity)
+                states[key] = state
+                legs[(movement_id, from_id)] = ("OUT", leg_cost, quantity, state)
+                if movement_type == "TRANSFER":
+                    unit_cost = leg_cost
+
+            if to_id:
+                key = (product_id, to_id)
+                state = states.get(key, empty)
+                if movement_type == "ADJUST":
+                    unit_cost = state.average_cost or ledger.to_decimal(cost_price)
+                state = ledger.apply_entry(state, quantity, unit_cost)
+                states[key] = state
+                legs[(movement_id, to_id)] = ("IN", unit_cost, quantity, state)
+
+        entries = list(
+            Kardex.objects.filter(movement_id__in=[row[0] for row in chunk]).only(
+                "id", "movement_id", "warehouse_id"
+            )
+        )
+        for entry in entries:
+            leg = legs.get((entry.movement_id, entry.warehouse_id))
+            if leg is None:
+                continue
+            direction, leg_cost, quantity, state = leg
+            entry.unit_cost = leg_cost
+            entry.input_value = leg_cost * quantity if direction == "IN" else 0
+            entry.output_value = leg_cost * quantity if direction == "OUT" else 0
+            entry.balance_value = state.total_value
+
+        with transaction.atomic():
+            Kardex.objects.bulk_update(
+                entries,
+                ["unit_cost", "input_value", "output_value", "balance_value"],
+                batch_size=500,
+            )
+
+        return len(chunk)
+
+    def update_inventories(self, inventories, states, chunk_size):
+        """Escribir en Inventory el saldo valorizado y el costo promedio reproducidos"""
+        pending = []
+        updated = 0
+        for inventory in inventories.only("id", "product_id", "warehouse_id").iterator(
+            chunk_size=chunk_size
+        ):
+            state = states.get((inventory.product_id, inventory.warehouse_id))
+            if state is None:
+                continue
+            # El mismo saldo valorizado que quedó en el último registro Kardex de la fila
+            inventory.average_cost = state.average_cost
+            inventory.total_value = state.total_value
+            pending.append(inventory)
+            if len(pending) >= chunk_size:
+                updated += self.flush_inventories(pending)
+                pending = []
+        if pending:
+            updated += self.flush_inventories(pending)
+        return updated
+
+    @staticmethod
+    @transaction.atomic
+    def flush_inventories(pending):
+        Inventory.objects.bulk_update(pending, ["total_value", "average_cost"], batch_size=500)
+        return len(pending)
@@ -0,0 +1,149 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.inventory.models import Inventory
+from apps.movements.services import MovementService
+from apps.products.models import Category, Product
+from apps.users.models import Company, User
+from apps.warehouses.models import Warehouse
+
+DEADLOCK_DETECTED = "40P01"
+SERIALIZATION_FAILURE = "40001"
+
+
+class Command(BaseCommand):
+    help = "Dispara transferencias cruzadas concurrentes contra PostgreSQL y reporta deadlocks, reintentos y throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transfers", type=int, default=2000, help="Total de transferencias a ejecutar")
+        parser.add_argument("--workers", type=int, default=8, help="Hilos concurrentes")
+        parser.add_argument("--max-retries", type=int, default=5, help="Reintentos por transferencia ante deadlock")
+        parser.add_argument(
+            "--legacy-order",
+            action="store_true",
+            help="Bloquear origen y luego destino (orden anterior) para comparar",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Este arnés requiere PostgreSQL")
+
+        product, warehouses, user = self.create_fixture()
+        total = options["transfers"]
+        workers = options["workers"]
+        max_retries = options["max_retries"]
+        transfer = self.legacy_transfer if options["legacy_order"] else MovementService.create_transfer
+
+        stats = {"completed": 0, "failed": 0, "deadlocks": 0, "retries": 0}
+        lock = threading.Lock()
+        per_worker = [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+
+        def worker(count, seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(count):
+                    # Sentido aleatorio para forzar transferencias cruzadas entre bodegas
+                    origin, destination = rng.sample(warehouses, 2)
+                    for attempt in range(max_retries + 1):
+                        try:
+                            transfer(product, origin, destination, 1, user, "STRESS")
+                            with lock:
+                                stats["completed"] += 1
+                            break
+                        except OperationalError as e:
+                            pgcode = getattr(e.__cause__, "pgcode", None)
+                            if pgcode not in (DEADLOCK_DETECTED, SERIALIZATION_FAILURE):
+                                raise
+                            with lock:
+                                stats["deadlocks"] += 1
+                                if attempt < max_retries:
+                                    stats["retries"] += 1
+                        except ValueError:
+                            # Stock insuficiente en origen: no es contención, se descarta
+                            with lock:
+                                stats["failed"] += 1
+                            break
+                    else:
+                        with lock:
+                            stats["failed"] += 1
+            finally:
+                connections.close_all()
+
+        close_old_connections()
+        threads = [threading.Thread(target=worker, args=(count, i)) for i, count in enumerate(per_worker)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        mode = "orden anterior (origen -> destino)" if options["legacy_order"] else "orden determinista (product_id, warehouse_id)"
+        self.stdout.write(f"Modo: {mode}")
+        self.stdout.write(f"Transferencias: {stats['completed']} completadas, {stats['failed']} fallidas")
+        self.stdout.write(f"Deadlocks: {stats['deadlocks']}  Reintentos: {stats['retries']}")
+        self.stdout.write(f"Tiempo: {elapsed:.2f}s  Throughput: {stats['completed'] / elapsed:.1f} transferencias/s")
+
+        if stats["deadlocks"]:
+            self.stdout.write(self.style.WARNING("Se detectaron deadlocks"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Sin deadlocks"))
+
+    def create_fixture(self):
+        company, _ = Company.objects.get_or_create(
+            rut="STRESS-0",
+            defaults={
+                "name": "Stress Test Company",
+                "address": "-",
+                "phone": "+000000000",
+                "email": "stress@example.com",
+            },
+        )
+        user, _ = User.objects.get_or_create(username="stress", defaults={"company": company})
+        category, _ = Category.objects.get_or_create(company=company, name="Stress")
+        product, _ = Product.objects.get_or_create(
+            company=company,
+            sku="STRESS-SKU",
+            defaults={
+                "name": "Stress Product",
+                "category": category,
+                "cost_price": Decimal("1.00"),
+                "sale_price": Decimal("1.00"),
+            },
+        )
+        warehouses = []
+        for code in ("STRESS-A", "STRESS-B"):
+            warehouse, _ = Warehouse.objects.get_or_create(
+                code=code,
+                defaults={"company": company, "name": code, "location": "-"},
+            )
+            warehouses.append(warehouse)
+            inventory = Inventory.objects.filter(company=company, product=product, warehouse=warehouse).first()
+            if inventory is None or inventory.quantity < 1000000:
+                MovementService.create_entry(product, warehouse, 1000000, Decimal("1.00"), user, "STRESS")
+        return product, warehouses, user
+
+    @staticmethod
+    @transaction.atomic
+    def legacy_transfer(product, warehouse_from, warehouse_to, quantity, created_by, reference=""):
+        """Reproduce el orden de bloqueo anterior: origen primero, destino después"""
+        inventory_from = Inventory.objects.select_for_update().get(
+            company_id=product.company_id, product=product, warehouse=warehouse_from
+        )
+        if inventory_from.quantity < quantity:
+            raise ValueError("Stock insuficiente en origen")
+        # Pausa breve para ensanchar la ventana entre ambos bloqueos
+        time.sleep(0.001)
+        inventory_to = Inventory.objects.select_for_update().get(
+            company_id=product.company_id, product=product, warehouse=warehouse_to
+        )
+        now = timezone.now()
+        Inventory.objects.filter(pk=inventory_from.pk).update(quantity=F("quantity") - quantity, last_movement=now)
+        Inventory.objects.filter(pk=inventory_to.pk).update(quantity=F("quantity") + quantity, last_movement=now)
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:58
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movements', '0001_initial'),
+        ('products', '0001_initial'),
+        ('users', '0001_initial'),
+        ('warehouses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KardexCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('as_of', models.DateTimeField(verbose_name='Saldo al')),
+                ('balance_quantity', models.IntegerField(verbose_name='Saldo cantidad')),
+                ('balance_value', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Saldo valor')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kardex_checkpoints', to='users.company')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kardex_checkpoints', to='products.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kardex_checkpoints', to='warehouses.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Cierre de Kardex',
+                'verbose_name_plural': 'Cierres de Kardex',
+                'ordering': ['-as_of'],
+                'unique_together': {('company', 'warehouse', 'product', 'as_of')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movements', '0002_kardex_checkpoint'),
+        ('products', '0001_initial'),
+        ('users', '0001_initial'),
+        ('warehouses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='kardex',
+            name='movement',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kardex', to='movements.movement'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='kardex',
+            unique_together={('movement', 'warehouse')},
+        ),
+        migrations.AddIndex(
+            model_name='kardex',
+            index=models.Index(fields=['company', 'warehouse', 'product', 'created_at'], name='movements_k_company_2bf99e_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movements', '0003_kardex_transfer_legs'),
+        ('products', '0001_initial'),
+        ('users', '0001_initial'),
+        ('warehouses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movement',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Clave de idempotencia'),
+        ),
+        migrations.AddConstraint(
+            model_name='movement',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', False)), fields=('company', 'idempotency_key'), name='movement_company_idempotency_key'),
+        ),
+    ]
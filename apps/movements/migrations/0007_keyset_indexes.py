@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:38
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Índices sobre tablas grandes: CREATE INDEX CONCURRENTLY no bloquea las escrituras
+    atomic = False
+
+    dependencies = [
+        ('movements', '0006_data_version'),
+        ('products', '0002_product_sharded_stock'),
+        ('users', '0001_initial'),
+        ('warehouses', '0002_warehouse_sharded_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='kardex',
+            index=models.Index(fields=['company', 'created_at', 'id'], name='kardex_company_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='movement',
+            index=models.Index(fields=['company', 'created_at', 'id'], name='movement_company_created_idx'),
+        ),
+    ]
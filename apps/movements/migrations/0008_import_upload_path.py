@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:49
+
+import apps.movements.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movements', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='file',
+            field=models.FileField(upload_to=apps.movements.models.import_upload_path, verbose_name='Archivo'),
+        ),
+    ]
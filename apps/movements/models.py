@@ -71,6 +71,14 @@ class Movement(models.Model):
     reference = models.CharField(max_length=100, blank=True, verbose_name='Referencia')
     notes = models.TextField(blank=True, verbose_name='Notas')
     
+    # Clave enviada por el cliente para que los reintentos no dupliquen el movimiento
+    idempotency_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        verbose_name='Clave de idempotencia'
+    )
+    
     # Usuario
     created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='movements')
     processed_at = models.DateTimeField(null=True, blank=True, verbose_name='Fecha procesado')
@@ -87,6 +95,15 @@ class Movement(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['product', 'created_at']),
             models.Index(fields=['warehouse_from', 'warehouse_to']),
+            # Listado paginado por cursor (created_at, id)
+            models.Index(fields=['company', 'created_at', 'id'], name='movement_company_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'idempotency_key'],
+                condition=models.Q(idempotency_key__isnull=False),
+                name='movement_company_idempotency_key'
+            ),
         ]
     
     def __str__(self):
@@ -105,7 +122,8 @@ class Kardex(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='kardex')
     
-    movement = models.OneToOneField(Movement, on_delete=models.CASCADE, related_name='kardex')
+    # Una entrada por bodega afectada: las transferencias registran origen y destino
+    movement = models.ForeignKey(Movement, on_delete=models.CASCADE, related_name='kardex')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='kardex')
     warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='kardex')
     
@@ -133,10 +151,104 @@ class Kardex(models.Model):
         verbose_name = 'Kardex'
         verbose_name_plural = 'Kardex'
         ordering = ['created_at']
+        unique_together = ['movement', 'warehouse']
         indexes = [
             models.Index(fields=['product', 'created_at']),
             models.Index(fields=['warehouse', 'created_at']),
+            models.Index(fields=['company', 'warehouse', 'product', 'created_at']),
+            # Listado paginado por cursor (created_at, id)
+            models.Index(fields=['company', 'created_at', 'id'], name='kardex_company_created_idx'),
         ]
     
     def __str__(self):
-        return f"{self.created_at} - {self.product.sku} - {self.movement_type}"
\ No newline at end of file
+        return f"{self.created_at} - {self.product.sku} - {self.movement_type}"
+
+class KardexCheckpoint(models.Model):
+    """Saldo de Kardex al cierre de un día por producto y bodega"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='kardex_checkpoints')
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='kardex_checkpoints')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='kardex_checkpoints')
+    
+    as_of = models.DateTimeField(verbose_name='Saldo al')
+    
+    balance_quantity = models.IntegerField(verbose_name='Saldo cantidad')
+    balance_value = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Saldo valor')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado')
+    
+    class Meta:
+        verbose_name = 'Cierre de Kardex'
+        verbose_name_plural = 'Cierres de Kardex'
+        ordering = ['-as_of']
+        unique_together = ['company', 'warehouse', 'product', 'as_of']
+    
+    def __str__(self):
+        return f"{self.as_of} - {self.product_id} - {self.warehouse_id}: {self.balance_quantity}"
+
+def import_upload_path(instance, filename):
+    """Carpeta aleatoria por archivo subido: la ruta no se deduce del nombre original"""
+    return f'imports/{instance.company_id}/{uuid.uuid4().hex}/{filename}'
+
+
+class ImportJob(models.Model):
+    """Importación masiva de movimientos desde un archivo CSV o XLSX"""
+    
+    STATUS_CHOICES = [
+        ('PENDING', 'Pendiente'),
+        ('PROCESSING', 'Procesando'),
+        ('COMPLETED', 'Completado'),
+        ('FAILED', 'Fallido'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='import_jobs')
+    
+    file = models.FileField(upload_to=import_upload_path, verbose_name='Archivo')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name='Estado')
+    
+    # Progreso
+    processed_rows = models.IntegerField(default=0, verbose_name='Filas procesadas')
+    applied_rows = models.IntegerField(default=0, verbose_name='Filas aplicadas')
+    error_rows = models.IntegerField(default=0, verbose_name='Filas con error')
+    
+    error_report = models.FileField(upload_to='imports/errors/', null=True, blank=True, verbose_name='Reporte de errores')
+    error_message = models.TextField(blank=True, verbose_name='Error')
+    
+    created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='import_jobs')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado')
+    # Último avance del proceso que tiene el job; si se detiene, otro proceso lo retoma
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Último avance')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Finalizado')
+    
+    class Meta:
+        verbose_name = 'Importación de movimientos'
+        verbose_name_plural = 'Importaciones de movimientos'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.file.name} - {self.get_status_display()}"
+
+class DataVersion(models.Model):
+    """
+    Versión de los datos de inventario de una compañía.
+    Aumenta con cada transacción confirmada de MovementService y con cada cambio de
+    catálogo; los reportes y métricas en caché se guardan por versión y se reutilizan
+    mientras no cambie.
+    """
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.BigIntegerField(default=0, verbose_name='Versión')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
+    
+    class Meta:
+        verbose_name = 'Versión de datos'
+        verbose_name_plural = 'Versiones de datos'
+    
+    def __str__(self):
+        return f"{self.company_id}: {self.version}"
@@ -1,42 +1,157 @@
-from django.db import transaction
-from django.db.models import F
+from datetime import datetime, time, timedelta
+from functools import wraps
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, Max, OuterRef, Q
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from .models import Movement, Kardex
-from apps.inventory.models import Inventory
+from .models import Movement, Kardex, KardexCheckpoint, DataVersion
+from apps.inventory.models import Inventory, InventoryShard
+from apps.inventory import alerts, ledger, summary
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+
+def idempotent(func):
+    """
+    Devolver el movimiento ya confirmado cuando se repite una clave de idempotencia.
+    La búsqueda es una sola lectura del índice único y ocurre antes de abrir la
+    transacción, por lo que un reintento nunca bloquea filas de inventario.
+    El movimiento devuelto por un reintento queda marcado con replayed = True.
+    """
+    def find(company_id, idempotency_key):
+        return Movement.objects.filter(
+            company_id=company_id,
+            idempotency_key=idempotency_key
+        ).first()
+    
+    @wraps(func)
+    def wrapper(product, *args, idempotency_key=None, **kwargs):
+        if not idempotency_key:
+            return func(product, *args, **kwargs)
+        
+        movement = find(product.company_id, idempotency_key)
+        if movement is not None:
+            logger.info(f'Movimiento repetido con clave {idempotency_key}: {movement.id}')
+            movement.replayed = True
+            return movement
+        
+        try:
+            return func(product, *args, idempotency_key=idempotency_key, **kwargs)
+        except IntegrityError:
+            # Una solicitud concurrente con la misma clave confirmó primero
+            movement = find(product.company_id, idempotency_key)
+            if movement is None:
+                raise
+            movement.replayed = True
+            return movement
+    
+    return wrapper
+
+def bump_data_version(company_id):
+    """
+    Aumentar la versión de datos de la compañía cuando confirme la transacción en curso.
+    El incremento es un INSERT ... ON CONFLICT en autocommit, fuera de la transacción del
+    movimiento, así la fila de versión no queda bloqueada mientras dura el movimiento.
+    """
+    def bump():
+        table = connection.ops.quote_name(DataVersion._meta.db_table)
+        company = connection.ops.quote_name(DataVersion._meta.get_field('company').column)
+        version = connection.ops.quote_name(DataVersion._meta.get_field('version').column)
+        updated_at = connection.ops.quote_name(DataVersion._meta.get_field('updated_at').column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({company}, {version}, {updated_at}) VALUES (%s, 1, %s) "
+                f"ON CONFLICT ({company}) DO UPDATE SET {version} = {table}.{version} + 1, "
+                f"{updated_at} = EXCLUDED.{updated_at}",
+                [DataVersion._meta.get_field('company').get_db_prep_value(company_id, connection), timezone.now()]
+            )
+    
+    transaction.on_commit(bump)
+
 class MovementService:
     """Servicio para manejar movimientos de inventario con transacciones atómicas"""
     
+    # Tamaño de lote para bulk_create/bulk_update
+    BATCH_SIZE = 500
+    
+    @staticmethod
+    def _lock_inventories(company_id, keys, create_missing=(), changes=None):
+        """
+        Bloquear filas de inventario en un único SELECT ... FOR UPDATE.
+        Las filas se bloquean en el orden global (product_id, warehouse_id) que comparten
+        todas las operaciones de varias filas, para que no puedan producir deadlocks.
+        keys: pares (product_id, warehouse_id) a bloquear.
+        create_missing: pares que se crean con cantidad 0 si aún no existen.
+        Los fragmentos de stock de las filas bloqueadas se compactan antes de retornar
+        (anotando la diferencia en changes).
+        Retorna un dict {(product_id, warehouse_id): Inventory}.
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        
+        if create_missing:
+            Inventory.objects.bulk_create(
+                [
+                    Inventory(
+                        company_id=company_id,
+                        product_id=product_id,
+                        warehouse_id=warehouse_id,
+                        quantity=0,
+                        min_stock=0
+                    )
+                    for product_id, warehouse_id in set(create_missing)
+                ],
+                ignore_conflicts=True
+            )
+        
+        condition = Q()
+        for product_id, warehouse_id in keys:
+            condition |= Q(product_id=product_id, warehouse_id=warehouse_id)
+        
+        # La misma consulta indica qué filas tienen fragmentos: sin ellos no hay nada que compactar
+        inventories = list(Inventory.objects.select_for_update().filter(
+            condition, company_id=company_id
+        ).annotate(
+            has_shards=Exists(InventoryShard.objects.filter(inventory=OuterRef('pk')))
+        ).order_by('product_id', 'warehouse_id'))
+        
+        # Con las filas ya bloqueadas, incorporar los fragmentos pendientes (stock fragmentado)
+        folded = ledger.fold_shards([inv.id for inv in inventories if inv.has_shards], changes=changes)
+        for inv in inventories:
+            if inv.id in folded:
+                inv.quantity, inv.total_value, inv.average_cost = folded[inv.id]
+        
+        return {(inv.product_id, inv.warehouse_id): inv for inv in inventories}
+    
     @staticmethod
+    @idempotent
     @transaction.atomic
-    def create_entry(product, warehouse, quantity, unit_cost, created_by, reference='', notes=''):
+    def create_entry(product, warehouse, quantity, unit_cost, created_by, reference='', notes='', idempotency_key=None):
         """
         Crear movimiento de entrada
         """
-        # Bloquear inventario para actualización
-        inventory, created = Inventory.objects.select_for_update().get_or_create(
-            company=product.company,
-            product=product,
-            warehouse=warehouse,
-            defaults={
-                'quantity': 0,
-                'min_stock': 0,
-                'company': product.company
-            }
-        )
-        
         # Validar cantidad
         if quantity <= 0:
             raise ValueError("La cantidad debe ser mayor a 0")
         
+        unit_cost = ledger.to_decimal(unit_cost)
+        now = timezone.now()
+        changes = []
+        
+        # Sumar stock y valor en una sola sentencia (crea el inventario si no existe).
+        # Con stock fragmentado la entrada suma en un fragmento y no bloquea la fila.
+        if ledger.is_sharded(product, warehouse):
+            balance = ledger.add_stock_sharded(product, warehouse, quantity, unit_cost, when=now, changes=changes)
+        else:
+            balance = ledger.add_stock(product, warehouse, quantity, unit_cost, when=now, changes=changes)
+        
         # Crear movimiento
         movement = Movement.objects.create(
-            company=product.company,
+            company_id=product.company_id,
             movement_type='IN',
             product=product,
             quantity=quantity,
@@ -46,63 +161,62 @@ class MovementService:
             reference=reference,
             notes=notes,
             created_by=created_by,
+            idempotency_key=idempotency_key,
             status='COMPLETED',
-            processed_at=timezone.now()
+            processed_at=now
         )
         
-        # Actualizar inventario
-        old_quantity = inventory.quantity
-        inventory.quantity = F('quantity') + quantity
-        inventory.last_movement = timezone.now()
-        inventory.save()
-        inventory.refresh_from_db()
-        
         # Crear registro Kardex
         Kardex.objects.create(
-            company=product.company,
+            company_id=product.company_id,
             movement=movement,
             product=product,
             warehouse=warehouse,
             movement_type='IN',
             input_quantity=quantity,
             output_quantity=0,
-            balance_quantity=inventory.quantity,
+            balance_quantity=balance.quantity,
             input_value=unit_cost * quantity,
             output_value=0,
-            balance_value=inventory.quantity * unit_cost,  # Costo promedio simplificado
+            balance_value=balance.total_value,
             unit_cost=unit_cost,
             reference=reference,
             notes=notes,
             created_by=created_by
         )
         
+        summary.apply(changes, when=now)
+        alerts.emit(changes, when=now)
+        bump_data_version(product.company_id)
+        
         logger.info(f'Entrada creada: {movement.id} - {product.sku} - {quantity}')
         
         return movement
     
     @staticmethod
+    @idempotent
     @transaction.atomic
-    def create_output(product, warehouse, quantity, unit_cost, created_by, reference='', notes=''):
+    def create_output(product, warehouse, quantity, unit_cost, created_by, reference='', notes='',
+                      idempotency_key=None, from_reserved=False):
         """
-        Crear movimiento de salida
+        Crear movimiento de salida.
+        from_reserved indica que la salida consume una reserva confirmada.
         """
-        # Bloquear inventario para actualización
-        try:
-            inventory = Inventory.objects.select_for_update().get(
-                company=product.company,
-                product=product,
-                warehouse=warehouse
-            )
-        except Inventory.DoesNotExist:
-            raise ValueError(f"No hay inventario del producto {product.sku} en {warehouse.name}")
+        unit_cost = ledger.to_decimal(unit_cost)
+        now = timezone.now()
+        changes = []
+        
+        # Restar stock solo si alcanza (UPDATE ... WHERE disponible >= n RETURNING ...)
+        balance = ledger.remove_stock(
+            product, warehouse, quantity, when=now, from_reserved=from_reserved, changes=changes
+        )
         
-        # Validar stock suficiente
-        if inventory.quantity < quantity:
-            raise ValueError(f"Stock insuficiente. Disponible: {inventory.quantity}, Solicitado: {quantity}")
+        # La salida se valoriza al costo promedio ponderado vigente
+        average_cost = balance.average_cost
         
         # Crear movimiento
         movement = Movement.objects.create(
-            company=product.company,
+            company_id=product.company_id,
             movement_type='OUT',
             product=product,
             quantity=quantity,
@@ -112,43 +226,42 @@ class MovementService:
             reference=reference,
             notes=notes,
             created_by=created_by,
+            idempotency_key=idempotency_key,
             status='COMPLETED',
-            processed_at=timezone.now()
+            processed_at=now
         )
         
-        # Actualizar inventario
-        old_quantity = inventory.quantity
-        inventory.quantity = F('quantity') - quantity
-        inventory.last_movement = timezone.now()
-        inventory.save()
-        inventory.refresh_from_db()
-        
         # Crear registro Kardex
         Kardex.objects.create(
-            company=product.company,
+            company_id=product.company_id,
             movement=movement,
             product=product,
             warehouse=warehouse,
             movement_type='OUT',
             input_quantity=0,
             output_quantity=quantity,
-            balance_quantity=inventory.quantity,
+            balance_quantity=balance.quantity,
             input_value=0,
-            output_value=unit_cost * quantity,
-            balance_value=inventory.quantity * unit_cost,
-            unit_cost=unit_cost,
+            output_value=average_cost * quantity,
+            balance_value=balance.total_value,
+            unit_cost=average_cost,
             reference=reference,
             notes=notes,
             created_by=created_by
         )
         
+        summary.apply(changes, when=now)
+        alerts.emit(changes, when=now)
+        bump_data_version(product.company_id)
+        
         logger.info(f'Salida creada: {movement.id} - {product.sku} - {quantity}')
         
         return movement
     
     @staticmethod
+    @idempotent
     @transaction.atomic
-    def create_transfer(product, warehouse_from, warehouse_to, quantity, created_by, reference='', notes=''):
+    def create_transfer(product, warehouse_from, warehouse_to, quantity, created_by, reference='', notes='', idempotency_key=None):
         """
         Crear transferencia entre bodegas
         """
@@ -156,38 +269,34 @@ class MovementService:
         if warehouse_from.id == warehouse_to.id:
             raise ValueError("La bodega origen y destino deben ser diferentes")
         
-        # Bloquear inventario origen
-        try:
-            inventory_from = Inventory.objects.select_for_update().get(
-                company=product.company,
-                product=product,
-                warehouse=warehouse_from
-            )
-        except Inventory.DoesNotExist:
-            raise ValueError(f"No hay inventario del producto {product.sku} en {warehouse_from.name}")
+        now = timezone.now()
+        changes = []
         
-        # Validar stock suficiente
-        if inventory_from.quantity < quantity:
-            raise ValueError(f"Stock insuficiente en origen. Disponible: {inventory_from.quantity}, Solicitado: {quantity}")
+        # Bloquear origen y destino en el orden global (product_id, warehouse_id) con una
+        # sola consulta, así dos transferencias en sentidos opuestos no pueden bloquearse
+        # mutuamente y el destino puede valorizarse con el costo promedio del origen
+        origin_key = (product.id, warehouse_from.id)
+        destination_key = (product.id, warehouse_to.id)
+        MovementService._lock_inventories(
+            product.company_id,
+            [origin_key, destination_key],
+            create_missing=[destination_key],
+            changes=changes
+        )
         
-        # Bloquear o crear inventario destino
-        inventory_to, created = Inventory.objects.select_for_update().get_or_create(
-            company=product.company,
-            product=product,
-            warehouse=warehouse_to,
-            defaults={
-                'quantity': 0,
-                'min_stock': 0,
-                'company': product.company
-            }
+        balance_from = ledger.remove_stock(
+            product, warehouse_from, quantity, when=now,
+            error_label='Stock insuficiente en origen',
+            changes=changes
         )
         
-        # Obtener costo unitario (del inventario origen)
-        unit_cost = inventory_from.product.cost_price
+        # El costo unitario es el costo promedio del inventario origen
+        unit_cost = balance_from.average_cost
+        balance_to = ledger.add_stock(product, warehouse_to, quantity, unit_cost, when=now, changes=changes)
         
         # Crear movimiento
         movement = Movement.objects.create(
-            company=product.company,
+            company_id=product.company_id,
             movement_type='TRANSFER',
             product=product,
             quantity=quantity,
@@ -198,69 +307,71 @@ class MovementService:
             reference=reference,
             notes=notes,
             created_by=created_by,
+            idempotency_key=idempotency_key,
             status='COMPLETED',
-            processed_at=timezone.now()
+            processed_at=now
         )
         
-        # Actualizar inventario origen
-        old_from_quantity = inventory_from.quantity
-        inventory_from.quantity = F('quantity') - quantity
-        inventory_from.last_movement = timezone.now()
-        inventory_from.save()
-        inventory_from.refresh_from_db()
-        
-        # Actualizar inventario destino
-        old_to_quantity = inventory_to.quantity
-        inventory_to.quantity = F('quantity') + quantity
-        inventory_to.last_movement = timezone.now()
-        inventory_to.save()
-        inventory_to.refresh_from_db()
-        
-        # Kardex is OneToOne with movement, so transfer stores a single consolidated record.
-        Kardex.objects.create(
-            company=product.company,
-            movement=movement,
-            product=product,
-            warehouse=warehouse_from,
-            movement_type='TRANSFER',
-            input_quantity=0,
-            output_quantity=quantity,
-            balance_quantity=inventory_from.quantity,
-            input_value=0,
-            output_value=unit_cost * quantity,
-            balance_value=inventory_from.quantity * unit_cost,
-            unit_cost=unit_cost,
-            reference=reference,
-            notes=f"Transferencia {warehouse_from.code} -> {warehouse_to.code}: {notes}",
-            created_by=created_by
-        )
+        # Crear un registro Kardex por bodega (salida en origen, entrada en destino)
+        transfer_notes = f"Transferencia {warehouse_from.code} -> {warehouse_to.code}: {notes}"
+        Kardex.objects.bulk_create([
+            Kardex(
+                company_id=product.company_id,
+                movement=movement,
+                product=product,
+                warehouse=warehouse_from,
+                movement_type='TRANSFER',
+                input_quantity=0,
+                output_quantity=quantity,
+                balance_quantity=balance_from.quantity,
+                input_value=0,
+                output_value=unit_cost * quantity,
+                balance_value=balance_from.total_value,
+                unit_cost=unit_cost,
+                reference=reference,
+                notes=transfer_notes,
+                created_by=created_by
+            ),
+            Kardex(
+                company_id=product.company_id,
+                movement=movement,
+                product=product,
+                warehouse=warehouse_to,
+                movement_type='TRANSFER',
+                input_quantity=quantity,
+                output_quantity=0,
+                balance_quantity=balance_to.quantity,
+                input_value=unit_cost * quantity,
+                output_value=0,
+                balance_value=balance_to.total_value,
+                unit_cost=unit_cost,
+                reference=reference,
+                notes=transfer_notes,
+                created_by=created_by
+            ),
+        ])
+        
+        summary.apply(changes, when=now)
+        alerts.emit(changes, when=now)
+        bump_data_version(product.company_id)
         
         logger.info(f'Transferencia creada: {movement.id} - {product.sku} - {quantity} - {warehouse_from.code} -> {warehouse_to.code}')
         
         return movement
     
     @staticmethod
+    @idempotent
     @transaction.atomic
-    def create_adjustment(product, warehouse, new_quantity, created_by, reason=''):
+    def create_adjustment(product, warehouse, new_quantity, created_by, reason='', idempotency_key=None):
         """
         Crear ajuste de inventario
         """
-        # Bloquear inventario
-        try:
-            inventory = Inventory.objects.select_for_update().get(
-                company=product.company,
-                product=product,
-                warehouse=warehouse
-            )
-        except Inventory.DoesNotExist:
-            # Si no existe, crear con cantidad 0
-            inventory = Inventory.objects.create(
-                company=product.company,
-                product=product,
-                warehouse=warehouse,
-                quantity=0,
-                min_stock=0
-            )
+        # Bloquear inventario (se crea con cantidad 0 si no existe)
+        key = (product.id, warehouse.id)
+        changes = []
+        inventory = MovementService._lock_inventories(
+            product.company_id, [key], create_missing=[key], changes=changes
+        )[key]
         
         # Calcular diferencia
         old_quantity = inventory.quantity
@@ -269,13 +380,24 @@ class MovementService:
         if difference == 0:
             raise ValueError("La cantidad nueva es igual a la actual, no se requiere ajuste")
         
+        if new_quantity < inventory.reserved_quantity:
+            raise ValueError(f"La cantidad nueva no puede ser menor a la reservada ({inventory.reserved_quantity})")
+        
         # Determinar tipo de movimiento
         movement_type = 'ADJUST'
-        unit_cost = inventory.product.cost_price
+        balance = ledger.Balance(inventory.quantity, inventory.total_value, inventory.average_cost)
+        
+        # El ajuste se valoriza al costo promedio (precio costo si aún no hay promedio)
+        unit_cost = balance.average_cost or product.cost_price
+        if difference > 0:
+            balance = ledger.apply_entry(balance, difference, unit_cost)
+        else:
+            balance = ledger.apply_output(balance._replace(average_cost=unit_cost), -difference)
+        now = timezone.now()
         
         # Crear movimiento
         movement = Movement.objects.create(
-            company=product.company,
+            company_id=product.company_id,
             movement_type='ADJUST',
             product=product,
             quantity=abs(difference),
@@ -286,34 +408,323 @@ class MovementService:
             reference='Ajuste de inventario',
             notes=f"Ajuste: {reason}. Anterior: {old_quantity}, Nuevo: {new_quantity}",
             created_by=created_by,
+            idempotency_key=idempotency_key,
             status='COMPLETED',
-            processed_at=timezone.now()
+            processed_at=now
         )
         
-        # Actualizar inventario
-        inventory.quantity = new_quantity
-        inventory.last_movement = timezone.now()
-        inventory.save()
+        # Actualizar solo las columnas de saldo
+        Inventory.objects.filter(pk=inventory.pk).update(
+            quantity=balance.quantity,
+            total_value=balance.total_value,
+            average_cost=balance.average_cost,
+            last_movement=now,
+            updated_at=now
+        )
+        changes.append(summary.diff(
+            product.company_id, product.id, warehouse.id,
+            (inventory.quantity, inventory.total_value),
+            (balance.quantity, balance.total_value),
+            inventory.min_stock
+        ))
         
         # Crear registro Kardex
         Kardex.objects.create(
-            company=product.company,
+            company_id=product.company_id,
             movement=movement,
             product=product,
             warehouse=warehouse,
             movement_type='ADJUST',
             input_quantity=abs(difference) if difference > 0 else 0,
             output_quantity=abs(difference) if difference < 0 else 0,
-            balance_quantity=new_quantity,
+            balance_quantity=balance.quantity,
             input_value=unit_cost * abs(difference) if difference > 0 else 0,
             output_value=unit_cost * abs(difference) if difference < 0 else 0,
-            balance_value=new_quantity * unit_cost,
+            balance_value=balance.total_value,
             unit_cost=unit_cost,
             reference='Ajuste',
             notes=f"Ajuste: {reason}. Diferencia: {difference:+d}",
             created_by=created_by
         )
         
+        summary.apply(changes, when=now)
+        alerts.emit(changes, when=now)
+        bump_data_version(product.company_id)
+        
         logger.info(f'Ajuste creado: {movement.id} - {product.sku} - {difference:+d}')
         
         return movement
+    
+    @staticmethod
+    @transaction.atomic
+    def apply_batch(lines, created_by):
+        """
+        Aplicar un lote de entradas y salidas como una sola unidad.
+        Cada línea es un dict con movement_type ('IN' u 'OUT'), product, warehouse,
+        quantity, unit_cost y opcionalmente reference y notes.
+        """
+        if not lines:
+            return []
+        
+        company_id = lines[0]['product'].company_id
+        
+        # Validar líneas antes de bloquear inventario
+        for line in lines:
+            if line['movement_type'] not in ('IN', 'OUT'):
+                raise ValueError(f"Tipo de movimiento no soportado en lote: {line['movement_type']}")
+            if line['quantity'] <= 0:
+                raise ValueError("La cantidad debe ser mayor a 0")
+            if line['product'].company_id != company_id or line['warehouse'].company_id != company_id:
+                raise ValueError("Todas las líneas del lote deben pertenecer a la misma compañía")
+        
+        keys = [(line['product'].id, line['warehouse'].id) for line in lines]
+        entry_keys = [
+            key for key, line in zip(keys, lines) if line['movement_type'] == 'IN'
+        ]
+        
+        # Bloquear todas las filas afectadas en una sola consulta
+        changes = []
+        inventories = MovementService._lock_inventories(
+            company_id, keys, create_missing=entry_keys, changes=changes
+        )
+        # Saldos al inicio del lote, para anotar la diferencia de cada fila al final
+        initial = {key: (inv.quantity, inv.total_value) for key, inv in inventories.items()}
+        
+        now = timezone.now()
+        movements = []
+        kardex_entries = []
+        # Ids crecientes en el orden de las líneas: desempatan los registros Kardex del
+        # lote que comparten created_at, como leen los saldos históricos
+        kardex_ids = iter(sorted(uuid.uuid4() for _ in lines))
+        
+        for key, line in zip(keys, lines):
+            product = line['product']
+            warehouse = line['warehouse']
+            movement_type = line['movement_type']
+            quantity = line['quantity']
+            unit_cost = ledger.to_decimal(line['unit_cost'])
+            reference = line.get('reference', '')
+            notes = line.get('notes', '')
+            
+            inventory = inventories.get(key)
+            if inventory is None:
+                raise ValueError(f"No hay inventario del producto {product.sku} en {warehouse.name}")
+            
+            # Validar stock y costo promedio en memoria con el saldo acumulado del lote
+            balance = ledger.Balance(inventory.quantity, inventory.total_value, inventory.average_cost)
+            if movement_type == 'OUT':
+                if inventory.available_quantity < quantity:
+                    raise ValueError(f"Stock insuficiente. Disponible: {inventory.available_quantity}, Solicitado: {quantity}")
+                balance = ledger.apply_output(balance, quantity)
+                kardex_cost = balance.average_cost
+            else:
+                balance = ledger.apply_entry(balance, quantity, unit_cost)
+                kardex_cost = unit_cost
+            inventory.quantity, inventory.total_value, inventory.average_cost = balance
+            inventory.last_movement = now
+            inventory.updated_at = now
+            
+            movement = Movement(
+                company_id=company_id,
+                movement_type=movement_type,
+                product=product,
+                quantity=quantity,
+                warehouse_from=warehouse if movement_type == 'OUT' else None,
+                warehouse_to=warehouse if movement_type == 'IN' else None,
+                unit_cost=unit_cost,
+                total_cost=unit_cost * quantity,
+                reference=reference,
+                notes=notes,
+                created_by=created_by,
+                status='COMPLETED',
+                processed_at=now
+            )
+            movements.append(movement)
+            
+            kardex_entries.append(Kardex(
+                id=next(kardex_ids),
+                company_id=company_id,
+                movement=movement,
+                product=product,
+                warehouse=warehouse,
+                movement_type=movement_type,
+                input_quantity=quantity if movement_type == 'IN' else 0,
+                output_quantity=quantity if movement_type == 'OUT' else 0,
+                balance_quantity=balance.quantity,
+                input_value=kardex_cost * quantity if movement_type == 'IN' else 0,
+                output_value=kardex_cost * quantity if movement_type == 'OUT' else 0,
+                balance_value=balance.total_value,
+                unit_cost=kardex_cost,
+                reference=reference,
+                notes=notes,
+                created_by=created_by
+            ))
+        
+        Movement.objects.bulk_create(movements, batch_size=MovementService.BATCH_SIZE)
+        Kardex.objects.bulk_create(kardex_entries, batch_size=MovementService.BATCH_SIZE)
+        Inventory.objects.bulk_update(
+            list(inventories.values()),
+            ['quantity', 'total_value', 'average_cost', 'last_movement', 'updated_at'],
+            batch_size=MovementService.BATCH_SIZE
+        )
+        changes += [
+            summary.diff(company_id, product_id, warehouse_id, initial[(product_id, warehouse_id)],
+                         (inv.quantity, inv.total_value), inv.min_stock)
+            for (product_id, warehouse_id), inv in inventories.items()
+        ]
+        summary.apply(changes, when=now)
+        alerts.emit(changes, when=now)
+        
+        bump_data_version(company_id)
+        
+        logger.info(f'Lote aplicado: {len(movements)} movimientos en {len(inventories)} inventarios')
+        
+        return movements
+
+
+class KardexService:
+    """Servicio de consultas históricas de Kardex apoyadas en cierres diarios"""
+    
+    @staticmethod
+    def day_end(day):
+        """Último instante del día en la zona horaria local"""
+        return timezone.make_aware(datetime.combine(day, time.max))
+    
+    @staticmethod
+    def stock_as_of(product, warehouse, ts):
+        """
+        Saldo de un producto en una bodega en el instante ts.
+        Lee el cierre más cercano anterior a ts y solo la cola de Kardex posterior a él.
+        """
+        checkpoint = KardexCheckpoint.objects.filter(
+            company_id=product.company_id,
+            warehouse=warehouse,
+            product=product,
+            as_of__lte=ts
+        ).order_by('-as_of').values_list('as_of', 'balance_quantity', 'balance_value').first()
+        
+        tail = Kardex.objects.filter(
+            company_id=product.company_id,
+            warehouse=warehouse,
+            product=product,
+            created_at__lte=ts
+        )
+        if checkpoint:
+            tail = tail.filter(created_at__gt=checkpoint[0])
+        
+        # Las filas de un lote comparten created_at: el id desempata en el orden del lote
+        last = tail.order_by('-created_at', '-id').values_list('balance_quantity', 'balance_value').first()
+        if last is None:
+            last = checkpoint[1:] if checkpoint else (0, 0)
+        
+        quantity, value = last
+        value = ledger.to_decimal(value)
+        average_cost = (value / quantity).quantize(ledger.COST_PRECISION) if quantity else ledger.to_decimal(0)
+        return ledger.Balance(quantity, value, average_cost)
+    
+    @staticmethod
+    def opening_balances(product, day):
+        """
+        Saldo inicial del producto en cada una de sus bodegas al comenzar el día indicado
+        (cierre del día anterior). Retorna una lista de (bodega, Balance).
+        """
+        ts = KardexService.day_end(day - timedelta(days=1))
+        inventories = Inventory.objects.filter(
+            company_id=product.company_id,
+            product=product
+        ).select_related('warehouse').order_by('warehouse__name')
+        return [
+            (inventory.warehouse, KardexService.stock_as_of(product, inventory.warehouse, ts))
+            for inventory in inventories
+        ]
+    
+    @staticmethod
+    def stock_snapshot(company, ts, warehouse=None):
+        """
+        Saldos de todos los productos de una compañía en el instante ts.
+        Retorna un dict {(product_id, warehouse_id): (balance_quantity, balance_value)}.
+        """
+        checkpoints = KardexCheckpoint.objects.filter(company=company, as_of__lte=ts)
+        tail = Kardex.objects.filter(company=company, created_at__lte=ts)
+        if warehouse is not None:
+            checkpoints = checkpoints.filter(warehouse=warehouse)
+            tail = tail.filter(warehouse=warehouse)
+        
+        # Cierre más reciente por producto y bodega (DISTINCT ON en PostgreSQL)
+        balances = {
+            (product_id, warehouse_id): (quantity, value)
+            for product_id, warehouse_id, quantity, value in checkpoints.order_by(
+                'warehouse_id', 'product_id', '-as_of'
+            ).distinct('warehouse_id', 'product_id').values_list(
+                'product_id', 'warehouse_id', 'balance_quantity', 'balance_value'
+            ).iterator(chunk_size=2000)
+        }
+        
+        # Los cierres se generan día a día sin huecos, la cola parte del último día cerrado
+        last_closed = checkpoints.aggregate(last=Max('as_of'))['last']
+        if last_closed:
+            tail = tail.filter(created_at__gt=last_closed)
+        
+        for product_id, warehouse_id, quantity, value in tail.order_by('created_at', 'id').values_list(
+            'product_id', 'warehouse_id', 'balance_quantity', 'balance_value'
+        ).iterator(chunk_size=2000):
+            balances[(product_id, warehouse_id)] = (quantity, value)
+        
+        return balances
+    
+    @staticmethod
+    @transaction.atomic
+    def create_checkpoints(company, day):
+        """Guardar el último saldo del día de cada producto y bodega con movimientos ese día"""
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        as_of = KardexService.day_end(day)
+        
+        last_balances = {}
+        for product_id, warehouse_id, quantity, value in Kardex.objects.filter(
+            company=company,
+            created_at__gte=start,
+            created_at__lte=as_of
+        ).order_by('created_at', 'id').values_list(
+            'product_id', 'warehouse_id', 'balance_quantity', 'balance_value'
+        ).iterator(chunk_size=2000):
+            last_balances[(product_id, warehouse_id)] = (quantity, value)
+        
+        KardexCheckpoint.objects.bulk_create(
+            [
+                KardexCheckpoint(
+                    company=company,
+                    product_id=product_id,
+                    warehouse_id=warehouse_id,
+                    as_of=as_of,
+                    balance_quantity=quantity,
+                    balance_value=value
+                )
+                for (product_id, warehouse_id), (quantity, value) in last_balances.items()
+            ],
+            batch_size=MovementService.BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['company', 'warehouse', 'product', 'as_of'],
+            update_fields=['balance_quantity', 'balance_value']
+        )
+        
+        return len(last_balances)
+    
+    @staticmethod
+    def pending_checkpoint_days(company, until):
+        """Días sin cierre entre el último cierre (o el primer Kardex) y until"""
+        last = KardexCheckpoint.objects.filter(company=company).aggregate(last=Max('as_of'))['last']
+        if last:
+            day = timezone.localtime(last).date() + timedelta(days=1)
+        else:
+            first = Kardex.objects.filter(company=company).order_by('created_at').values_list(
+                'created_at', flat=True
+            ).first()
+            if first is None:
+                return []
+            day = timezone.localtime(first).date()
+        
+        days = []
+        while day <= until:
+            days.append(day)
+            day += timedelta(days=1)
+        return days
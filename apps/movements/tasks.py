@@ -0,0 +1,15 @@
+from celery import shared_task
+from .imports import ImportService
+from .models import ImportJob
+
+
+# acks_late: si el worker muere el mensaje vuelve a la cola. Mientras el job siga en
+# proceso se reintenta hasta que termine o venza IMPORT_JOB_TIMEOUT y pueda retomarse.
+@shared_task(bind=True, ignore_result=True, acks_late=True, reject_on_worker_lost=True, max_retries=None)
+def run_import(self, job_id):
+    """Procesar una importación de movimientos pendiente o abandonada"""
+    job = ImportJob.objects.select_related('created_by').filter(pk=job_id).first()
+    if job is None or ImportService.run(job) is not None:
+        return
+    if ImportJob.objects.filter(pk=job_id, status='PROCESSING').exists():
+        raise self.retry(countdown=ImportService.job_timeout())
@@ -7,6 +7,9 @@ urlpatterns = [
     path('', views.movement_list, name='movement_list'),
     path('create/<str:movement_type>/', views.movement_create, name='movement_create'),
     path('<uuid:pk>/', views.movement_detail, name='movement_detail'),
+    path('import/', views.import_list, name='import_list'),
+    path('import/<uuid:pk>/', views.import_detail, name='import_detail'),
+    path('import/<uuid:pk>/errors/', views.import_errors, name='import_errors'),
     path('kardex/', views.kardex_list, name='kardex'),
     path('kardex/product/<uuid:product_id>/', views.kardex_by_product, name='kardex_by_product'),
 ]
\ No newline at end of file
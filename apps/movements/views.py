@@ -1,14 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.db import transaction
-from django.core.paginator import Paginator
 from django.db.models import Q
-from .models import Movement, Kardex
-from .services import MovementService
+from django.utils import timezone
+from inventory.pagination import paginate
+from .models import Movement, Kardex, ImportJob
+from .services import MovementService, KardexService
+from .tasks import run_import
 from apps.products.models import Product
 from apps.warehouses.models import Warehouse
+from datetime import date, datetime, time
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +23,9 @@ logger = logging.getLogger(__name__)
 def movement_list(request):
     movements_list = Movement.objects.filter(company=request.user.company).select_related(
         'product', 'warehouse_from', 'warehouse_to', 'created_by'
-    ).order_by('-created_at')
+    )
     
-    paginator = Paginator(movements_list, 20)
-    page = request.GET.get('page')
-    movements = paginator.get_page(page)
+    movements = paginate(request, movements_list, 20, ('-created_at', '-id'))
     
     return render(request, 'movements/movement_list.html', {'movements': movements})
 
@@ -45,6 +49,10 @@ def movement_create(request, movement_type):
         unit_cost = float(request.POST.get('unit_cost', 0))
         reference = request.POST.get('reference', '')
         notes = request.POST.get('notes', '')
+        # Clave del formulario o del encabezado Idempotency-Key (escáneres y reintentos de proxy)
+        idempotency_key = (
+            request.POST.get('idempotency_key') or request.META.get('HTTP_IDEMPOTENCY_KEY') or None
+        )
         
         try:
             product = Product.objects.get(id=product_id, company=request.user.company)
@@ -54,7 +62,8 @@ def movement_create(request, movement_type):
                     warehouse = Warehouse.objects.get(id=warehouse_id, company=request.user.company)
                     MovementService.create_entry(
                         product, warehouse, quantity, unit_cost, 
-                        request.user, reference, notes
+                        request.user, reference, notes,
+                        idempotency_key=idempotency_key
                     )
                     messages.success(request, 'Entrada registrada exitosamente')
                 
@@ -62,7 +71,8 @@ def movement_create(request, movement_type):
                     warehouse = Warehouse.objects.get(id=warehouse_id, company=request.user.company)
                     MovementService.create_output(
                         product, warehouse, quantity, unit_cost, 
-                        request.user, reference, notes
+                        request.user, reference, notes,
+                        idempotency_key=idempotency_key
                     )
                     messages.success(request, 'Salida registrada exitosamente')
                 
@@ -71,7 +81,8 @@ def movement_create(request, movement_type):
                     warehouse_to = Warehouse.objects.get(id=warehouse_to_id, company=request.user.company)
                     MovementService.create_transfer(
                         product, warehouse_from, warehouse_to, quantity,
-                        request.user, reference, notes
+                        request.user, reference, notes,
+                        idempotency_key=idempotency_key
                     )
                     messages.success(request, 'Transferencia registrada exitosamente')
                 
@@ -79,7 +90,8 @@ def movement_create(request, movement_type):
                     warehouse = Warehouse.objects.get(id=warehouse_id, company=request.user.company)
                     MovementService.create_adjustment(
                         product, warehouse, quantity,
-                        request.user, notes
+                        request.user, notes,
+                        idempotency_key=idempotency_key
                     )
                     messages.success(request, 'Ajuste registrado exitosamente')
                 
@@ -95,6 +107,7 @@ def movement_create(request, movement_type):
         'movement_type': movement_type,
         'products': products,
         'warehouses': warehouses,
+        'idempotency_key': uuid.uuid4().hex,
         'title': f'Crear {dict(Movement.MOVEMENT_TYPES).get(movement_type, movement_type)}'
     }
     
@@ -105,11 +118,9 @@ def movement_create(request, movement_type):
 def kardex_list(request):
     kardex_list = Kardex.objects.filter(company=request.user.company).select_related(
         'product', 'warehouse', 'created_by'
-    ).order_by('-created_at')
+    )
     
-    paginator = Paginator(kardex_list, 20)
-    page = request.GET.get('page')
-    kardex = paginator.get_page(page)
+    kardex = paginate(request, kardex_list, 20, ('-created_at', '-id'))
     
     return render(request, 'movements/kardex_list.html', {'kardex': kardex})
 
@@ -119,9 +130,83 @@ def kardex_by_product(request, product_id):
     product = get_object_or_404(Product, id=product_id, company=request.user.company)
     kardex_list = Kardex.objects.filter(
         company=request.user.company, product=product
-    ).select_related('warehouse', 'created_by').order_by('-created_at')
+    ).select_related('warehouse', 'created_by').order_by('-created_at', '-id')
+    
+    # Desde una fecha: solo los registros posteriores y el saldo inicial leído de los cierres
+    date_from = request.GET.get('date_from', '')
+    day = None
+    openings = []
+    if date_from:
+        try:
+            day = date.fromisoformat(date_from)
+        except ValueError:
+            messages.error(request, 'Fecha inválida')
+            date_from = ''
+        else:
+            kardex_list = kardex_list.filter(
+                created_at__gte=timezone.make_aware(datetime.combine(day, time.min))
+            )
+            openings = KardexService.opening_balances(product, day)
     
     return render(request, 'movements/kardex_by_product.html', {
         'product': product,
-        'kardex': kardex_list
-    })
\ No newline at end of file
+        'kardex': kardex_list,
+        'date_from': date_from,
+        'day': day,
+        'openings': openings
+    })
+
+@login_required
+@permission_required('movements.add_movement', raise_exception=True)
+def import_list(request):
+    """Importaciones masivas: carga de archivo y listado de trabajos"""
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if upload is None or not upload.name.lower().endswith(('.csv', '.xlsx')):
+            messages.error(request, 'Debe seleccionar un archivo CSV o XLSX')
+            return redirect('movements:import_list')
+        
+        job = ImportJob.objects.create(
+            company=request.user.company,
+            file=upload,
+            created_by=request.user
+        )
+        
+        # El archivo se procesa en un worker de Celery
+        job_id = str(job.id)
+        transaction.on_commit(lambda: run_import.delay(job_id))
+        messages.success(request, 'Importación en cola, el progreso se actualiza en esta página')
+        
+        return redirect('movements:import_detail', pk=job.pk)
+    
+    jobs_list = ImportJob.objects.filter(company=request.user.company).select_related('created_by')
+    
+    jobs = paginate(request, jobs_list, 20, ('-created_at', '-id'))
+    
+    return render(request, 'movements/import_list.html', {'jobs': jobs})
+
+@login_required
+@permission_required('movements.add_movement', raise_exception=True)
+def import_detail(request, pk):
+    job = get_object_or_404(ImportJob, pk=pk, company=request.user.company)
+    
+    return render(request, 'movements/import_detail.html', {'job': job})
+
+@login_required
+@permission_required('movements.add_movement', raise_exception=True)
+def import_errors(request, pk):
+    """Descargar el reporte CSV de filas con error"""
+    job = get_object_or_404(ImportJob, pk=pk, company=request.user.company)
+    if not job.error_report:
+        raise Http404('La importación no tiene errores')
+    
+    filename = f'errores_importacion_{job.id}.csv'
+    
+    if settings.REPORTS_X_ACCEL_REDIRECT:
+        # nginx envía el archivo desde la ubicación interna /media/imports/
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Accel-Redirect'] = job.error_report.url
+        return response
+    
+    return FileResponse(job.error_report.open('rb'), as_attachment=True, filename=filename)
@@ -4,7 +4,7 @@ from apps.products.models import Product, Category
 from .serializers import ProductSerializer, CategorySerializer
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.filter(is_deleted=False)
+    queryset = Product.objects.filter(is_deleted=False).with_stock_summary()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
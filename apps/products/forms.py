@@ -4,7 +4,7 @@ from .models import Product, Category
 class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
-        fields = ['sku', 'name', 'description', 'category', 'cost_price', 'sale_price', 'image', 'is_active']
+        fields = ['sku', 'name', 'description', 'category', 'cost_price', 'sale_price', 'image', 'is_active', 'sharded_stock']
         widgets = {
             'sku': forms.TextInput(attrs={'class': 'form-control'}),
             'name': forms.TextInput(attrs={'class': 'form-control'}),
@@ -14,6 +14,7 @@ class ProductForm(forms.ModelForm):
             'sale_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'image': forms.FileInput(attrs={'class': 'form-control'}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'sharded_stock': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
     
     def clean_sku(self):
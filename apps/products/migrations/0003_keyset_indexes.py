@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:38
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Índices sobre tablas grandes: CREATE INDEX CONCURRENTLY no bloquea las escrituras
+    atomic = False
+
+    dependencies = [
+        ('products', '0002_product_sharded_stock'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['company', 'name', 'id'], name='product_company_name_idx'),
+        ),
+    ]
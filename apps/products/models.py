@@ -1,11 +1,13 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.urls import reverse
 from apps.users.models import Company
+from apps.audit.tracking import AuditedModelMixin
 import uuid
 
-class Category(models.Model):
+class Category(AuditedModelMixin, models.Model):
     """Categoría jerárquica de productos"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='categories')
@@ -44,7 +46,16 @@ class Category(models.Model):
             return f"{self.parent.full_path} > {self.name}"
         return self.name
 
-class Product(models.Model):
+class ProductQuerySet(models.QuerySet):
+    
+    def with_stock_summary(self):
+        """Anotar summary_stock desde el resumen de stock (sin recorrer Inventory)"""
+        return self.annotate(
+            summary_stock=Coalesce(models.Sum('stock_summary__total_units'), 0)
+        )
+
+
+class Product(AuditedModelMixin, models.Model):
     """Modelo de productos"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='products')
@@ -71,6 +82,8 @@ class Product(models.Model):
     
     # Control
     is_active = models.BooleanField(default=True, verbose_name='Activo')
+    # Stock fragmentado para filas de inventario muy concurridas
+    sharded_stock = models.BooleanField(default=False, verbose_name='Stock fragmentado')
     
     # Soft delete
     is_deleted = models.BooleanField(default=False, verbose_name='Eliminado')
@@ -79,6 +92,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
@@ -88,6 +103,8 @@ class Product(models.Model):
             models.Index(fields=['sku', 'company']),
             models.Index(fields=['name', 'company']),
             models.Index(fields=['is_active']),
+            # Listado paginado por cursor (name, id)
+            models.Index(fields=['company', 'name', 'id'], name='product_company_name_idx'),
         ]
     
     def __str__(self):
@@ -121,10 +138,10 @@ class Product(models.Model):
     
     @property
     def total_stock(self):
-        """Obtener stock total del producto"""
-        return self.inventories.aggregate(
-            total=models.Sum('quantity')
-        )['total'] or 0
+        """Obtener stock total del producto (incluye fragmentos sin compactar)"""
+        if hasattr(self, 'summary_stock'):
+            return self.summary_stock
+        return self.stock_summary.aggregate(total=models.Sum('total_units'))['total'] or 0
     
     def get_absolute_url(self):
         return reverse('products:product_detail', kwargs={'pk': self.pk})
\ No newline at end of file
@@ -1,12 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
-from django.db import models, transaction
-from django.core.paginator import Paginator
+from django.db import models
 from django.db.models import Q, F, Sum
 from django.utils import timezone
+from inventory.pagination import paginate
 from .models import Product, Category
 from .forms import ProductForm, CategoryForm
+from apps.audit import writer as audit_writer
 from apps.audit.decorators import audit_method
 import logging
 
@@ -38,9 +39,7 @@ def product_list(request):
     if category_id:
         products_list = products_list.filter(category_id=category_id)
     
-    paginator = Paginator(products_list, 10)
-    page = request.GET.get('page')
-    products = paginator.get_page(page)
+    products = paginate(request, products_list, 10, ('name', 'id'))
     
     categories = Category.objects.filter(
         company=request.user.company,
@@ -90,7 +89,7 @@ def product_create(request):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES)
         if form.is_valid():
-            with transaction.atomic():
+            with audit_writer.atomic():
                 product = form.save(commit=False)
                 product.company = request.user.company
                 product.save()
@@ -118,7 +117,7 @@ def product_edit(request, pk):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
-            with transaction.atomic():
+            with audit_writer.atomic():
                 form.save()
                 messages.success(request, f'Producto {product.name} actualizado')
                 logger.info(f'Usuario {request.user.username} editó producto {product.sku}')
@@ -143,7 +142,7 @@ def product_delete(request, pk):
     
     if request.method == 'POST':
         try:
-            with transaction.atomic():
+            with audit_writer.atomic():
                 product.delete()
                 messages.success(request, f'Producto {product.name} eliminado')
                 logger.info(f'Usuario {request.user.username} eliminó producto {product.sku}')
@@ -173,7 +172,7 @@ def category_create(request):
     if request.method == 'POST':
         form = CategoryForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
+            with audit_writer.atomic():
                 category = form.save(commit=False)
                 category.company = request.user.company
                 category.save()
@@ -204,7 +203,7 @@ def category_edit(request, pk):
     if request.method == 'POST':
         form = CategoryForm(request.POST, instance=category)
         if form.is_valid():
-            with transaction.atomic():
+            with audit_writer.atomic():
                 form.save()
                 messages.success(request, f'Categoria {category.name} actualizada')
             return redirect('products:category_list')
@@ -234,7 +233,7 @@ def category_delete(request, pk):
     )
 
     if request.method == 'POST':
-        with transaction.atomic():
+        with audit_writer.atomic():
             category.delete()
             messages.success(request, f'Categoria {category.name} eliminada')
         return redirect('products:category_list')
@@ -0,0 +1,474 @@
+"""
+Analítica de inventario por bodega: clasificación ABC, rotación, días de cobertura y
+stock inmovilizado.
+
+El kardex de cada compañía se extrae a un formato columnar en disco
+(ANALYTICS_DIR/<compañía>/, fuera de MEDIA_ROOT para que nginx no lo sirva): cada
+refresco lee con un cursor del servidor solo las filas posteriores a la última
+extracción y las guarda como un segmento .npz de arrays NumPy (fechas en segundos,
+productos y bodegas como códigos enteros con su diccionario de UUIDs). Los segmentos
+se fusionan cuando pasan de MAX_SEGMENTS.
+
+Las métricas se calculan sobre esos arrays con group-bys de pandas, sin instanciar
+modelos:
+
+    consumo            valor de salidas y transferencias de salida en el período
+    valor promedio     saldo valorizado ponderado por el tiempo que se mantuvo
+    rotación           consumo / valor promedio
+    días de cobertura  stock actual / salida diaria promedio
+    inmovilizado       con stock y sin salidas en DEAD_STOCK_DAYS días
+    clase ABC          por bodega, según la participación acumulada en el consumo
+
+Kardex.created_at se asigna en Python antes del COMMIT, así que una fila puede
+confirmarse mucho después de su created_at. La marca de agua de cada refresco es el
+inicio de la transacción abierta más antigua de la base (pg_stat_activity), menos
+EXTRACT_LAG de margen por la diferencia de relojes entre la aplicación y la base: toda
+fila con created_at anterior ya está confirmada, por larga que haya sido su transacción.
+Los procesos que reescriben el kardex (rebuild_cost_state) llaman a invalidate() para
+que el próximo refresco rehaga la extracción completa.
+
+Los refrescos corren en el worker (tasks.refresh_analytics); la vista muestra la
+extracción vigente y encarga el refresco cuando tiene más de MAX_AGE.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
+from apps.movements.models import Kardex
+from apps.products.models import Product
+from apps.warehouses.models import Warehouse
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_DIR = 'analytics'
+
+# Margen de la marca de agua por la diferencia de relojes entre la aplicación y la base
+EXTRACT_LAG = timedelta(minutes=5)
+
+# Filas leídas por viaje del cursor del servidor
+CHUNK_SIZE = 20000
+
+# Segmentos antes de fusionarlos en uno
+MAX_SEGMENTS = 16
+
+# Antigüedad máxima de la extracción al consultar la analítica
+MAX_AGE = timedelta(minutes=15)
+
+# Tiempo mínimo entre refrescos encargados al worker por una misma compañía
+REFRESH_INTERVAL = 60
+
+# Parámetros por defecto
+PERIOD_DAYS = 365
+DEAD_STOCK_DAYS = 90
+ABC_THRESHOLDS = (0.8, 0.95)
+
+CACHE_TIMEOUT = 3600
+
+MOVEMENT_CODES = {code: index for index, (code, _) in enumerate(Kardex.MOVEMENT_TYPES)}
+DEMAND_CODES = [MOVEMENT_CODES['OUT'], MOVEMENT_CODES['TRANSFER']]
+
+FIELDS = [
+    'created_at', 'product_id', 'warehouse_id', 'movement_type', 'input_quantity',
+    'output_quantity', 'output_value', 'balance_quantity', 'balance_value',
+]
+DTYPES = {
+    'created_at': 'int64',
+    'product': 'int32',
+    'warehouse': 'int32',
+    'movement_type': 'int8',
+    'input_quantity': 'int32',
+    'output_quantity': 'int32',
+    'output_value': 'float64',
+    'balance_quantity': 'int32',
+    'balance_value': 'float64',
+}
+
+Extract = namedtuple('Extract', ['columns', 'products', 'warehouses', 'as_of'])
+Analytics = namedtuple('Analytics', ['items', 'warehouses', 'as_of'])
+
+
+class _Dictionary:
+    """Codificación de UUIDs a enteros consecutivos (en orden de aparición)"""
+
+    def __init__(self):
+        self.index = {}
+
+    def encode(self, values):
+        codes, uniques = pd.factorize(values)
+        mapping = np.array(
+            [self.index.setdefault(str(key), len(self.index)) for key in uniques], dtype='int32'
+        )
+        return mapping[codes] if len(mapping) else codes.astype('int32')
+
+    def keys(self):
+        return np.array(list(self.index), dtype='U36')
+
+
+def _directory(company_id):
+    base = getattr(settings, 'ANALYTICS_DIR', os.path.join(settings.BASE_DIR, 'var', 'analytics'))
+    return os.path.join(base, str(company_id))
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, 'extract.json')) as meta:
+            return json.load(meta)
+    except FileNotFoundError:
+        return {'watermark': None, 'segments': [], 'rows': 0}
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, 'extract.json')
+    with open(f'{path}.tmp', 'w') as output:
+        json.dump(meta, output)
+    os.replace(f'{path}.tmp', path)
+
+
+def _write_segment(directory, name, columns, products, warehouses):
+    path = os.path.join(directory, name)
+    with open(f'{path}.tmp', 'wb') as output:
+        np.savez(output, product_keys=products, warehouse_keys=warehouses, **columns)
+    os.replace(f'{path}.tmp', path)
+
+
+def _extract(company_id, since, until):
+    """
+    Filas del kardex en [since, until) como arrays por columna.
+    Retorna (columnas, claves de producto, claves de bodega).
+    """
+    queryset = Kardex.objects.filter(company_id=company_id, created_at__lt=until)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    rows = queryset.order_by().values_list(*FIELDS).iterator(chunk_size=CHUNK_SIZE)
+
+    products = _Dictionary()
+    warehouses = _Dictionary()
+    chunks = []
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        frame = pd.DataFrame.from_records(chunk, columns=FIELDS)
+        chunks.append({
+            'created_at': pd.to_datetime(frame['created_at'], utc=True).to_numpy('datetime64[s]').astype('int64'),
+            'product': products.encode(frame['product_id']),
+            'warehouse': warehouses.encode(frame['warehouse_id']),
+            'movement_type': frame['movement_type'].map(MOVEMENT_CODES).to_numpy(),
+            'input_quantity': frame['input_quantity'].to_numpy(),
+            'output_quantity': frame['output_quantity'].to_numpy(),
+            'output_value': frame['output_value'].astype('float64').to_numpy(),
+            'balance_quantity': frame['balance_quantity'].to_numpy(),
+            'balance_value': frame['balance_value'].astype('float64').to_numpy(),
+        })
+
+    columns = {
+        name: np.concatenate([chunk[name] for chunk in chunks]).astype(dtype) if chunks else np.empty(0, dtype)
+        for name, dtype in DTYPES.items()
+    }
+    return columns, products.keys(), warehouses.keys()
+
+
+def load(company_id):
+    """Extracción vigente de la compañía (todas sus filas, con códigos globales)"""
+    directory = _directory(company_id)
+    meta = _read_meta(directory)
+
+    segments = []
+    for name in meta['segments']:
+        with np.load(os.path.join(directory, name)) as data:
+            segments.append({key: data[key] for key in data.files})
+
+    products = pd.Index(np.concatenate([s['product_keys'] for s in segments]) if segments else []).unique()
+    warehouses = pd.Index(np.concatenate([s['warehouse_keys'] for s in segments]) if segments else []).unique()
+
+    columns = {}
+    for name, dtype in DTYPES.items():
+        parts = []
+        for segment in segments:
+            values = segment[name]
+            # Códigos del segmento -> códigos globales
+            if name == 'product' and len(values):
+                values = products.get_indexer(segment['product_keys'])[values]
+            elif name == 'warehouse' and len(values):
+                values = warehouses.get_indexer(segment['warehouse_keys'])[values]
+            parts.append(values)
+        columns[name] = np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype)
+
+    as_of = datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None
+    return Extract(columns, products, warehouses, as_of)
+
+
+def _compact(directory, meta, company_id):
+    """Fusionar todos los segmentos en uno"""
+    extract = load(company_id)
+    name = f"segment-{meta['sequence']:06d}.npz"
+    _write_segment(directory, name, extract.columns, np.asarray(extract.products, dtype='U36'),
+                   np.asarray(extract.warehouses, dtype='U36'))
+    old = meta['segments']
+    meta['segments'] = [name]
+    meta['sequence'] += 1
+    _write_meta(directory, meta)
+    for previous in old:
+        try:
+            os.remove(os.path.join(directory, previous))
+        except FileNotFoundError:
+            pass
+
+
+def _lock_key(company_id):
+    """Clave de bloqueo consultivo estable entre procesos"""
+    return int(hashlib.sha256(f'{EXTRACT_DIR}:{company_id}'.encode()).hexdigest()[:15], 16)
+
+
+def _lock(company_id, wait=True):
+    """Bloqueo de la extracción de la compañía hasta el fin de la transacción; sin wait, False si está tomado"""
+    with connection.cursor() as cursor:
+        if wait:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [_lock_key(company_id)])
+            return True
+        cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [_lock_key(company_id)])
+        return cursor.fetchone()[0]
+
+
+def _horizon(now):
+    """
+    Marca de agua segura: el inicio de la transacción abierta más antigua (sus filas
+    pueden tener un created_at anterior y confirmarse después), menos EXTRACT_LAG.
+    Solo se ven las sesiones del mismo rol, que es el que usa la aplicación.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT MIN(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_type = 'client backend' "
+            "AND pid <> pg_backend_pid() AND xact_start IS NOT NULL"
+        )
+        oldest = cursor.fetchone()[0]
+    return min(now, oldest or now) - EXTRACT_LAG
+
+
+def state(company_id, max_age=MAX_AGE):
+    """(marca de agua, vencida): la marca de la extracción vigente (None si no hay) y si corresponde refrescarla"""
+    meta = _read_meta(_directory(company_id))
+    if meta['watermark'] is None:
+        return None, True
+    watermark = datetime.fromisoformat(meta['watermark'])
+    return watermark, meta.get('stale', False) or watermark < timezone.now() - EXTRACT_LAG - max_age
+
+
+def request_refresh(company_id):
+    """Encargar el refresco al worker (a lo sumo uno por compañía cada REFRESH_INTERVAL en este proceso)"""
+    from .tasks import refresh_analytics
+
+    if caches['default'].add(f'analytics-refresh:{company_id}', True, REFRESH_INTERVAL):
+        refresh_analytics.delay(str(company_id))
+
+
+def invalidate(company_id):
+    """Marcar la extracción para rehacerla completa en el próximo refresco (el kardex se reescribió)"""
+    directory = _directory(company_id)
+    with transaction.atomic():
+        _lock(company_id)
+        meta = _read_meta(directory)
+        if meta['watermark'] is not None:
+            meta['stale'] = True
+            _write_meta(directory, meta)
+
+
+def refresh(company_id, full=False, max_age=None, wait=True):
+    """
+    Agregar a la extracción las filas del kardex nuevas desde la última marca de agua.
+    Con full (o si se invalidó) la extracción se rehace completa; con max_age no se hace
+    nada si la última es más reciente; sin wait no se hace nada si otro refresco de la
+    compañía está en curso. Retorna la cantidad de filas agregadas.
+    """
+    directory = _directory(company_id)
+    os.makedirs(directory, exist_ok=True)
+
+    with transaction.atomic():
+        # Un solo refresco por compañía a la vez
+        if not _lock(company_id, wait=wait):
+            return 0
+
+        meta = _read_meta(directory)
+        meta.setdefault('sequence', len(meta['segments']))
+        full = full or meta.get('stale', False)
+        since = None if full else (datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None)
+        now = timezone.now()
+        if since is not None and max_age is not None and since >= now - EXTRACT_LAG - max_age:
+            return 0
+
+        # Los segmentos reemplazados se borran después de escribir la nueva lista: una
+        # lectura en curso sigue encontrando los que figuraban en la anterior
+        replaced = []
+        if full:
+            replaced = meta['segments']
+            meta.update(watermark=None, segments=[], rows=0, stale=False)
+
+        until = _horizon(now)
+        columns, products, warehouses = _extract(company_id, since, until)
+        rows = len(columns['created_at'])
+        if rows:
+            name = f"segment-{meta['sequence']:06d}.npz"
+            _write_segment(directory, name, columns, products, warehouses)
+            meta['segments'].append(name)
+            meta['sequence'] += 1
+            meta['rows'] += rows
+
+        meta['watermark'] = until.isoformat()
+        _write_meta(directory, meta)
+        for name in replaced:
+            os.remove(os.path.join(directory, name))
+
+        if len(meta['segments']) > MAX_SEGMENTS:
+            _compact(directory, meta, company_id)
+
+    logger.info(f'Extracción de kardex {company_id}: {rows} filas nuevas, {meta["rows"]} en total')
+
+    return rows
+
+
+def calculate(extract, period_days=PERIOD_DAYS, dead_stock_days=DEAD_STOCK_DAYS, thresholds=ABC_THRESHOLDS):
+    """
+    Métricas por (producto, bodega) y por bodega desde una extracción, con operaciones
+    vectorizadas. Retorna (items, bodegas) como DataFrames indexados por códigos.
+    """
+    frame = pd.DataFrame(extract.columns)
+    as_of = int(extract.as_of.timestamp()) if extract.as_of else int(timezone.now().timestamp())
+    start = as_of - period_days * 86400
+    keys = ['warehouse', 'product']
+
+    frame = frame[frame['created_at'] < as_of].sort_values(keys + ['created_at'], kind='stable')
+
+    # Tiempo que se mantuvo cada saldo dentro del período (hasta el movimiento siguiente)
+    next_at = frame.groupby(keys, sort=False)['created_at'].shift(-1).fillna(as_of).to_numpy('int64')
+    created_at = frame['created_at'].to_numpy()
+    held = np.clip(next_at, start, as_of) - np.clip(created_at, start, as_of)
+
+    demand = frame['movement_type'].isin(DEMAND_CODES).to_numpy() & (frame['output_quantity'].to_numpy() > 0)
+    in_period = created_at >= start
+    frame = frame.assign(
+        value_time=frame['balance_value'].to_numpy() * held,
+        consumption=np.where(demand & in_period, frame['output_value'].to_numpy(), 0.0),
+        units_out=np.where(demand & in_period, frame['output_quantity'].to_numpy(), 0),
+        last_output=np.where(demand, created_at, -1),
+    )
+
+    items = frame.groupby(keys, sort=False).agg(
+        consumption=('consumption', 'sum'),
+        units_out=('units_out', 'sum'),
+        value_time=('value_time', 'sum'),
+        on_hand=('balance_quantity', 'last'),
+        stock_value=('balance_value', 'last'),
+        last_output=('last_output', 'max'),
+    )
+
+    average_value = items['value_time'].to_numpy() / (as_of - start)
+    daily_usage = items['units_out'].to_numpy() / period_days
+    with np.errstate(divide='ignore', invalid='ignore'):
+        items['average_value'] = average_value
+        items['turnover'] = np.where(average_value > 0, items['consumption'].to_numpy() / average_value, np.nan)
+        items['days_of_supply'] = np.where(daily_usage > 0, items['on_hand'].to_numpy() / daily_usage, np.nan)
+    items['dead_stock'] = (items['on_hand'] > 0) & (items['last_output'] < as_of - dead_stock_days * 86400)
+
+    # ABC por bodega: participación acumulada del consumo antes de cada producto
+    items = items.sort_values(['consumption'], ascending=False, kind='stable').sort_index(
+        level='warehouse', sort_remaining=False, kind='stable'
+    )
+    by_warehouse = items.groupby(level='warehouse', sort=False)['consumption']
+    total = by_warehouse.transform('sum').to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        previous = np.where(total > 0, (by_warehouse.cumsum().to_numpy() - items['consumption'].to_numpy()) / total, 1)
+    items['abc_class'] = np.select(
+        [items['consumption'].to_numpy() <= 0, previous < thresholds[0], previous < thresholds[1]],
+        ['C', 'A', 'B'],
+        default='C'
+    )
+
+    warehouses = items.assign(
+        dead_value=np.where(items['dead_stock'], items['stock_value'], 0.0),
+        class_a=items['abc_class'] == 'A',
+        class_b=items['abc_class'] == 'B',
+        class_c=items['abc_class'] == 'C',
+    ).groupby(level='warehouse', sort=False).agg(
+        products=('on_hand', 'size'),
+        class_a=('class_a', 'sum'),
+        class_b=('class_b', 'sum'),
+        class_c=('class_c', 'sum'),
+        consumption=('consumption', 'sum'),
+        stock_value=('stock_value', 'sum'),
+        average_value=('average_value', 'sum'),
+        dead_stock=('dead_stock', 'sum'),
+        dead_value=('dead_value', 'sum'),
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        warehouses['turnover'] = np.where(
+            warehouses['average_value'] > 0, warehouses['consumption'] / warehouses['average_value'], np.nan
+        )
+
+    return items, warehouses
+
+
+def _label(company_id, extract, items, warehouses):
+    """Reemplazar los códigos por nombres de producto y bodega"""
+    products = pd.DataFrame.from_records(
+        Product.objects.filter(company_id=company_id).values_list('id', 'sku', 'name').iterator(chunk_size=CHUNK_SIZE),
+        columns=['id', 'sku', 'product_name']
+    )
+    products.index = products.pop('id').astype(str)
+    names = pd.Series(dict(Warehouse.objects.filter(company_id=company_id).values_list('id', 'name')), dtype=object)
+    names.index = names.index.astype(str)
+
+    items = items.reset_index()
+    product_keys = extract.products[items['product'].to_numpy()]
+    warehouse_keys = extract.warehouses[items['warehouse'].to_numpy()]
+    items['sku'] = products['sku'].reindex(product_keys).to_numpy()
+    items['product_name'] = products['product_name'].reindex(product_keys).to_numpy()
+    items['warehouse_name'] = names.reindex(warehouse_keys).to_numpy()
+
+    warehouses = warehouses.reset_index()
+    warehouses['warehouse_name'] = names.reindex(extract.warehouses[warehouses['warehouse'].to_numpy()]).to_numpy()
+    return items, warehouses
+
+
+def analyze(company_id, period_days=PERIOD_DAYS, dead_stock_days=DEAD_STOCK_DAYS):
+    """
+    Analítica de la compañía con la extracción vigente, sin refrescarla (ver refresh y
+    request_refresh). El resultado queda en caché hasta la siguiente extracción.
+    """
+    meta = _read_meta(_directory(company_id))
+    key = f"analytics:{company_id}:{meta['watermark']}:{period_days}:{dead_stock_days}"
+
+    result = caches['default'].get(key)
+    if result is None:
+        extract = load(company_id)
+        items, warehouses = calculate(extract, period_days=period_days, dead_stock_days=dead_stock_days)
+        items, warehouses = _label(company_id, extract, items, warehouses)
+        result = Analytics(items, warehouses, extract.as_of)
+        caches['default'].set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def as_datetime(seconds):
+    """Fecha de una marca en segundos de la extracción (None si no hay)"""
+    if seconds is None or seconds < 0:
+        return None
+    return datetime.fromtimestamp(int(seconds), tz=dt_timezone.utc)
+
+
+def records(frame):
+    """Filas de un resultado como dicts para plantillas (NaN como None, fechas como datetime)"""
+    rows = frame.astype(object).where(frame.notna(), None).to_dict('records')
+    for row in rows:
+        if 'last_output' in row:
+            row['last_output'] = as_datetime(row['last_output'])
+    return rows
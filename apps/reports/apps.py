@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class ReportsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.reports'
+    verbose_name = 'Reportes'
+
+    def ready(self):
+        import apps.reports.signals
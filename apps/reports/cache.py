@@ -0,0 +1,136 @@
+"""
+Caché de reportes generados.
+
+Cada archivo se guarda en MEDIA_ROOT/reports/<compañía>/<clave>/<nombre>, donde la clave
+es un hash de (compañía, tipo de reporte, parámetros, versión de datos). La versión de
+datos aumenta con cada movimiento confirmado, así que mientras no haya movimientos
+nuevos el mismo reporte se sirve desde disco sin volver a generarlo.
+
+Los archivos se escriben con un nombre temporal en la misma carpeta y se renombran al
+terminar (os.replace), así una búsqueda concurrente nunca entrega un archivo a medio
+escribir.
+
+La carpeta tiene un tamaño máximo (REPORT_CACHE_MAX_BYTES): al superarlo se eliminan
+los archivos usados hace más tiempo. Cada uso actualiza la fecha de modificación del
+archivo, que hace de marca LRU.
+"""
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from apps.movements.models import DataVersion
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = 'reports'
+
+# Sufijo de los archivos en escritura y antigüedad (segundos) a partir de la cual se
+# consideran abandonados por un worker caído
+TEMP_SUFFIX = '.tmp'
+TEMP_MAX_AGE = 3600
+
+
+def data_version(company_id):
+    """Versión de datos vigente de la compañía (0 si aún no tiene movimientos)"""
+    return DataVersion.objects.filter(company_id=company_id).values_list('version', flat=True).first() or 0
+
+
+def cache_key(company_id, report_type, params, version):
+    """Clave del archivo para los datos de la versión indicada"""
+    payload = json.dumps([str(company_id), report_type, params, version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def store(company_id, key, filename, content):
+    """Guardar un reporte generado en la caché y retornar su nombre relativo a MEDIA_ROOT"""
+    name = f'{CACHE_DIR}/{company_id}/{key}/{filename}'
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    partial = f'{path}.{uuid.uuid4().hex}{TEMP_SUFFIX}'
+    try:
+        with open(partial, 'wb') as output:
+            for chunk in content.chunks():
+                output.write(chunk)
+        os.replace(partial, path)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except FileNotFoundError:
+            pass
+        raise
+    return name
+
+
+def lookup(company_id, key):
+    """Nombre del archivo en caché para la clave o None si no existe"""
+    directory = f'{CACHE_DIR}/{company_id}/{key}'
+    try:
+        filenames = [name for name in os.listdir(default_storage.path(directory)) if not name.endswith(TEMP_SUFFIX)]
+    except FileNotFoundError:
+        return None
+    if not filenames:
+        return None
+
+    name = f'{directory}/{filenames[0]}'
+    touch(name)
+    return name
+
+
+def touch(name):
+    """Marcar el archivo como usado recientemente"""
+    try:
+        os.utime(default_storage.path(name))
+    except FileNotFoundError:
+        pass
+
+
+def evict(max_bytes=None):
+    """
+    Eliminar los archivos usados hace más tiempo hasta que la caché no supere max_bytes.
+    Retorna la cantidad de archivos eliminados.
+    """
+    max_bytes = settings.REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    root = default_storage.path(CACHE_DIR)
+
+    files = []
+    total = 0
+    now = time.time()
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            # Los temporales en escritura no se tocan; los abandonados se eliminan como cualquier archivo viejo
+            if filename.endswith(TEMP_SUFFIX) and now - stat.st_mtime < TEMP_MAX_AGE:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            # Quitar la carpeta de la clave si quedó vacía
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            # Ya eliminado por otro worker, o la carpeta aún tiene archivos
+            pass
+        total -= size
+        removed += 1
+
+    logger.info(f'Caché de reportes: {removed} archivos eliminados, {total / 1024 / 1024:.1f} MB en uso')
+
+    return removed
@@ -0,0 +1,64 @@
+"""
+Exportaciones Excel de memoria acotada.
+
+Los libros se escriben con openpyxl en modo write_only (las filas van directo al XML
+de la hoja) sobre un archivo. Los estilos se registran una vez por libro como estilos
+con nombre y las celdas solo referencian su nombre.
+"""
+
+from collections import namedtuple
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+
+# Filas leídas por viaje a la base de datos
+CHUNK_SIZE = 2000
+
+# Valor con estilo con nombre dentro de una fila
+Styled = namedtuple('Styled', ['value', 'style'])
+
+
+def _named_styles():
+    header = NamedStyle(name='header')
+    header.font = Font(bold=True, color="FFFFFF")
+    header.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header.alignment = Alignment(horizontal="center")
+
+    warning = NamedStyle(name='warning')
+    warning.font = Font(color="9C0006")
+    warning.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+
+    ok = NamedStyle(name='ok')
+    ok.font = Font(color="006100")
+    ok.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+
+    return [header, warning, ok]
+
+
+def write_workbook(output, title, headers, rows, width=20):
+    """
+    Escribir una hoja en modo write_only sobre output (archivo binario).
+    rows es un iterable de listas; los valores Styled se escriben con su estilo con nombre.
+    """
+    workbook = Workbook(write_only=True)
+    for style in _named_styles():
+        workbook.add_named_style(style)
+
+    sheet = workbook.create_sheet(title)
+    for column in range(1, len(headers) + 1):
+        sheet.column_dimensions[get_column_letter(column)].width = width
+
+    def cell(value, style):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.style = style
+        return cell
+
+    sheet.append([cell(header, 'header') for header in headers])
+    for row in rows:
+        sheet.append([
+            cell(value.value, value.style) if isinstance(value, Styled) else value
+            for value in row
+        ])
+
+    workbook.save(output)
@@ -0,0 +1,247 @@
+from apps.inventory.models import Inventory
+from apps.movements.models import Movement, Kardex
+from apps.movements.services import KardexService
+from apps.products.models import Product
+from apps.warehouses.models import Warehouse
+from datetime import date, datetime, time
+from django.utils import timezone
+from . import analytics, exports, pdf
+
+# Cada generador escribe el reporte en output (archivo binario) y retorna el nombre sugerido
+
+
+def _inventory_rows(company, as_of=None):
+    """
+    Filas (producto, SKU, bodega, cantidad, stock mínimo) con stock positivo.
+    Sin as_of es el stock vigente; con as_of (AAAA-MM-DD) es el saldo al cierre de ese
+    día, leído de los cierres diarios del kardex más la cola posterior.
+    """
+    if not as_of:
+        return Inventory.objects.filter(
+            company=company
+        ).with_live_stock().filter(
+            live_quantity__gt=0
+        ).values_list(
+            'product__name', 'product__sku', 'warehouse__name', 'live_quantity', 'min_stock'
+        ).iterator(chunk_size=exports.CHUNK_SIZE)
+
+    balances = KardexService.stock_snapshot(company, KardexService.day_end(date.fromisoformat(as_of)))
+    products = {
+        product_id: (name, sku)
+        for product_id, name, sku in Product.objects.filter(
+            company=company
+        ).values_list('id', 'name', 'sku').iterator(chunk_size=exports.CHUNK_SIZE)
+    }
+    warehouses = dict(Warehouse.objects.filter(company=company).values_list('id', 'name'))
+    min_stock = {
+        (product_id, warehouse_id): minimum
+        for product_id, warehouse_id, minimum in Inventory.objects.filter(
+            company=company
+        ).values_list('product_id', 'warehouse_id', 'min_stock').iterator(chunk_size=exports.CHUNK_SIZE)
+    }
+
+    return iter(sorted(
+        (*products[product_id], warehouses[warehouse_id], quantity, min_stock.get((product_id, warehouse_id), 0))
+        for (product_id, warehouse_id), (quantity, _) in balances.items()
+        if quantity > 0
+    ))
+
+
+def _inventory_title(as_of):
+    if not as_of:
+        return "Reporte de Inventario"
+    return f"Reporte de Inventario al {date.fromisoformat(as_of).strftime('%d/%m/%Y')}"
+
+
+def _inventory_filename(as_of, extension):
+    suffix = f'_{as_of.replace("-", "")}' if as_of else ''
+    return f'inventory_report{suffix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+
+def inventory_pdf(company, output, as_of=None):
+    """Reporte de inventario en PDF (vigente o al cierre del día as_of)"""
+    headers = ['Producto', 'SKU', 'Bodega', 'Cantidad', 'Stock Mínimo', 'Estado']
+
+    inventories = _inventory_rows(company, as_of)
+
+    def rows():
+        for name, sku, warehouse, quantity, min_stock in inventories:
+            estado = "Bajo Stock" if quantity <= min_stock else "Normal"
+            yield [name, sku, warehouse, str(quantity), str(min_stock), estado]
+
+    pdf.render_table(output, _inventory_title(as_of), headers, rows(), weights=[4, 2, 3, 1, 1, 1])
+
+    return _inventory_filename(as_of, 'pdf')
+
+
+def inventory_excel(company, output, as_of=None):
+    """Reporte de inventario en Excel (vigente o al cierre del día as_of)"""
+    headers = ['Producto', 'SKU', 'Bodega', 'Cantidad', 'Stock Mínimo', 'Estado']
+
+    # Datos: solo las columnas necesarias, leídas por bloques
+    inventories = _inventory_rows(company, as_of)
+
+    def rows():
+        for name, sku, warehouse, quantity, min_stock in inventories:
+            if quantity <= min_stock:
+                estado = exports.Styled("Bajo Stock", 'warning')
+            else:
+                estado = exports.Styled("Normal", 'ok')
+            yield [name, sku, warehouse, quantity, min_stock, estado]
+
+    exports.write_workbook(output, "Inventario", headers, rows(), width=25)
+
+    return _inventory_filename(as_of, 'xlsx')
+
+
+def movements_pdf(company, output):
+    """Reporte de movimientos en PDF (historial completo)"""
+    headers = ['Fecha', 'Tipo', 'Producto', 'Cantidad', 'Origen', 'Destino', 'Usuario']
+    movement_types = dict(Movement.MOVEMENT_TYPES)
+
+    movements = Movement.objects.filter(
+        company=company
+    ).order_by('-created_at').values_list(
+        'created_at', 'movement_type', 'product__sku', 'product__name', 'quantity',
+        'warehouse_from__name', 'warehouse_to__name', 'created_by__username'
+    ).iterator(chunk_size=exports.CHUNK_SIZE)
+
+    def rows():
+        for created_at, movement_type, sku, name, quantity, origin, destination, username in movements:
+            yield [
+                created_at.strftime('%d/%m/%Y %H:%M'),
+                movement_types.get(movement_type, movement_type),
+                f"{sku} - {name}",
+                str(quantity),
+                origin or '-',
+                destination or '-',
+                username,
+            ]
+
+    pdf.render_table(output, "Reporte de Movimientos", headers, rows(), weights=[2, 2, 5, 1, 2, 2, 2])
+
+    return f'movements_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+
+
+def movements_excel(company, output):
+    """Reporte de movimientos en Excel (historial completo)"""
+    headers = ['Fecha', 'Tipo', 'Producto', 'SKU', 'Cantidad', 'Origen', 'Destino', 'Usuario', 'Referencia']
+    movement_types = dict(Movement.MOVEMENT_TYPES)
+
+    # Datos: solo las columnas necesarias, leídas por bloques
+    movements = Movement.objects.filter(
+        company=company
+    ).order_by('-created_at').values_list(
+        'created_at', 'movement_type', 'product__name', 'product__sku', 'quantity',
+        'warehouse_from__name', 'warehouse_to__name', 'created_by__username', 'reference'
+    ).iterator(chunk_size=exports.CHUNK_SIZE)
+
+    def rows():
+        for created_at, movement_type, name, sku, quantity, origin, destination, username, reference in movements:
+            yield [
+                created_at.strftime('%d/%m/%Y %H:%M'),
+                movement_types.get(movement_type, movement_type),
+                name,
+                sku,
+                quantity,
+                origin or '-',
+                destination or '-',
+                username,
+                reference or '-',
+            ]
+
+    exports.write_workbook(output, "Movimientos", headers, rows())
+
+    return f'movements_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+
+
+def kardex_pdf(company, output, product_id, date_from=None):
+    """
+    Kardex por producto en PDF: historial completo o, con date_from (AAAA-MM-DD), los
+    registros desde ese día más el saldo inicial de cada bodega
+    """
+    product = Product.objects.get(id=product_id, company=company)
+    headers = ['Fecha', 'Tipo', 'Bodega', 'Entrada', 'Salida', 'Saldo', 'Usuario']
+    movement_types = dict(Kardex.MOVEMENT_TYPES)
+
+    entries = Kardex.objects.filter(
+        company=company,
+        product=product
+    )
+    openings = []
+    if date_from:
+        day = date.fromisoformat(date_from)
+        entries = entries.filter(created_at__gte=timezone.make_aware(datetime.combine(day, time.min)))
+        openings = KardexService.opening_balances(product, day)
+
+    entries = entries.order_by('-created_at', '-id').values_list(
+        'created_at', 'movement_type', 'warehouse__name', 'input_quantity',
+        'output_quantity', 'balance_quantity', 'created_by__username'
+    ).iterator(chunk_size=exports.CHUNK_SIZE)
+
+    def rows():
+        for created_at, movement_type, warehouse, input_quantity, output_quantity, balance, username in entries:
+            yield [
+                created_at.strftime('%d/%m/%Y %H:%M'),
+                movement_types.get(movement_type, movement_type),
+                warehouse,
+                str(input_quantity) if input_quantity > 0 else '-',
+                str(output_quantity) if output_quantity > 0 else '-',
+                str(balance),
+                username,
+            ]
+        # Orden descendente: el saldo inicial va al final
+        for warehouse, balance in openings:
+            yield [day.strftime('%d/%m/%Y'), 'Saldo inicial', warehouse.name, '-', '-', str(balance.quantity), '-']
+
+    title = f"Kardex - {product.name} ({product.sku})"
+    if date_from:
+        title += f" desde {day.strftime('%d/%m/%Y')}"
+    pdf.render_table(output, title, headers, rows(), weights=[2, 2, 3, 1, 1, 1, 2])
+
+    return f'kardex_{product.sku}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+
+
+def analytics_excel(company, output):
+    """Analítica de inventario por bodega y producto en Excel (ABC, rotación, cobertura)"""
+    headers = [
+        'Bodega', 'SKU', 'Producto', 'Clase ABC', 'Consumo', 'Unidades salida', 'Stock',
+        'Valor stock', 'Rotación', 'Días cobertura', 'Última salida', 'Inmovilizado'
+    ]
+    # Se genera en el worker: la extracción se refresca aquí si está vencida
+    analytics.refresh(company.id, max_age=analytics.MAX_AGE)
+    items = analytics.analyze(company.id).items.sort_values(
+        ['warehouse_name', 'abc_class', 'consumption'], ascending=[True, True, False]
+    )
+
+    def rows():
+        for row in analytics.records(items):
+            last_output = row['last_output']
+            yield [
+                row['warehouse_name'],
+                row['sku'],
+                row['product_name'],
+                row['abc_class'],
+                round(row['consumption'], 2),
+                row['units_out'],
+                row['on_hand'],
+                round(row['stock_value'], 2),
+                round(row['turnover'], 2) if row['turnover'] is not None else '-',
+                round(row['days_of_supply']) if row['days_of_supply'] is not None else '-',
+                last_output.strftime('%d/%m/%Y') if last_output else '-',
+                exports.Styled("Sí", 'warning') if row['dead_stock'] else 'No',
+            ]
+
+    exports.write_workbook(output, "Analítica", headers, rows())
+
+    return f'analytics_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+
+
+GENERATORS = {
+    'INVENTORY_PDF': inventory_pdf,
+    'INVENTORY_EXCEL': inventory_excel,
+    'MOVEMENTS_PDF': movements_pdf,
+    'MOVEMENTS_EXCEL': movements_excel,
+    'KARDEX_PDF': kardex_pdf,
+    'ANALYTICS_EXCEL': analytics_excel,
+}
@@ -0,0 +1,77 @@
+import io
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from reportlab.platypus import SimpleDocTemplate, Table
+
+from apps.reports import pdf
+
+
+class Command(BaseCommand):
+    help = "Mide páginas/segundo del motor PDF de reportes frente a una tabla única (comportamiento anterior)"
+
+    HEADERS = ['Fecha', 'Tipo', 'Bodega', 'Entrada', 'Salida', 'Saldo', 'Usuario']
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Filas sintéticas por reporte")
+        parser.add_argument(
+            "--mode",
+            choices=["both", "engine", "single"],
+            default="both",
+            help="engine: bloques LongTable; single: una Table con todas las filas",
+        )
+        parser.add_argument("--memory", action="store_true", help="Medir también el pico de memoria (más lento)")
+
+    def handle(self, *args, **options):
+        modes = ["single", "engine"] if options["mode"] == "both" else [options["mode"]]
+
+        results = {}
+        for mode in modes:
+            if options["memory"]:
+                tracemalloc.start()
+            started = time.perf_counter()
+            pages, size = getattr(self, f"render_{mode}")(options["rows"])
+            elapsed = time.perf_counter() - started
+
+            line = (f"{mode}: {options['rows']} filas, {pages} páginas ({size / 1024:.0f} KB) en {elapsed:.2f}s  "
+                    f"{pages / elapsed:.1f} páginas/s")
+            if options["memory"]:
+                line += f"  pico {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB"
+                tracemalloc.stop()
+            self.stdout.write(line)
+            results[mode] = pages / elapsed
+
+        if len(results) == 2:
+            self.stdout.write(self.style.SUCCESS(f"Mejora: {results['engine'] / results['single']:.2f}x"))
+
+    def rows(self, count):
+        start = datetime(2024, 1, 1)
+        balance = 0
+        for i in range(count):
+            quantity = (i % 17) + 1
+            entry = i % 3 != 0
+            balance += quantity if entry else -quantity
+            yield [
+                (start + timedelta(minutes=i)).strftime('%d/%m/%Y %H:%M'),
+                'Entrada' if entry else 'Salida',
+                f'Bodega {i % 5}',
+                str(quantity) if entry else '-',
+                '-' if entry else str(quantity),
+                str(balance),
+                'bench',
+            ]
+
+    def render_engine(self, count):
+        output = io.BytesIO()
+        pages = pdf.render_table(output, "Kardex - Bench", self.HEADERS, self.rows(count))
+        return pages, output.tell()
+
+    def render_single(self, count):
+        output = io.BytesIO()
+        doc = SimpleDocTemplate(output, pagesize=pdf.PAGE_SIZE)
+        table = Table([self.HEADERS] + list(self.rows(count)))
+        table.setStyle(pdf.TABLE_STYLE)
+        doc.build([table])
+        return doc.page, output.tell()
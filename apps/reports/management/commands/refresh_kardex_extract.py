@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.reports import analytics
+from apps.users.models import Company
+
+
+class Command(BaseCommand):
+    help = (
+        "Agrega a la extracción columnar del kardex (analítica de inventario) las filas nuevas "
+        "desde la última ejecución, o la rehace completa con --full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", help="ID de la compañía (por defecto todas)")
+        parser.add_argument("--full", action="store_true", help="Rehacer la extracción desde el inicio")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.values_list("id", flat=True)
+        if options["company"]:
+            companies = companies.filter(pk=options["company"])
+
+        for company_id in companies:
+            rows = analytics.refresh(company_id, full=options["full"])
+            self.stdout.write(f"{company_id}: {rows} filas agregadas")
+
+        self.stdout.write(self.style.SUCCESS("Extracción de kardex actualizada"))
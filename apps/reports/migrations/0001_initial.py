@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:16
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report_type', models.CharField(choices=[('INVENTORY_PDF', 'Inventario (PDF)'), ('INVENTORY_EXCEL', 'Inventario (Excel)'), ('MOVEMENTS_PDF', 'Movimientos (PDF)'), ('MOVEMENTS_EXCEL', 'Movimientos (Excel)'), ('KARDEX_PDF', 'Kardex por producto (PDF)')], max_length=20, verbose_name='Reporte')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('status', models.CharField(choices=[('PENDING', 'En cola'), ('PROCESSING', 'Generando'), ('COMPLETED', 'Listo'), ('FAILED', 'Fallido')], default='PENDING', max_length=20, verbose_name='Estado')),
+                ('file', models.FileField(blank=True, null=True, upload_to='reports/', verbose_name='Archivo')),
+                ('error_message', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finalizado')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='users.company')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reporte',
+                'verbose_name_plural': 'Reportes',
+                'ordering': ['-created_at'],
+                'permissions': [('view_report', 'Puede ver reportes')],
+                'indexes': [models.Index(fields=['created_by', 'report_type', 'status'], name='reports_rep_created_95e6f8_idx')],
+            },
+        ),
+    ]
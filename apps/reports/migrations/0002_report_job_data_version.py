@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='data_version',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Versión de datos'),
+        ),
+    ]
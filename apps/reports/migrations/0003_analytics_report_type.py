@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_report_job_data_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='report_type',
+            field=models.CharField(choices=[('INVENTORY_PDF', 'Inventario (PDF)'), ('INVENTORY_EXCEL', 'Inventario (Excel)'), ('MOVEMENTS_PDF', 'Movimientos (PDF)'), ('MOVEMENTS_EXCEL', 'Movimientos (Excel)'), ('KARDEX_PDF', 'Kardex por producto (PDF)'), ('ANALYTICS_EXCEL', 'Analítica de inventario (Excel)')], max_length=20, verbose_name='Reporte'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from apps.users.models import Company
+import uuid
+
+User = get_user_model()
+
+class ReportJob(models.Model):
+    """Reporte generado en segundo plano por un worker de Celery"""
+    
+    REPORT_TYPES = [
+        ('INVENTORY_PDF', 'Inventario (PDF)'),
+        ('INVENTORY_EXCEL', 'Inventario (Excel)'),
+        ('MOVEMENTS_PDF', 'Movimientos (PDF)'),
+        ('MOVEMENTS_EXCEL', 'Movimientos (Excel)'),
+        ('KARDEX_PDF', 'Kardex por producto (PDF)'),
+        ('ANALYTICS_EXCEL', 'Analítica de inventario (Excel)'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('PENDING', 'En cola'),
+        ('PROCESSING', 'Generando'),
+        ('COMPLETED', 'Listo'),
+        ('FAILED', 'Fallido'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='report_jobs')
+    
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPES, verbose_name='Reporte')
+    params = models.JSONField(default=dict, blank=True, verbose_name='Parámetros')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name='Estado')
+    
+    file = models.FileField(upload_to='reports/', null=True, blank=True, verbose_name='Archivo')
+    error_message = models.TextField(blank=True, verbose_name='Error')
+    
+    # Versión de datos de la compañía con la que se generó (ver apps.reports.cache)
+    data_version = models.BigIntegerField(null=True, blank=True, verbose_name='Versión de datos')
+    
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Finalizado')
+    
+    class Meta:
+        verbose_name = 'Reporte'
+        verbose_name_plural = 'Reportes'
+        ordering = ['-created_at']
+        permissions = [
+            ('view_report', 'Puede ver reportes'),
+        ]
+        indexes = [
+            models.Index(fields=['created_by', 'report_type', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_report_type_display()} - {self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('COMPLETED', 'FAILED')
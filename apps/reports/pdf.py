@@ -0,0 +1,120 @@
+"""
+Motor de reportes PDF tabulares.
+
+Las filas se consumen de un iterable (normalmente un cursor .iterator()) y se agrupan
+en bloques LongTable del tamaño aproximado de una página, con el encabezado repetido
+(repeatRows). Los bloques se entregan a reportlab a medida que se necesitan, de modo
+que nunca existe una tabla con todas las filas: el costo de maquetación es lineal en
+la cantidad de filas y la memoria no depende de ella.
+"""
+
+from datetime import datetime
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+PAGE_SIZE = landscape(letter)
+MARGIN = 0.5 * inch
+FONT_SIZE = 8
+ROW_HEIGHT = FONT_SIZE + 6
+
+# Estilo compartido por todos los bloques de todas las tablas
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+])
+
+
+class _BlockStream(list):
+    """
+    Lista de flowables que se rellena desde un generador cuando se vacía.
+    SimpleDocTemplate.build consulta len() en cada vuelta, así que solo hay
+    en memoria el bloque en maquetación (y los restos de sus divisiones).
+    """
+
+    def __init__(self, blocks):
+        super().__init__()
+        self._blocks = iter(blocks)
+
+    def __len__(self):
+        if not super().__len__():
+            block = next(self._blocks, None)
+            if block is not None:
+                self.append(block)
+        return super().__len__()
+
+
+def _clip(value, limit):
+    value = str(value)
+    return value if len(value) <= limit else value[:limit - 1] + '…'
+
+
+def _blocks(headers, rows, col_widths, rows_per_block):
+    # Caracteres que caben en cada columna (aprox. medio cuerpo de fuente por carácter)
+    limits = [max(int(width // (FONT_SIZE * 0.55)), 1) for width in col_widths]
+    block = []
+    for row in rows:
+        block.append([_clip(value, limit) for value, limit in zip(row, limits)])
+        if len(block) >= rows_per_block:
+            yield _table(headers, block, col_widths)
+            block = []
+    if block:
+        yield _table(headers, block, col_widths)
+
+
+def _table(headers, block, col_widths):
+    # Anchos fijos: reportlab no necesita medir cada celda para calcularlos
+    table = LongTable([headers] + block, colWidths=col_widths, rowHeights=ROW_HEIGHT, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def _page_number(canvas, doc):
+    canvas.saveState()
+    canvas.setFont('Helvetica', FONT_SIZE)
+    canvas.drawRightString(PAGE_SIZE[0] - MARGIN, MARGIN / 2, f"Página {doc.page}")
+    canvas.restoreState()
+
+
+def render_table(output, title, headers, rows, weights=None):
+    """
+    Escribir en output un PDF con título y una tabla paginada.
+    rows es un iterable de listas de textos; weights indica el ancho relativo de cada
+    columna (por defecto iguales). Retorna la cantidad de páginas generadas.
+    """
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=PAGE_SIZE,
+        leftMargin=MARGIN,
+        rightMargin=MARGIN,
+        topMargin=MARGIN,
+        bottomMargin=MARGIN,
+    )
+
+    weights = weights or [1] * len(headers)
+    col_widths = [doc.width * weight / sum(weights) for weight in weights]
+    # Un bloque por página: las filas que caben en el marco menos el encabezado
+    rows_per_block = max(int(doc.height // ROW_HEIGHT) - 1, 1)
+
+    styles = getSampleStyleSheet()
+    heading = [
+        Paragraph(f"{title} - {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Heading1']),
+        Spacer(1, 0.2 * inch),
+    ]
+
+    def flowables():
+        yield from heading
+        yield from _blocks(headers, rows, col_widths, rows_per_block)
+
+    doc.build(_BlockStream(flowables()), onFirstPage=_page_number, onLaterPages=_page_number)
+
+    return doc.page
@@ -0,0 +1,85 @@
+from django.core.cache import caches
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from apps.users.models import Company
+from apps.products.models import Product, Category
+from apps.suppliers.models import Supplier
+from apps.warehouses.models import Warehouse
+from apps.inventory.models import Inventory, WarehouseStockSummary
+from . import cache as report_cache
+
+
+def _count(queryset):
+    """Subconsulta COUNT(*) de queryset por compañía (0 si no hay filas)"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(company=OuterRef('pk')).order_by().values('company').annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+class DashboardService:
+    """
+    Métricas del dashboard por compañía.
+    Los conteos se calculan en una sola consulta (una subconsulta por métrica) y el
+    stock por bodega en otra; el resultado se guarda en caché con la versión de datos
+    de la compañía en la clave, de modo que cualquier movimiento o cambio de catálogo
+    lo invalida sin tener que borrar nada.
+    """
+
+    # Vigencia máxima de las métricas en caché
+    CACHE_TIMEOUT = 300
+
+    # Bodegas incluidas en el gráfico de stock
+    TOP_WAREHOUSES = 5
+
+    @staticmethod
+    def metrics(company):
+        """
+        Retorna un dict con total_products, total_categories, total_warehouses,
+        total_suppliers, low_stock_count y stock_by_warehouse.
+        """
+        company_id = company.id if company else None
+        version = report_cache.data_version(company_id)
+        key = f'dashboard:{company_id}:{version}'
+
+        metrics = caches['default'].get(key)
+        if metrics is None:
+            metrics = DashboardService.compute(company_id)
+            caches['default'].set(key, metrics, DashboardService.CACHE_TIMEOUT)
+        return metrics
+
+    @staticmethod
+    def compute(company_id):
+        """Calcular las métricas sin caché"""
+        counts = Company.objects.filter(pk=company_id).annotate(
+            total_products=_count(Product.objects.filter(is_deleted=False)),
+            total_categories=_count(Category.objects.filter(is_deleted=False)),
+            total_warehouses=_count(Warehouse.objects.filter(is_deleted=False)),
+            total_suppliers=_count(Supplier.objects.filter(is_deleted=False)),
+            low_stock_count=_count(Inventory.objects.low_stock().filter(
+                product__is_deleted=False,
+                warehouse__is_deleted=False
+            )),
+        ).values(
+            'total_products', 'total_categories', 'total_warehouses', 'total_suppliers', 'low_stock_count'
+        ).first()
+
+        metrics = counts or {
+            'total_products': 0,
+            'total_categories': 0,
+            'total_warehouses': 0,
+            'total_suppliers': 0,
+            'low_stock_count': 0,
+        }
+        # Desde el resumen de stock: unas pocas filas por bodega en vez de todo Inventory
+        metrics['stock_by_warehouse'] = list(
+            WarehouseStockSummary.objects.filter(company_id=company_id).values('warehouse__name').annotate(
+                total=Sum('total_units')
+            ).order_by('-total')[:DashboardService.TOP_WAREHOUSES]
+        )
+
+        return metrics
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from apps.products.models import Product, Category
+from apps.suppliers.models import Supplier
+from apps.warehouses.models import Warehouse
+from apps.inventory.models import Inventory
+from apps.movements.services import bump_data_version
+
+# Modelos de catálogo que aparecen en reportes y métricas del dashboard
+CATALOG_MODELS = (Product, Category, Supplier, Warehouse, Inventory)
+
+def invalidate_cached_reports(sender, instance, **kwargs):
+    """Invalidar reportes y métricas en caché de la compañía al cambiar el catálogo"""
+    bump_data_version(instance.company_id)
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_cached_reports, sender=model, dispatch_uid=f'reports_catalog_save_{model.__name__}')
+    post_delete.connect(invalidate_cached_reports, sender=model, dispatch_uid=f'reports_catalog_delete_{model.__name__}')
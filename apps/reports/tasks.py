@@ -0,0 +1,54 @@
+from celery import shared_task
+from django.core.files import File
+from django.utils import timezone
+from .models import ReportJob
+from .generators import GENERATORS
+from . import analytics, cache
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def generate_report(job_id):
+    """Generar el archivo de un ReportJob en MEDIA_ROOT"""
+    # Tomar el job solo si sigue en cola (evita generarlo dos veces)
+    claimed = ReportJob.objects.filter(pk=job_id, status='PENDING').update(
+        status='PROCESSING',
+        started_at=timezone.now()
+    )
+    if not claimed:
+        return
+
+    job = ReportJob.objects.select_related('company').get(pk=job_id)
+    try:
+        # La versión se lee antes que los datos: si llega un movimiento durante la
+        # generación, la clave ya no coincide con la versión nueva y no se reutiliza
+        job.data_version = cache.data_version(job.company_id)
+        key = cache.cache_key(job.company_id, job.report_type, job.params, job.data_version)
+
+        name = cache.lookup(job.company_id, key)
+        if name is None:
+            with tempfile.TemporaryFile() as output:
+                filename = GENERATORS[job.report_type](job.company, output, **job.params)
+                output.seek(0)
+                name = cache.store(job.company_id, key, filename, File(output))
+            cache.evict()
+        job.file.name = name
+        job.status = 'COMPLETED'
+    except Exception as e:
+        logger.exception(f'Error generando reporte {job.id}')
+        job.status = 'FAILED'
+        job.error_message = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'data_version', 'status', 'error_message', 'finished_at'])
+
+    logger.info(f'Reporte {job.id} ({job.report_type}): {job.status}')
+
+
+@shared_task(ignore_result=True)
+def refresh_analytics(company_id):
+    """Actualizar la extracción del kardex de la analítica (si otro refresco está en curso, no hace nada)"""
+    analytics.refresh(company_id, max_age=analytics.MAX_AGE, wait=False)
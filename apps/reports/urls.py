@@ -10,4 +10,10 @@ urlpatterns = [
     path('movements/pdf/', views.movements_report_pdf, name='movements_report_pdf'),
     path('movements/excel/', views.movements_report_excel, name='movements_report_excel'),
     path('kardex/pdf/<uuid:product_id>/', views.kardex_report_pdf, name='kardex_report_pdf'),
+    path('analytics/', views.analytics_report, name='analytics'),
+    path('analytics/excel/', views.analytics_report_excel, name='analytics_report_excel'),
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<uuid:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<uuid:pk>/status/', views.job_status, name='job_status'),
+    path('jobs/<uuid:pk>/download/', views.job_download, name='job_download'),
 ]
\ No newline at end of file
@@ -1,331 +1,216 @@
-from django.shortcuts import render
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
-from django.http import HttpResponse
-from django.db.models import Sum, F, Count
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from io import BytesIO
+from django.contrib import messages
+from django.db import transaction
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from inventory.pagination import paginate
+from .models import ReportJob
+from .services import DashboardService
+from .tasks import generate_report
+from . import analytics, cache
 from apps.inventory.models import Inventory
-from apps.movements.models import Movement, Kardex
+from apps.movements.models import Movement
 from apps.products.models import Product
-from apps.warehouses.models import Warehouse
-from datetime import datetime
+from datetime import date
+import mimetypes
+import os
 
 @login_required
 @permission_required('reports.view_report', raise_exception=True)
 def dashboard(request):
     """Dashboard principal con estadísticas"""
-    # Estadísticas para el dashboard
-    total_products = Product.objects.filter(company=request.user.company, is_deleted=False).count()
-    total_warehouses = Warehouse.objects.filter(company=request.user.company, is_deleted=False).count()
-    low_stock_count = Inventory.objects.filter(
-        company=request.user.company,
-        quantity__lte=F('min_stock')
-    ).count()
+    # Conteos y stock por bodega (en caché hasta el siguiente cambio de datos)
+    context = DashboardService.metrics(request.user.company)
     
-    recent_movements = Movement.objects.filter(
+    context['recent_movements'] = Movement.objects.filter(
         company=request.user.company
     ).select_related('product', 'created_by').order_by('-created_at')[:10]
     
-    stock_by_warehouse = Inventory.objects.filter(
-        company=request.user.company
-    ).values('warehouse__name').annotate(
-        total=Sum('quantity')
-    ).order_by('-total')[:5]
-    
     # Productos con stock bajo
-    low_stock_items = Inventory.objects.filter(
+    context['low_stock_products'] = Inventory.objects.low_stock().filter(
         company=request.user.company,
-        quantity__lte=F('min_stock'),
-        quantity__gt=0
-    ).select_related('product', 'warehouse')[:10]
+        product__is_deleted=False,
+        warehouse__is_deleted=False
+    ).select_related('product', 'warehouse').order_by('quantity')[:10]
     
-    context = {
-        'total_products': total_products,
-        'total_warehouses': total_warehouses,
-        'low_stock_count': low_stock_count,
-        'recent_movements': recent_movements,
-        'stock_by_warehouse': stock_by_warehouse,
-        'low_stock_items': low_stock_items,
-    }
     return render(request, 'dashboard.html', context)
 
+def _enqueue(request, report_type, **params):
+    """
+    Encolar la generación de un reporte y redirigir a su página de estado.
+    Si el reporte ya está en caché para la versión de datos vigente se descarga
+    directamente; si el usuario ya tiene el mismo reporte en cola, se reutiliza.
+    """
+    company = request.user.company
+    version = cache.data_version(company.id)
+    cached = cache.lookup(company.id, cache.cache_key(company.id, report_type, params, version))
+    if cached is not None:
+        now = timezone.now()
+        job = ReportJob.objects.create(
+            company=company,
+            report_type=report_type,
+            params=params,
+            status='COMPLETED',
+            file=cached,
+            data_version=version,
+            created_by=request.user,
+            started_at=now,
+            finished_at=now
+        )
+        return redirect('reports:job_download', pk=job.pk)
+    
+    job = ReportJob.objects.filter(
+        created_by=request.user,
+        report_type=report_type,
+        params=params,
+        status__in=['PENDING', 'PROCESSING']
+    ).first()
+    
+    if job is None:
+        job = ReportJob.objects.create(
+            company=company,
+            report_type=report_type,
+            params=params,
+            created_by=request.user
+        )
+        job_id = str(job.id)
+        transaction.on_commit(lambda: generate_report.delay(job_id))
+        messages.info(request, 'El reporte se está generando, podrá descargarlo desde esta página')
+    
+    return redirect('reports:job_detail', pk=job.pk)
+
+def _day_param(request, name):
+    """
+    Parámetro de fecha (AAAA-MM-DD) para los reportes a una fecha, como {name: fecha}.
+    Vacío si no viene, no es válido o es posterior a hoy (se genera el reporte vigente).
+    """
+    try:
+        day = date.fromisoformat(request.GET.get(name, ''))
+    except ValueError:
+        return {}
+    if day > timezone.localdate():
+        return {}
+    return {name: day.isoformat()}
+
 @login_required
 @permission_required('reports.view_report', raise_exception=True)
 def inventory_report_pdf(request):
-    """Generar reporte de inventario en PDF"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
-    elements = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-    
-    # Título
-    title = Paragraph(f"Reporte de Inventario - {datetime.now().strftime('%d/%m/%Y %H:%M')}", title_style)
-    elements.append(title)
-    elements.append(Paragraph("<br/><br/>", styles['Normal']))
-    
-    # Datos
-    inventories = Inventory.objects.filter(
-        company=request.user.company,
-        quantity__gt=0
-    ).select_related('product', 'warehouse')
-    
-    data = [['Producto', 'SKU', 'Bodega', 'Cantidad', 'Stock Mínimo', 'Estado']]
-    
-    for inv in inventories:
-        estado = "Bajo Stock" if inv.quantity <= inv.min_stock else "Normal"
-        data.append([
-            inv.product.name,
-            inv.product.sku,
-            inv.warehouse.name,
-            str(inv.quantity),
-            str(inv.min_stock),
-            estado
-        ])
-    
-    # Tabla
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="inventory_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    
-    return response
+    """Generar reporte de inventario en PDF (vigente o al cierre del día as_of)"""
+    return _enqueue(request, 'INVENTORY_PDF', **_day_param(request, 'as_of'))
 
 @login_required
 @permission_required('reports.view_report', raise_exception=True)
 def inventory_report_excel(request):
-    """Generar reporte de inventario en Excel"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Inventario"
-    
-    # Encabezados
-    headers = ['Producto', 'SKU', 'Bodega', 'Cantidad', 'Stock Mínimo', 'Estado']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Datos
-    inventories = Inventory.objects.filter(
-        company=request.user.company,
-        quantity__gt=0
-    ).select_related('product', 'warehouse')
-    
-    for row, inv in enumerate(inventories, 2):
-        estado = "Bajo Stock" if inv.quantity <= inv.min_stock else "Normal"
-        
-        ws.cell(row=row, column=1, value=inv.product.name)
-        ws.cell(row=row, column=2, value=inv.product.sku)
-        ws.cell(row=row, column=3, value=inv.warehouse.name)
-        ws.cell(row=row, column=4, value=inv.quantity)
-        ws.cell(row=row, column=5, value=inv.min_stock)
-        
-        cell = ws.cell(row=row, column=6, value=estado)
-        if estado == "Bajo Stock":
-            cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-            cell.font = Font(color="9C0006")
-        else:
-            cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-            cell.font = Font(color="006100")
-    
-    # Ajustar ancho de columnas
-    for col in range(1, 7):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 25
-    
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="inventory_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    wb.save(response)
-    
-    return response
+    """Generar reporte de inventario en Excel (vigente o al cierre del día as_of)"""
+    return _enqueue(request, 'INVENTORY_EXCEL', **_day_param(request, 'as_of'))
 
 @login_required
 @permission_required('reports.view_report', raise_exception=True)
 def movements_report_pdf(request):
     """Generar reporte de movimientos en PDF"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
-    elements = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-    
-    # Título
-    title = Paragraph(f"Reporte de Movimientos - {datetime.now().strftime('%d/%m/%Y %H:%M')}", title_style)
-    elements.append(title)
-    elements.append(Paragraph("<br/><br/>", styles['Normal']))
-    
-    # Datos
-    movements = Movement.objects.filter(
-        company=request.user.company
-    ).select_related('product', 'warehouse_from', 'warehouse_to', 'created_by').order_by('-created_at')[:100]
-    
-    data = [['Fecha', 'Tipo', 'Producto', 'Cantidad', 'Origen', 'Destino', 'Usuario']]
-    
-    for mov in movements:
-        data.append([
-            mov.created_at.strftime('%d/%m/%Y %H:%M'),
-            mov.get_movement_type_display(),
-            f"{mov.product.sku} - {mov.product.name}",
-            str(mov.quantity),
-            mov.warehouse_from.name if mov.warehouse_from else '-',
-            mov.warehouse_to.name if mov.warehouse_to else '-',
-            mov.created_by.username
-        ])
-    
-    # Tabla
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="movements_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    
-    return response
+    return _enqueue(request, 'MOVEMENTS_PDF')
 
 @login_required
 @permission_required('reports.view_report', raise_exception=True)
 def movements_report_excel(request):
     """Generar reporte de movimientos en Excel"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Movimientos"
-    
-    # Encabezados
-    headers = ['Fecha', 'Tipo', 'Producto', 'SKU', 'Cantidad', 'Origen', 'Destino', 'Usuario', 'Referencia']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Datos
-    movements = Movement.objects.filter(
-        company=request.user.company
-    ).select_related('product', 'warehouse_from', 'warehouse_to', 'created_by').order_by('-created_at')[:1000]
-    
-    for row, mov in enumerate(movements, 2):
-        ws.cell(row=row, column=1, value=mov.created_at.strftime('%d/%m/%Y %H:%M'))
-        ws.cell(row=row, column=2, value=mov.get_movement_type_display())
-        ws.cell(row=row, column=3, value=mov.product.name)
-        ws.cell(row=row, column=4, value=mov.product.sku)
-        ws.cell(row=row, column=5, value=mov.quantity)
-        ws.cell(row=row, column=6, value=mov.warehouse_from.name if mov.warehouse_from else '-')
-        ws.cell(row=row, column=7, value=mov.warehouse_to.name if mov.warehouse_to else '-')
-        ws.cell(row=row, column=8, value=mov.created_by.username)
-        ws.cell(row=row, column=9, value=mov.reference or '-')
-    
-    # Ajustar ancho de columnas
-    for col in range(1, 10):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 20
-    
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="movements_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    wb.save(response)
-    
-    return response
+    return _enqueue(request, 'MOVEMENTS_EXCEL')
 
 @login_required
 @permission_required('reports.view_report', raise_exception=True)
 def kardex_report_pdf(request, product_id):
-    """Generar reporte de Kardex por producto en PDF"""
-    product = Product.objects.get(id=product_id, company=request.user.company)
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
-    elements = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-    
-    # Título
-    title = Paragraph(f"Kardex - {product.name} ({product.sku}) - {datetime.now().strftime('%d/%m/%Y %H:%M')}", title_style)
-    elements.append(title)
-    elements.append(Paragraph("<br/><br/>", styles['Normal']))
+    """Generar reporte de Kardex por producto en PDF (completo o desde date_from)"""
+    product = get_object_or_404(Product, id=product_id, company=request.user.company)
+    return _enqueue(request, 'KARDEX_PDF', product_id=str(product.id), **_day_param(request, 'date_from'))
+
+@login_required
+@permission_required('reports.view_report', raise_exception=True)
+def analytics_report(request):
+    """Analítica de inventario: ABC, rotación, días de cobertura y stock inmovilizado"""
+    company_id = request.user.company.id
+    as_of, stale = analytics.state(company_id)
+    if stale:
+        # La extracción se refresca en el worker; mientras tanto se muestra la vigente
+        analytics.request_refresh(company_id)
+    if as_of is None:
+        return render(request, 'reports/analytics.html', {'pending': True})
+    
+    result = analytics.analyze(company_id)
+    items = result.items
+    
+    warehouse = request.GET.get('warehouse', '')
+    if warehouse:
+        items = items[items['warehouse_name'] == warehouse]
     
-    # Datos
-    kardex_entries = Kardex.objects.filter(
+    context = {
+        'as_of': result.as_of,
+        'warehouses': analytics.records(result.warehouses.sort_values('consumption', ascending=False)),
+        'selected_warehouse': warehouse,
+        'class_a': analytics.records(items[items['abc_class'] == 'A'].nlargest(20, 'consumption')),
+        'dead_stock': analytics.records(items[items['dead_stock']].nlargest(20, 'stock_value')),
+    }
+    return render(request, 'reports/analytics.html', context)
+
+@login_required
+@permission_required('reports.view_report', raise_exception=True)
+def analytics_report_excel(request):
+    """Generar la analítica de inventario en Excel"""
+    return _enqueue(request, 'ANALYTICS_EXCEL')
+
+@login_required
+@permission_required('reports.view_report', raise_exception=True)
+def job_list(request):
+    """Centro de descargas: reportes solicitados por el usuario"""
+    jobs_list = ReportJob.objects.filter(
         company=request.user.company,
-        product=product
-    ).select_related('warehouse', 'created_by').order_by('-created_at')[:100]
-    
-    data = [['Fecha', 'Tipo', 'Bodega', 'Entrada', 'Salida', 'Saldo', 'Usuario']]
-    
-    for entry in kardex_entries:
-        data.append([
-            entry.created_at.strftime('%d/%m/%Y %H:%M'),
-            entry.get_movement_type_display(),
-            entry.warehouse.name,
-            str(entry.input_quantity) if entry.input_quantity > 0 else '-',
-            str(entry.output_quantity) if entry.output_quantity > 0 else '-',
-            str(entry.balance_quantity),
-            entry.created_by.username
-        ])
-    
-    # Tabla
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
+        created_by=request.user
+    )
     
-    elements.append(table)
-    doc.build(elements)
+    jobs = paginate(request, jobs_list, 20, ('-created_at', '-id'))
     
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="kardex_{product.sku}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
+    return render(request, 'reports/job_list.html', {'jobs': jobs})
+
+@login_required
+@permission_required('reports.view_report', raise_exception=True)
+def job_detail(request, pk):
+    job = get_object_or_404(ReportJob, pk=pk, company=request.user.company, created_by=request.user)
     
-    return response
\ No newline at end of file
+    return render(request, 'reports/job_detail.html', {'job': job})
+
+@login_required
+@permission_required('reports.view_report', raise_exception=True)
+def job_status(request, pk):
+    """Estado del reporte para consultas periódicas desde la página"""
+    job = get_object_or_404(ReportJob, pk=pk, company=request.user.company, created_by=request.user)
+    
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'download_url': reverse('reports:job_download', args=[job.pk]) if job.file else None,
+        'error': job.error_message,
+    })
+
+@login_required
+@permission_required('reports.view_report', raise_exception=True)
+def job_download(request, pk):
+    job = get_object_or_404(ReportJob, pk=pk, company=request.user.company, created_by=request.user)
+    if not job.file:
+        raise Http404('El reporte aún no está disponible')
+    if not job.file.storage.exists(job.file.name):
+        raise Http404('El reporte expiró, solicítelo nuevamente')
+    
+    cache.touch(job.file.name)
+    filename = os.path.basename(job.file.name)
+    
+    if settings.REPORTS_X_ACCEL_REDIRECT:
+        # nginx envía el archivo desde la ubicación interna /media/reports/
+        response = HttpResponse(content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Accel-Redirect'] = job.file.url
+        return response
+    
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename)
@@ -2,9 +2,10 @@ from django.db import models
 from django.core.validators import RegexValidator
 from django.utils import timezone
 from apps.users.models import Company
+from apps.audit.tracking import AuditedModelMixin
 import uuid
 
-class Supplier(models.Model):
+class Supplier(AuditedModelMixin, models.Model):
     """Modelo de proveedores"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='suppliers')
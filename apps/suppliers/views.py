@@ -1,11 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
-from django.db import transaction
-from django.core.paginator import Paginator
 from django.db.models import Q
+from inventory.pagination import paginate
 from .models import Supplier
 from .forms import SupplierForm
+from apps.audit import writer as audit_writer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,9 +23,7 @@ def supplier_list(request):
             Q(email__icontains=query)
         )
     
-    paginator = Paginator(suppliers_list, 10)
-    page = request.GET.get('page')
-    suppliers = paginator.get_page(page)
+    suppliers = paginate(request, suppliers_list, 10, ('name', 'id'))
     
     return render(request, 'suppliers/supplier_list.html', {'suppliers': suppliers, 'query': query})
 
@@ -41,7 +39,7 @@ def supplier_create(request):
     if request.method == 'POST':
         form = SupplierForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
+            with audit_writer.atomic():
                 supplier = form.save(commit=False)
                 supplier.company = request.user.company
                 supplier.save()
@@ -60,7 +58,7 @@ def supplier_edit(request, pk):
     if request.method == 'POST':
         form = SupplierForm(request.POST, instance=supplier)
         if form.is_valid():
-            with transaction.atomic():
+            with audit_writer.atomic():
                 form.save()
                 messages.success(request, f'Proveedor {supplier.name} actualizado')
                 return redirect('suppliers:supplier_detail', pk=supplier.pk)
@@ -75,7 +73,7 @@ def supplier_delete(request, pk):
     supplier = get_object_or_404(Supplier, pk=pk, company=request.user.company, is_deleted=False)
     
     if request.method == 'POST':
-        with transaction.atomic():
+        with audit_writer.atomic():
             supplier.delete()
             messages.success(request, f'Proveedor {supplier.name} eliminado')
         return redirect('suppliers:supplier_list')
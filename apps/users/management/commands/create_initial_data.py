@@ -42,6 +42,8 @@ class Command(BaseCommand):
             "movement",
             "kardex",
             "auditlog",
+            "report",
+            "reportjob",
         ]
 
         for group_name, actions in groups_permissions.items():
@@ -4,15 +4,13 @@ from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.contrib.auth.models import Group
 from django.db import transaction
-from django.core.paginator import Paginator
-from django.db.models import Q, Sum, F
+from django.db.models import Q
 from django.utils import timezone
+from inventory.pagination import paginate
 from .models import User, Company
-from apps.products.models import Product, Category
-from apps.suppliers.models import Supplier
-from apps.warehouses.models import Warehouse
 from apps.inventory.models import Inventory
 from apps.movements.models import Movement
+from apps.reports.services import DashboardService
 from .forms import UserCreationCustomForm, UserChangeCustomForm, UserProfileForm, CompanyForm
 from apps.audit.decorators import audit_method
 from apps.audit.models import AuditLog
@@ -56,34 +54,26 @@ def logout_view(request):
 @login_required
 def dashboard(request):
     """Dashboard principal"""
-    low_stock_products = (
-        Inventory.objects.filter(
-            quantity__lte=F("min_stock"),
+    company = request.user.company
+
+    # Conteos y stock por bodega (en caché hasta el siguiente cambio de datos)
+    context = DashboardService.metrics(company)
+
+    context["low_stock_products"] = (
+        Inventory.objects.low_stock()
+        .filter(
+            company=company,
             product__is_deleted=False,
             warehouse__is_deleted=False,
         )
         .select_related("product", "warehouse")
         .order_by("quantity")[:10]
     )
-
-    context = {
-        "total_products": Product.objects.filter(is_deleted=False).count(),
-        "total_categories": Category.objects.filter(is_deleted=False).count(),
-        "total_warehouses": Warehouse.objects.filter(is_deleted=False).count(),
-        "total_suppliers": Supplier.objects.filter(is_deleted=False).count(),
-        "low_stock_count": Inventory.objects.filter(
-            quantity__lte=F("min_stock"),
-            product__is_deleted=False,
-            warehouse__is_deleted=False,
-        ).count(),
-        "recent_movements": Movement.objects.select_related(
-            "product", "warehouse_from", "warehouse_to", "created_by"
-        ).order_by("-created_at")[:10],
-        "low_stock_products": low_stock_products,
-        "stock_by_warehouse": Inventory.objects.values("warehouse__name")
-        .annotate(total=Sum("quantity"))
-        .order_by("-total")[:5],
-    }
+    context["recent_movements"] = (
+        Movement.objects.filter(company=company)
+        .select_related("product", "warehouse_from", "warehouse_to", "created_by")
+        .order_by("-created_at")[:10]
+    )
     return render(request, "dashboard.html", context)
 
 
@@ -102,9 +92,7 @@ def user_list(request):
             | Q(last_name__icontains=query)
         )
 
-    paginator = Paginator(users_list, 10)
-    page = request.GET.get("page")
-    users = paginator.get_page(page)
+    users = paginate(request, users_list, 10, ("-date_joined", "-id"))
 
     context = {
         "users": users,
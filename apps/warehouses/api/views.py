@@ -4,7 +4,7 @@ from apps.warehouses.models import Warehouse
 from .serializers import WarehouseSerializer
 
 class WarehouseViewSet(viewsets.ModelViewSet):
-    queryset = Warehouse.objects.filter(is_deleted=False)
+    queryset = Warehouse.objects.filter(is_deleted=False).with_stock_summary()
     serializer_class = WarehouseSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
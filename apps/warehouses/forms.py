@@ -4,13 +4,14 @@ from .models import Warehouse
 class WarehouseForm(forms.ModelForm):
     class Meta:
         model = Warehouse
-        fields = ['code', 'name', 'location', 'description', 'is_active']
+        fields = ['code', 'name', 'location', 'description', 'is_active', 'sharded_stock']
         widgets = {
             'code': forms.TextInput(attrs={'class': 'form-control'}),
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'location': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'sharded_stock': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
     
     def clean_code(self):
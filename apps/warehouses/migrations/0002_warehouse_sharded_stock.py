@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='warehouse',
+            name='sharded_stock',
+            field=models.BooleanField(default=False, verbose_name='Stock fragmentado'),
+        ),
+    ]
@@ -1,9 +1,21 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from apps.users.models import Company
+from apps.audit.tracking import AuditedModelMixin
 import uuid
 
-class Warehouse(models.Model):
+class WarehouseQuerySet(models.QuerySet):
+    
+    def with_stock_summary(self):
+        """Anotar summary_products y summary_units desde el resumen de stock (sin recorrer Inventory)"""
+        return self.annotate(
+            summary_products=Coalesce(models.Sum('stock_summary__stocked_count'), 0),
+            summary_units=Coalesce(models.Sum('stock_summary__total_units'), 0)
+        )
+
+
+class Warehouse(AuditedModelMixin, models.Model):
     """Modelo de bodegas"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='warehouses')
@@ -15,6 +27,8 @@ class Warehouse(models.Model):
     
     # Control
     is_active = models.BooleanField(default=True, verbose_name='Activo')
+    # Stock fragmentado para filas de inventario muy concurridas
+    sharded_stock = models.BooleanField(default=False, verbose_name='Stock fragmentado')
     
     # Soft delete
     is_deleted = models.BooleanField(default=False, verbose_name='Eliminado')
@@ -23,6 +37,8 @@ class Warehouse(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado')
     
+    objects = WarehouseQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Bodega'
         verbose_name_plural = 'Bodegas'
@@ -58,11 +74,13 @@ class Warehouse(models.Model):
     @property
     def total_products(self):
         """Cantidad de productos únicos en inventario"""
-        return self.inventories.filter(quantity__gt=0).count()
+        if hasattr(self, 'summary_products'):
+            return self.summary_products
+        return self.stock_summary.aggregate(total=models.Sum('stocked_count'))['total'] or 0
     
     @property
     def total_items(self):
-        """Cantidad total de items en inventario"""
-        return self.inventories.aggregate(
-            total=models.Sum('quantity')
-        )['total'] or 0
\ No newline at end of file
+        """Cantidad total de items en inventario (incluye fragmentos sin compactar)"""
+        if hasattr(self, 'summary_units'):
+            return self.summary_units
+        return self.stock_summary.aggregate(total=models.Sum('total_units'))['total'] or 0
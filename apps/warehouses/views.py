@@ -1,11 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
-from django.db import models, transaction
-from django.core.paginator import Paginator
+from django.db import models
 from django.db.models import Q
+from inventory.pagination import paginate
 from .models import Warehouse
 from .forms import WarehouseForm
+from apps.audit import writer as audit_writer
 from apps.audit.decorators import audit_method
 import logging
 
@@ -29,9 +30,7 @@ def warehouse_list(request):
             Q(location__icontains=query)
         )
     
-    paginator = Paginator(warehouses_list, 10)
-    page = request.GET.get('page')
-    warehouses = paginator.get_page(page)
+    warehouses = paginate(request, warehouses_list, 10, ('name', 'id'))
     
     context = {
         'warehouses': warehouses,
@@ -77,7 +76,7 @@ def warehouse_create(request):
     if request.method == 'POST':
         form = WarehouseForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
+            with audit_writer.atomic():
                 warehouse = form.save(commit=False)
                 warehouse.company = request.user.company
                 warehouse.save()
@@ -105,7 +104,7 @@ def warehouse_edit(request, pk):
     if request.method == 'POST':
         form = WarehouseForm(request.POST, instance=warehouse)
         if form.is_valid():
-            with transaction.atomic():
+            with audit_writer.atomic():
                 form.save()
                 messages.success(request, f'Bodega {warehouse.name} actualizada')
                 logger.info(f'Usuario {request.user.username} editó bodega {warehouse.code}')
@@ -130,7 +129,7 @@ def warehouse_delete(request, pk):
     
     if request.method == 'POST':
         try:
-            with transaction.atomic():
+            with audit_writer.atomic():
                 warehouse.delete()
                 messages.success(request, f'Bodega {warehouse.name} eliminada')
                 logger.info(f'Usuario {request.user.username} eliminó bodega {warehouse.code}')
@@ -3,8 +3,8 @@ set -e
 
 # Root phase: prepare mounted volumes and drop privileges to non-root user.
 if [ "$(id -u)" = "0" ]; then
-  mkdir -p /app/staticfiles /app/media /app/logs
-  chown -R app:app /app/staticfiles /app/media /app/logs /app
+  mkdir -p /app/staticfiles /app/media /app/logs /app/broker
+  chown -R app:app /app/staticfiles /app/media /app/logs /app/broker /app
   exec gosu app "$0" "$@"
 fi
 
@@ -15,6 +15,15 @@ while ! nc -z db 5432; do
 done
 echo "PostgreSQL is ready"
 
+# Auxiliary processes ("celery -A inventory worker", "manage <command>") skip the web setup
+if [ "$1" = "celery" ]; then
+  exec "$@"
+fi
+if [ "$1" = "manage" ]; then
+  shift
+  exec python manage.py "$@"
+fi
+
 echo "Creating cache table..."
 python manage.py createcachetable || true
 
@@ -8,6 +8,14 @@ app = Celery('inventory')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
+@app.on_after_configure.connect
+def create_broker_folders(sender, **kwargs):
+    """El transporte filesystem no crea sus carpetas"""
+    options = sender.conf.broker_transport_options or {}
+    for key in ('data_folder_in', 'data_folder_out', 'control_folder'):
+        if options.get(key):
+            os.makedirs(options[key], exist_ok=True)
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""
+Paginación por cursor (keyset) para los listados.
+
+En vez de OFFSET, cada página se pide con los valores de orden de la última fila vista:
+
+    WHERE created_at <= c AND (created_at < c OR (created_at = c AND id < i))
+    ORDER BY created_at DESC, id DESC LIMIT n
+
+que un índice sobre las columnas de orden resuelve sin recorrer las filas anteriores, así
+que la página 1000 cuesta lo mismo que la primera. El orden debe ser total: si no incluye
+la clave primaria se agrega al final (en el sentido de la primera columna) y sus columnas
+no pueden ser nulas.
+
+El total no es un COUNT(*) de toda la tabla: se cuenta hasta COUNT_CAP filas y, pasado
+ese tope, se usa la estimación de PostgreSQL (pg_class.reltuples sin filtros, o las filas
+que estima el planificador para la consulta).
+
+Uso en una vista:
+
+    page = paginate(request, queryset, 20, ('-created_at', '-id'))
+
+y en la plantilla {% include "pagination.html" with page=page %}.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Sequence
+from functools import reduce
+from operator import or_
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+import binascii
+import json
+
+# Filas contadas exactamente antes de pasar a la estimación
+COUNT_CAP = 10000
+
+CURSOR_PARAM = 'cursor'
+
+
+def _encode(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    # isoformat completo: DjangoJSONEncoder corta los microsegundos y el cursor dejaría de ser exacto
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def table_estimate(model, using):
+    """Filas estimadas de la tabla (suma de particiones si está particionada); None si no hay estadísticas"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT SUM(GREATEST(c.reltuples, 0)), BOOL_OR(c.reltuples >= 0) FROM pg_class c "
+            "WHERE c.oid = %s::regclass OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+            [model._meta.db_table, model._meta.db_table]
+        )
+        total, analyzed = cursor.fetchone()
+    return int(total) if analyzed else None
+
+
+def query_estimate(queryset):
+    """Filas que el planificador estima para la consulta (sin ejecutarla)"""
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset, cap=COUNT_CAP):
+    """(total, exacto): el conteo real hasta cap filas, o la estimación de PostgreSQL pasado ese tope"""
+    count = queryset.order_by()[:cap + 1].count()
+    if count <= cap:
+        return count, True
+    if connections[queryset.db].vendor != 'postgresql':
+        return cap, False
+    if not queryset.query.where:
+        estimate = table_estimate(queryset.model, queryset.db)
+    else:
+        estimate = query_estimate(queryset)
+    return max(estimate or 0, cap), False
+
+
+class CursorPage(Sequence):
+    """Página de un CursorPaginator (misma interfaz básica que django.core.paginator.Page)"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_query = ''
+        self.previous_query = ''
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return f'<CursorPage de {len(self)} filas>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not (self._has_next and self.object_list):
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], 'next')
+
+    @property
+    def previous_cursor(self):
+        if not (self._has_previous and self.object_list):
+            return None
+        return self.paginator.cursor_for(self.object_list[0], 'previous')
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+    @property
+    def count_is_exact(self):
+        return self.paginator.count_is_exact
+
+
+class CursorPaginator:
+    """
+    Paginador por cursor sobre las columnas de ordering (nombres de campo, con '-' para
+    descendente y '__' para campos relacionados). get_page(cursor) recibe el cursor de
+    next_cursor / previous_cursor de la página anterior, o None para la primera página.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count=True):
+        ordering = list(ordering)
+        if not any(name.lstrip('-') in ('pk', queryset.model._meta.pk.name) for name in ordering):
+            # En el mismo sentido que el orden principal, para recorrer un índice (..., id) en una dirección
+            ordering.append('-pk' if ordering and ordering[0].startswith('-') else 'pk')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.with_count = count
+
+    def _field(self, path):
+        """Campo del modelo al final de un camino 'a__b__c'"""
+        model = self.queryset.model
+        field = None
+        for name in path.split('__'):
+            field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            model = field.related_model or model
+        return field
+
+    def _order_by(self, reverse=False):
+        return [f"{'-' if descending != reverse else ''}{path}" for path, descending in self.ordering]
+
+    def _beyond(self, values, reverse=False):
+        """Filas posteriores (o anteriores, con reverse) a values en el orden de la página"""
+        clauses = []
+        equal = {}
+        for (path, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clauses.append(Q(**equal, **{f'{path}__{lookup}': value}))
+            equal[path] = value
+        # La primera columna acotada por separado deja un rango que el índice puede recorrer
+        path, descending = self.ordering[0]
+        bound = Q(**{f"{path}__{'lte' if descending != reverse else 'gte'}": values[0]})
+        return bound & reduce(or_, clauses)
+
+    def cursor_for(self, obj, direction):
+        values = []
+        for path, _ in self.ordering:
+            value = obj
+            for name in path.split('__'):
+                value = getattr(value, name)
+            values.append(_encode(getattr(value, 'pk', value)))
+        payload = json.dumps({'d': direction, 'v': values}, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """(dirección, valores) de un cursor; None si el cursor no es válido"""
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            direction, raw = payload['d'], payload['v']
+            if direction not in ('next', 'previous') or len(raw) != len(self.ordering):
+                return None
+            values = [
+                None if value is None else self._field(path).to_python(value)
+                for (path, _), value in zip(self.ordering, raw)
+            ]
+        except (ValueError, TypeError, KeyError, binascii.Error, ValidationError, FieldDoesNotExist):
+            return None
+        return direction, values
+
+    @cached_property
+    def _total(self):
+        return estimate_count(self.queryset) if self.with_count else (None, False)
+
+    @property
+    def count(self):
+        return self._total[0]
+
+    @property
+    def count_is_exact(self):
+        return self._total[1]
+
+    def get_page(self, cursor=None):
+        decoded = self.decode(cursor) if cursor else None
+        if decoded is None:
+            rows = list(self.queryset.order_by(*self._order_by())[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        direction, values = decoded
+        if direction == 'next':
+            rows = list(self.queryset.filter(self._beyond(values)).order_by(*self._order_by())[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+
+        rows = list(
+            self.queryset.filter(self._beyond(values, reverse=True)).order_by(*self._order_by(reverse=True))[:self.per_page + 1]
+        )
+        return CursorPage(rows[:self.per_page][::-1], self, True, len(rows) > self.per_page)
+
+
+def paginate(request, queryset, per_page, ordering, count=True):
+    """Página del request (parámetro cursor), con los query strings de las páginas vecinas"""
+    paginator = CursorPaginator(queryset, per_page, ordering, count=count)
+    page = paginator.get_page(request.GET.get(CURSOR_PARAM))
+
+    params = request.GET.copy()
+    params.pop('page', None)
+    for attribute, cursor in (('next_query', page.next_cursor), ('previous_query', page.previous_cursor)):
+        if cursor:
+            params[CURSOR_PARAM] = cursor
+            setattr(page, attribute, params.urlencode())
+    return page
@@ -50,6 +50,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "apps.audit.middleware.AuditMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -127,6 +128,46 @@ COMPANY_ADDRESS = env("COMPANY_ADDRESS", default="")
 COMPANY_PHONE = env("COMPANY_PHONE", default="")
 COMPANY_EMAIL = env("COMPANY_EMAIL", default="")
 
+# Celery: broker en el sistema de archivos (sin servicios externos). La carpeta debe
+# ser compartida entre los procesos web y los workers.
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="filesystem://localhost//")
+CELERY_BROKER_DIR = env("CELERY_BROKER_DIR", default=str(BASE_DIR / "broker"))
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "data_folder_in": os.path.join(CELERY_BROKER_DIR, "queue"),
+    "data_folder_out": os.path.join(CELERY_BROKER_DIR, "queue"),
+    "control_folder": os.path.join(CELERY_BROKER_DIR, "control"),
+}
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ALWAYS_EAGER = env.bool("CELERY_TASK_ALWAYS_EAGER", default=False)
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+
+# Importaciones masivas: segundos sin avances tras los que un job en proceso se considera
+# abandonado (worker detenido) y otro proceso lo retoma desde la última fila confirmada
+IMPORT_JOB_TIMEOUT = env.int("IMPORT_JOB_TIMEOUT", default=600)
+
+# Reportes generados: tamaño máximo de la caché en MEDIA_ROOT/reports. Los reportes y los
+# reportes de errores de importación se entregan por nginx (X-Accel-Redirect) en vez de
+# enviar el archivo desde el proceso de Django
+REPORT_CACHE_MAX_BYTES = env.int("REPORT_CACHE_MAX_BYTES", default=1024 * 1024 * 1024)
+REPORTS_X_ACCEL_REDIRECT = env.bool("REPORTS_X_ACCEL_REDIRECT", default=False)
+
+# Auditoría: eventos por lote antes de insertarlos dentro de la transacción y entrega
+# opcional de los lotes a un worker de Celery por un outbox (con tope de lotes sin drenar)
+AUDIT_BUFFER_SIZE = env.int("AUDIT_BUFFER_SIZE", default=1000)
+AUDIT_ASYNC = env.bool("AUDIT_ASYNC", default=False)
+AUDIT_ASYNC_MAX_PENDING = env.int("AUDIT_ASYNC_MAX_PENDING", default=1000)
+
+# Particiones mensuales de auditoría (manage_audit_partitions): meses creados por
+# adelantado, meses conservados en la tabla y carpeta de los meses archivados
+AUDIT_PARTITIONS_AHEAD = env.int("AUDIT_PARTITIONS_AHEAD", default=3)
+AUDIT_RETENTION_MONTHS = env.int("AUDIT_RETENTION_MONTHS", default=12)
+AUDIT_ARCHIVE_DIR = env("AUDIT_ARCHIVE_DIR", default=str(BASE_DIR / "archive" / "audit"))
+
+# Extracción columnar del kardex para la analítica de inventario (fuera de MEDIA_ROOT: no
+# debe ser accesible desde nginx; compartida entre el proceso web y los workers)
+ANALYTICS_DIR = env("ANALYTICS_DIR", default=str(BASE_DIR / "var" / "analytics"))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,